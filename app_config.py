@@ -0,0 +1,12 @@
+# app_config.py
+# Access to .streamlit/secrets.toml for code that runs outside Streamlit
+# (grading server, command-line tools).
+
+import tomllib
+
+DEFAULT_SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+def load_secrets(path=DEFAULT_SECRETS_PATH):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
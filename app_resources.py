@@ -0,0 +1,117 @@
+# app_resources.py
+# Everything the Streamlit pages share across sessions and reruns, created once per
+# process behind st.cache_resource (and st.cache_data for plain question data), so a
+# rerun only looks them up instead of re-reading secrets, re-setting the environment
+# or reopening the knowledge base and the database pool.
+
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from event_logger import get_event_logger
+from grading_engine import get_grading_engine
+from knowledge_store import get_knowledge_store
+from question_scheduler import get_question_scheduler
+from tracing import configure_tracer
+
+
+@st.cache_resource(show_spinner=False)
+def llm_config():
+    """
+    Exports the Gemini key for LiteLLM once; returns False when secrets.toml has none.
+    """
+    api_key = st.secrets.get("GEMINI_API_KEY")
+    if not api_key:
+        return False
+    os.environ['GEMINI_API_KEY'] = api_key
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def grading_settings():
+    """
+    The [grading] section of secrets.toml as a plain dict (keys are documented in streamlit_app.py).
+    """
+    return dict(st.secrets.get("grading", {}))
+
+
+@st.cache_resource(show_spinner=False)
+def tracer():
+    return configure_tracer(st.secrets.get("tracing", {}))
+
+
+@st.cache_resource(show_spinner=False)
+def event_logger():
+    """
+    The pooled session_logs writer (event_logger.py).
+    """
+    return get_event_logger(st.secrets["mysql"])
+
+
+@st.cache_resource(show_spinner=False)
+def knowledge_store():
+    return get_knowledge_store()
+
+
+@st.cache_resource(show_spinner=False)
+def question_scheduler():
+    return get_question_scheduler(st.secrets["mysql"])
+
+
+@st.cache_resource(show_spinner=False)
+def grading_engine(_log_event):
+    """
+    The in-process GradingEngine; `_log_event` (not hashed) is only used when it is first created.
+    """
+    return get_grading_engine(_log_event, grading_settings())
+
+
+@st.cache_resource(show_spinner=False)
+def event_loop():
+    """
+    One long-lived event loop on a background thread for the in-process GradingEngine.
+    Its loop-bound members (MicroBatcher, the speculative executor, LiteLLM's cached
+    HTTP clients) break if every click ran on a fresh asyncio.run() loop.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="grading-loop", daemon=True).start()
+    return loop
+
+
+def run_on_event_loop(make_coroutine, on_partial=None):
+    """
+    Runs `make_coroutine(forward)` on event_loop() and waits for its result on the
+    calling script thread. `forward(*args)` may be called from the loop thread; each
+    call is replayed here as `on_partial(*args)`, since Streamlit elements can only be
+    updated from the script thread. `forward` is None when `on_partial` is.
+    """
+    if on_partial is None:
+        return asyncio.run_coroutine_threadsafe(make_coroutine(None), event_loop()).result()
+    updates = queue.SimpleQueue()
+    future = asyncio.run_coroutine_threadsafe(make_coroutine(lambda *args: updates.put(args)), event_loop())
+    # None marks the end, so the wait ends with the coroutine instead of at the next poll
+    future.add_done_callback(lambda _: updates.put(None))
+    while (args := updates.get()) is not None:
+        on_partial(*args)
+    return future.result()
+
+
+@st.cache_resource(show_spinner=False)
+def prefetch_executor():
+    """
+    Background threads that prepare each session's likely next question (streamlit_app.py).
+    """
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-prefetch")
+
+
+@st.cache_data(show_spinner=False, max_entries=10000)
+def question_view(qid):
+    """
+    The small fields of a question as a plain dict (the page never needs ideal_answer or source_text).
+    """
+    unit = knowledge_store()[qid]
+    return {field: unit[field] for field in ("id", "topic", "question", "page_number", "scope", "difficulty")}
@@ -0,0 +1,153 @@
+# app_timing.py
+# Cold-start and rerun time of streamlit_app.py, measured with Streamlit's AppTest on
+# the same stand-ins as load_test.py (fake LLM, SQLite session_logs), so the numbers
+# are the app's own overhead rather than Gemini's or MySQL's.
+#
+#   python app_timing.py                                          # -> benchmarks/app_timing-<time>.json
+#   python app_timing.py --compare benchmarks/app_timing-before.json
+#   python app_timing.py --app /tmp/old-checkout/streamlit_app.py -o benchmarks/app_timing-before.json
+#   python app_timing.py --db-ms 20                               # scheduler queries as slow as a MySQL round trip
+#
+# cold_start: a fresh Python process per sample, timing the first run of the page
+# (imports, secrets, knowledge store, resources). Then, in one warm session:
+# rerun (a rerun with no input), answer_commit (typing an answer), submit
+# (clicking "הערך את תשובתי" with a zero-latency fake LLM) and next_question
+# (clicking "לשאלה הבאה" until the new question is rendered).
+#
+# AppTest always reruns the whole script, never a single fragment, so the saving of
+# the answer-area fragment does not show here; and the stand-ins already skip the
+# secrets and MySQL pool setup that st.cache_resource saves in production. Run with
+# LITELLM_LOCAL_MODEL_COST_MAP=True so cold starts do not time LiteLLM's network fetch.
+
+import os
+import tempfile
+
+os.environ.setdefault("PSYTRAINER_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="psytrainer-timing-"),
+                                                            "llm_responses.sqlite3"))
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmark import summarize_samples
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+# A student reads the feedback before clicking "next question". Real students take longer than the
+# scheduler's sync interval, so the stand-in's interval is shortened to match and every click syncs.
+READING_PAUSE_S = 0.2
+ANSWER = "חיזוק הוא כל תוצאה שמגבירה את הסבירות שההתנהגות תחזור על עצמה בעתיד."
+
+
+def _session(app_path, timeout, db_ms=0.0):
+    from streamlit.testing.v1 import AppTest
+
+    from benchmark import BENCHMARK_SETTINGS, FakeLiteLLM
+    from load_test import install_stand_ins
+
+    _, secrets = install_stand_ins(BENCHMARK_SETTINGS, FakeLiteLLM(triage_ms=0, evaluation_ms=0, jitter=0),
+                                   query_delay_s=db_ms / 1000, min_sync_interval_s=READING_PAUSE_S)
+    app = AppTest.from_file(app_path, default_timeout=timeout)
+    for key, value in secrets.items():
+        app.secrets[key] = value
+    return app
+
+
+def cold_once(app_path, timeout, db_ms):
+    """
+    Runs in a fresh process: prints the time to import everything and the first page run.
+    """
+    start = time.perf_counter()
+    app = _session(app_path, timeout, db_ms)
+    ready = time.perf_counter()
+    app.run()
+    done = time.perf_counter()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    print(json.dumps({"setup_ms": (ready - start) * 1000, "first_run_ms": (done - ready) * 1000,
+                      "total_ms": (done - start) * 1000}))
+
+
+def measure(app_path, cold_samples, warm_samples, timeout, db_ms):
+    samples = defaultdict(list)
+    for _ in range(cold_samples):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-once", "--app", app_path,
+                                 "--timeout", str(timeout), "--db-ms", str(db_ms)], capture_output=True, text=True, check=True).stdout
+        cold = json.loads(output.strip().splitlines()[-1])
+        samples["cold_start"].append(cold["first_run_ms"])
+        samples["cold_start_with_imports"].append(cold["total_ms"])
+
+    app = _session(app_path, timeout, db_ms)
+    app.run()
+    for i in range(warm_samples):
+        start = time.perf_counter()
+        app.run()
+        samples["rerun"].append((time.perf_counter() - start) * 1000)
+
+        app.text_area[0].input(f"{ANSWER} ({i})")
+        start = time.perf_counter()
+        app.run()
+        samples["answer_commit"].append((time.perf_counter() - start) * 1000)
+
+        app.button[0].click()
+        start = time.perf_counter()
+        app.run()
+        samples["submit"].append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+        # Also gives the background prefetch of the next question (if the app has one) its moment
+        time.sleep(READING_PAUSE_S)
+        app.button[1].click()
+        start = time.perf_counter()
+        app.run()
+        samples["next_question"].append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return {stage: summarize_samples(values) for stage, values in samples.items()}
+
+
+def compare(current, baseline):
+    for stage, stats in current["stages_ms"].items():
+        old = baseline["stages_ms"].get(stage)
+        if old is None:
+            continue
+        for key in ("p50", "p95"):
+            before, after = old[key], stats[key]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"  {stage:<26} {key} {before:>10.1f} -> {after:>10.1f} ms  ({change})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start and rerun time of the Streamlit app.")
+    parser.add_argument("--app", default=APP_PATH, help="Page to measure (e.g. an older checkout's streamlit_app.py)")
+    parser.add_argument("--cold", type=int, default=5, help="Cold-start samples (one process each)")
+    parser.add_argument("--warm", type=int, default=30, help="Warm rerun / answer / submit samples")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--db-ms", type=float, default=0, help="Added latency of every question scheduler query")
+    parser.add_argument("--cold-once", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-o", "--output", help="Results file (default: benchmarks/app_timing-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.cold_once:
+        cold_once(args.app, args.timeout, args.db_ms)
+        sys.exit(0)
+
+    results = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "app": args.app, "db_ms": args.db_ms},
+               "stages_ms": measure(args.app, args.cold, args.warm, args.timeout, args.db_ms)}
+    for stage, stats in results["stages_ms"].items():
+        print(f"{stage:<26} p50 {stats['p50']:>9.1f} ms   p95 {stats['p95']:>9.1f} ms")
+
+    output = args.output or os.path.join("benchmarks", "app_timing-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
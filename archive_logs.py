@@ -0,0 +1,256 @@
+# archive_logs.py
+# Archival export and retention for session_logs. Rows older than their event type's
+# retention period are streamed out oldest first (keyset pagination over
+# (event_type, created_at, id) with an unbuffered server-side cursor, so memory stays
+# bounded), written as gzipped JSONL partitioned by day, verified by reading every
+# file back, and only then deleted from MySQL in small batches. Rows past the rollups.py
+# watermark are left alone, even past retention: rollup_daily has not counted them yet.
+#
+#   python archive_logs.py                     # archive and delete everything past retention
+#   python archive_logs.py --dry-run           # export and verify into a temporary directory, delete nothing
+#   python archive_logs.py --event-type TRACE  # one event type
+#   python archive_logs.py --ignore-rollups    # no rollups.py job runs against this database
+#
+# Policy: [retention] section in secrets.toml, e.g.
+#   archive_dir = "archive"
+#   default_days = 365                 -> event types not listed below (omit to keep them forever)
+#   [retention.event_types]
+#   TRACE = 14
+#   SUBMISSION_ATTEMPT = 180           -> the bulky question text / student answer
+#   EVALUATION_RESULT = 1095           -> keep long: question_scheduler.py rebuilds history from it
+#
+# Files: <archive_dir>/session_logs/day=YYYY-MM-DD/<EVENT_TYPE>-<first id>-<last id>.jsonl.gz,
+# each listed in <archive_dir>/manifest.jsonl with its row count, id range and sha256.
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from app_config import DEFAULT_SECRETS_PATH, load_secrets
+from rollups import WATERMARK_NAME
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "created_at", "event_id", "event_time", "session_id", "event_type", "details",
+           "topic", "difficulty", "scope", "score")
+
+# (created_at, id) keyset within one event type; served by idx_session_logs_type_created
+PAGE_QUERY = (
+    "SELECT " + ", ".join(COLUMNS) + " FROM session_logs "
+    "WHERE event_type = %s AND created_at < %s AND id <= %s AND (created_at > %s OR (created_at = %s AND id > %s)) "
+    "ORDER BY created_at, id LIMIT %s"
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def load_policy(secrets):
+    policy = dict(secrets.get("retention", {}))
+    policy.setdefault("archive_dir", "archive")
+    policy.setdefault("event_types", {})
+    return policy
+
+
+def retention_days(policy, event_type):
+    return policy["event_types"].get(event_type, policy.get("default_days"))
+
+
+def rollup_watermark(conn):
+    """
+    Highest session_logs id rollups.py has counted (0 if it has never run).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT last_id FROM rollup_state WHERE name = %s", (WATERMARK_NAME,))
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _row_to_record(row):
+    record = dict(zip(COLUMNS, row))
+    for key in ("created_at", "event_time"):
+        if record[key] is not None:
+            record[key] = record[key].isoformat()
+    if isinstance(record["details"], (str, bytes)):
+        record["details"] = json.loads(record["details"])
+    return record
+
+
+class DayPartitionWriter:
+    """
+    Writes one gzipped JSONL file per day; rows arrive in (created_at, id) order, so at
+    most one file is open. Closed files are read back and checked before they are reported.
+    """
+
+    def __init__(self, archive_dir, event_type):
+        self.archive_dir = archive_dir
+        self.event_type = event_type
+        self._day = None
+        self._file = None
+        self._path = None
+        self._ids = array("q")
+
+    def write(self, day, record):
+        """
+        Returns the finished partition (see `close`) when `record` starts a new day, else None.
+        """
+        finished = None
+        if day != self._day:
+            finished = self.close()
+            self._day = day
+            directory = os.path.join(self.archive_dir, "session_logs", f"day={day}")
+            os.makedirs(directory, exist_ok=True)
+            self._path = os.path.join(directory, f"{self.event_type}-{record['id']}.jsonl.gz.partial")
+            self._file = gzip.open(self._path, "wt", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._ids.append(record["id"])
+        return finished
+
+    def close(self):
+        """
+        Finishes the open file: verifies it, renames it into place and returns
+        (manifest entry, archived ids), or None if nothing is open.
+        """
+        if self._file is None:
+            return None
+        self._file.close()
+        ids, self._ids, self._file = self._ids, array("q"), None
+        read_back = array("q")
+        with gzip.open(self._path, "rt", encoding="utf-8") as f:
+            for line in f:
+                read_back.append(json.loads(line)["id"])
+        if read_back != ids:
+            raise ArchiveError(f"{self._path}: read back {len(read_back)} rows, wrote {len(ids)}")
+        final_path = self._path[:-len(".jsonl.gz.partial")] + f"-{ids[-1]}.jsonl.gz"
+        os.replace(self._path, final_path)
+        digest = hashlib.sha256()
+        with open(final_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        entry = {"path": os.path.relpath(final_path, self.archive_dir), "event_type": self.event_type,
+                 "day": str(self._day), "rows": len(ids), "first_id": ids[0], "last_id": ids[-1],
+                 "sha256": digest.hexdigest(), "archived_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        with open(os.path.join(self.archive_dir, "manifest.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry, ids
+
+
+def delete_ids(conn, ids, batch_size=500, pause_s=0.05):
+    """
+    Deletes by primary key in small committed batches, so no statement holds locks for long.
+    """
+    deleted = 0
+    with conn.cursor() as cursor:
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            cursor.execute(f"DELETE FROM session_logs WHERE id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+            conn.commit()
+            deleted += cursor.rowcount
+            if pause_s:
+                time.sleep(pause_s)
+    return deleted
+
+
+def archive_event_type(conn, event_type, cutoff, archive_dir, max_id, page_rows=5000, delete=True, delete_batch=500):
+    """
+    Exports every `event_type` row created before `cutoff` with an id up to `max_id` and,
+    unless `delete` is False, deletes each day's rows once its file is verified.
+    Returns (rows archived, rows deleted).
+    """
+    writer = DayPartitionWriter(archive_dir, event_type)
+    archived = deleted = 0
+    last_created, last_id = datetime(1970, 1, 1), 0
+
+    def finish(partitions):
+        nonlocal archived, deleted
+        for entry, ids in partitions:
+            archived += entry["rows"]
+            logger.info("archived %s (%d rows)", entry["path"], entry["rows"])
+            if delete:
+                deleted += delete_ids(conn, ids, delete_batch)
+
+    while True:
+        finished = []
+        cursor = conn.cursor(buffered=False)  # Rows are streamed from the server as they are read
+        cursor.execute(PAGE_QUERY, (event_type, cutoff, max_id, last_created, last_created, last_id, page_rows))
+        count = 0
+        for row in cursor:
+            last_created, last_id = row[1], row[0]
+            count += 1
+            partition = writer.write(row[1].date(), _row_to_record(row))
+            if partition is not None:
+                finished.append(partition)
+        cursor.close()
+        finish(finished)  # The connection is free again once the page is fully read
+        if count < page_rows:
+            break
+    partition = writer.close()
+    finish([partition] if partition is not None else [])
+    return archived, deleted
+
+
+def run(conn, policy, event_types=None, dry_run=False, ignore_rollups=False, **kwargs):
+    """
+    Archives every event type with a retention period. A dry run writes and verifies the
+    files in a temporary directory, removed afterwards, and deletes nothing.
+    """
+    if dry_run:
+        with tempfile.TemporaryDirectory(prefix="archive-dry-run-") as archive_dir:
+            return _run(conn, {**policy, "archive_dir": archive_dir}, event_types, False, ignore_rollups, **kwargs)
+    return _run(conn, policy, event_types, True, ignore_rollups, **kwargs)
+
+
+def _run(conn, policy, event_types, delete, ignore_rollups, **kwargs):
+    max_id = None if ignore_rollups else rollup_watermark(conn)
+    if max_id is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM session_logs")
+            max_id = cursor.fetchone()[0]
+    if event_types is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT event_type FROM session_logs")
+            event_types = [row[0] for row in cursor.fetchall()]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    totals = {}
+    for event_type in event_types:
+        days = retention_days(policy, event_type)
+        if days is None:
+            continue
+        archived, deleted = archive_event_type(conn, event_type, now - timedelta(days=days), policy["archive_dir"],
+                                               max_id, delete=delete, **kwargs)
+        totals[event_type] = {"retention_days": days, "archived": archived, "deleted": deleted, "max_id": max_id}
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive and expire old session_logs rows.")
+    parser.add_argument("--event-type", action="append", help="Only these event types (repeatable)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Export and verify into a temporary directory, keep no files and delete nothing")
+    parser.add_argument("--ignore-rollups", action="store_true",
+                        help="Do not stop at the rollups.py watermark (no rollup job runs against this database)")
+    parser.add_argument("--page-rows", type=int, default=5000)
+    parser.add_argument("--delete-batch", type=int, default=500)
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    import mysql.connector
+
+    secrets = load_secrets(args.secrets)
+    # created_at is compared with a UTC cutoff
+    conn = mysql.connector.connect(time_zone="+00:00", **secrets["mysql"])
+    try:
+        totals = run(conn, load_policy(secrets), args.event_type, args.dry_run, args.ignore_rollups,
+                     page_rows=args.page_rows, delete_batch=args.delete_batch)
+    finally:
+        conn.close()
+    print(json.dumps(totals, indent=2))
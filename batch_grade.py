@@ -0,0 +1,353 @@
+# batch_grade.py
+# Offline batch grading through the same GradingEngine the app uses.
+#
+#   python batch_grade.py answers.jsonl -o graded.jsonl
+#   python batch_grade.py exam.csv -o graded.jsonl --concurrency 16 --rate 5
+#   python batch_grade.py --from-mysql -o regraded.jsonl       # re-grade every SUBMISSION_ATTEMPT
+#   python batch_grade.py --from-mysql --since-id 120000 -o regraded.jsonl
+#   python batch_grade.py --summary-only -o regraded.jsonl     # just print the comparison summary
+#
+# Every answer is graded afresh by default, since re-grading after a prompt or model
+# change is the point; --reuse-grades also serves cached and near-duplicate grades
+# (faster and cheaper for a plain file of new answers). Reused grades are marked by
+# their evaluation_source and left out of the new-vs-original comparison.
+#
+# Input rows need `answer` and either `question_id` or the `question` text; `id`,
+# `session_id` and `original_score` are optional. The output file doubles as the
+# checkpoint: re-running with the same -o skips ids that are already graded. With
+# --from-mysql, <output>.watermark also records the session_logs id below which every
+# submission is graded, and a re-run resumes reading from there.
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+
+from app_config import DEFAULT_SECRETS_PATH, load_secrets
+from grading_engine import GradingEngine
+from knowledge_store import get_knowledge_store
+from resilience import ExponentialBackoff, TokenBucket
+
+# Every SUBMISSION_ATTEMPT with the score of the EVALUATION_RESULT that followed it
+# in the same session (before that session's next submission), one keyset page at a time
+HISTORY_QUERY = """
+SELECT s.id, s.session_id, s.details,
+    (SELECT e.score FROM session_logs e
+     WHERE e.session_id = s.session_id AND e.event_type = 'EVALUATION_RESULT' AND e.id > s.id
+       AND e.id < COALESCE((SELECT MIN(n.id) FROM session_logs n
+                            WHERE n.session_id = s.session_id AND n.event_type = 'SUBMISSION_ATTEMPT'
+                              AND n.id > s.id), 18446744073709551615)
+     ORDER BY e.id LIMIT 1) AS original_score
+FROM session_logs s
+WHERE s.event_type = 'SUBMISSION_ATTEMPT' AND s.id > %s
+ORDER BY s.id
+LIMIT %s
+"""
+
+
+# --- Input sources (all generators, so memory stays bounded) ---
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                row = json.loads(line)
+                row.setdefault("id", f"line-{line_number}")
+                yield row
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for line_number, row in enumerate(csv.DictReader(f), 2):
+            row.setdefault("id", f"line-{line_number}")
+            yield row
+
+
+async def read_mysql_history(db_config, since_id=0, page_rows=500):
+    """
+    Yields historical submissions with ids above `since_id`, one keyset page per query.
+    Each page is fetched whole on a worker thread, so the event loop never blocks on
+    MySQL and no server-side cursor stays open while answers are graded.
+    """
+    import mysql.connector
+
+    def fetch_page(conn, after_id):
+        with conn.cursor() as cursor:
+            cursor.execute(HISTORY_QUERY, (after_id, page_rows))
+            return cursor.fetchall()
+
+    conn = await asyncio.to_thread(mysql.connector.connect, **db_config)
+    try:
+        while rows := await asyncio.to_thread(fetch_page, conn, since_id):
+            for row_id, session_id, details, original_score in rows:
+                details = json.loads(details) if isinstance(details, (str, bytes)) else details
+                yield {
+                    "id": f"log-{row_id}",
+                    "resume_id": row_id,
+                    "session_id": session_id,
+                    "question": details.get("questionText"),
+                    "answer": details.get("studentAnswer", ""),
+                    "original_score": original_score,
+                }
+            since_id = rows[-1][0]
+            if len(rows) < page_rows:
+                break
+    finally:
+        await asyncio.to_thread(conn.close)
+
+
+async def _iterate(rows):
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+class ResumeWatermark:
+    """
+    Tracks rows that carry an increasing `resume_id` (the MySQL source) and keeps
+    `<output>.watermark` at the highest id below which every row is graded or skipped;
+    rows finish out of order, so that is the lowest one still in flight, minus one.
+    """
+
+    def __init__(self, output_path):
+        self.path = output_path + ".watermark"
+        self._dispatched = deque()
+        self._finished = set()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def dispatched(self, row):
+        if row.get("resume_id") is not None:
+            self._dispatched.append(row["resume_id"])
+
+    def finished(self, row):
+        if row.get("resume_id") is None:
+            return
+        self._finished.add(row["resume_id"])
+        watermark = None
+        while self._dispatched and self._dispatched[0] in self._finished:
+            watermark = self._dispatched.popleft()
+            self._finished.discard(watermark)
+        if watermark is not None:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(watermark))
+            os.replace(tmp_path, self.path)
+
+
+# Evaluation sources that reuse an earlier grade instead of grading the answer now
+REUSED_SOURCES = ("cache", "near_duplicate")
+
+
+def read_results(output_path):
+    """
+    Yields the graded rows of an output file. A last line that is not valid JSON (the
+    run was killed mid-write) is skipped with a warning; anywhere else it is an error.
+    """
+    with open(output_path, encoding="utf-8") as f:
+        torn_line = None
+        for line_number, line in enumerate(f, 1):
+            if torn_line is not None:
+                raise ValueError(f"{output_path}:{torn_line}: not a JSON line")
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                torn_line = line_number
+                continue
+            yield row
+    if torn_line is not None:
+        print(f"warning: {output_path}:{torn_line}: skipping an incomplete last line", file=sys.stderr)
+
+
+def repair_output(output_path):
+    """
+    Drops an incomplete last line before appending, so the next row does not run into it.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(max(0, size - (1 << 20)))
+        tail = f.read()
+        if tail.endswith(b"\n"):
+            return
+        start = tail.rfind(b"\n") + 1
+        try:
+            json.loads(tail[start:])
+        except ValueError:
+            print(f"warning: {output_path}: removing an incomplete last line", file=sys.stderr)
+            f.truncate(size - (len(tail) - start))
+        else:
+            f.write(b"\n")  # Complete but for the newline
+
+
+def load_done_ids(output_path):
+    if not os.path.exists(output_path):
+        return set()
+    return {row["id"] for row in read_results(output_path)}
+
+
+# --- Grading ---
+async def grade_one(engine, row, bucket, max_retries):
+    qid = row.get("question_id") or get_knowledge_store().id_for_question(row.get("question"))
+    output = {"id": row["id"], "question_id": qid, "answer": row.get("answer", ""),
+              "original_score": _as_int(row.get("original_score"))}
+    if qid not in engine.questions:
+        return {**output, "error": "unknown question"}
+
+    backoff = ExponentialBackoff(base=1.0, max_delay=30.0)
+    start = time.perf_counter()
+    for attempt in range(1, max_retries + 2):
+        await bucket.acquire()
+        result = await engine.grade(qid, output["answer"], row.get("session_id") or f"batch-{row['id']}")
+        if result.error is None or attempt > max_retries:
+            break
+        await asyncio.sleep(backoff.next_delay())
+    return {
+        **output,
+        "classification": result.classification,
+        "score": _as_int((result.evaluation or {}).get("score")),
+        "evaluation": result.evaluation,
+        "evaluation_source": result.evaluation_source,
+        "error": result.error or ("unparseable evaluation" if result.raw_response is not None else None),
+        "attempts": attempt,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "usage": result.usage,
+    }
+
+
+async def run_batch(rows, engine, output_path, concurrency, rate, max_retries):
+    repair_output(output_path)
+    done_ids = load_done_ids(output_path)
+    bucket = TokenBucket(rate)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = Counter()
+    watermark = ResumeWatermark(output_path)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def worker():
+            while (row := await queue.get()) is not None:
+                graded = await grade_one(engine, row, bucket, max_retries)
+                out.write(json.dumps(graded, ensure_ascii=False) + "\n")
+                out.flush()  # Every written line is a checkpoint
+                watermark.finished(row)
+                counts["graded"] += 1
+                counts["errors"] += graded.get("error") is not None
+                if counts["graded"] % 50 == 0:
+                    print(f"graded {counts['graded']} (errors: {counts['errors']})", file=sys.stderr)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        async for row in _iterate(rows):
+            watermark.dispatched(row)
+            if row["id"] in done_ids:
+                counts["skipped"] += 1
+                watermark.finished(row)
+                continue
+            await queue.put(row)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    return counts
+
+
+# --- Summary ---
+def summarize(output_path):
+    results = list(read_results(output_path))
+    # A reused grade says nothing about how the current prompt and model grade the answer
+    pairs = [(r["original_score"], r["score"]) for r in results
+             if r.get("original_score") is not None and r.get("score") is not None
+             and r.get("evaluation_source") not in REUSED_SOURCES]
+    new_scores = [r["score"] for r in results if r.get("score") is not None]
+    latencies = sorted(r["latency_ms"] for r in results if "latency_ms" in r)
+    summary = {
+        "items": len(results),
+        "errors": sum(1 for r in results if r.get("error")),
+        "classifications": dict(Counter(r.get("classification") for r in results)),
+        "reused_grades": sum(1 for r in results if r.get("evaluation_source") in REUSED_SOURCES),
+        "mean_new_score": round(sum(new_scores) / len(new_scores), 3) if new_scores else None,
+        "compared": len(pairs),
+        "mean_original_score": round(sum(o for o, _ in pairs) / len(pairs), 3) if pairs else None,
+        "mean_score_change": round(sum(n - o for o, n in pairs) / len(pairs), 3) if pairs else None,
+        "mean_abs_score_change": round(sum(abs(n - o) for o, n in pairs) / len(pairs), 3) if pairs else None,
+        "exact_agreement": round(sum(1 for o, n in pairs if o == n) / len(pairs), 3) if pairs else None,
+        "score_transitions": {f"{o}->{n}": c for (o, n), c in sorted(Counter(pairs).items())},
+        "latency_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+        "latency_ms_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        "prompt_tokens": sum(r.get("usage", {}).get("prompt_tokens", 0) for r in results),
+        "completion_tokens": sum(r.get("usage", {}).get("completion_tokens", 0) for r in results),
+    }
+    return summary
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _no_log(*args, **kwargs):
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade a file of answers, or re-grade logged submissions.")
+    parser.add_argument("input", nargs="?", help="JSONL or CSV file of answers")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--from-mysql", action="store_true", help="Re-grade every SUBMISSION_ATTEMPT in session_logs")
+    parser.add_argument("--since-id", type=int,
+                        help="With --from-mysql: only session_logs ids above this (default: <output>.watermark, else 0)")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="Gradings started per second")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--log-events", action="store_true", help="Also write the gradings to session_logs")
+    parser.add_argument("--reuse-grades", action="store_true",
+                        help="Serve cached and near-duplicate grades instead of grading every answer afresh")
+    parser.add_argument("--summary-only", action="store_true")
+    args = parser.parse_args()
+
+    if not args.summary_only:
+        secrets = load_secrets(args.secrets)
+        os.environ.setdefault("GEMINI_API_KEY", secrets["GEMINI_API_KEY"])
+        if args.from_mysql:
+            since_id = args.since_id if args.since_id is not None else ResumeWatermark(args.output).load()
+            rows = read_mysql_history(secrets["mysql"], since_id)
+        elif args.input and args.input.lower().endswith(".csv"):
+            rows = read_csv(args.input)
+        elif args.input:
+            rows = read_jsonl(args.input)
+        else:
+            parser.error("give an input file or --from-mysql")
+
+        log_event = _no_log
+        if args.log_events:
+            from event_logger import get_event_logger
+            log_event = get_event_logger(secrets["mysql"]).log
+
+        # Batch runs never stream or speculate; they only need the final grades
+        settings = {**secrets.get("grading", {}), "stream_evaluation": False, "speculative_evaluation": False}
+        if not args.reuse_grades:
+            settings.update(use_response_cache=False, use_near_duplicates=False)
+        engine = GradingEngine(log_event, settings)
+        counts = asyncio.run(run_batch(rows, engine, args.output, args.concurrency, args.rate, args.retries))
+        print(f"graded {counts['graded']}, skipped {counts['skipped']} already done, errors {counts['errors']}",
+              file=sys.stderr)
+
+    print(json.dumps(summarize(args.output), ensure_ascii=False, indent=2))
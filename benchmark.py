@@ -0,0 +1,274 @@
+# benchmark.py
+# End-to-end latency benchmark of the grading flow (one "הערך את תשובתי" click)
+# with no network and no real database: a deterministic fake LiteLLM backend and a
+# SQLite stand-in for session_logs.
+#
+#   python benchmark.py                                     # levels 1,2,4,8,16,32 -> benchmarks/<time>.json
+#   python benchmark.py --triage-ms 300 --evaluation-ms 1200 --submissions 400
+#   python benchmark.py --settings '{"micro_batch_evaluation": true}' --compare benchmarks/baseline.json
+#
+# Reports p50/p95/p99 per stage (triage, evaluation, parsing, every logging call by
+# event type, end to end) and throughput at each concurrency level.
+
+import os
+import tempfile
+
+# The response cache and near-duplicate index are process-wide SQLite files; keep the
+# benchmark's out of the real .cache directory (must happen before they are imported)
+os.environ.setdefault("PSYTRAINER_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="psytrainer-bench-"),
+                                                            "llm_responses.sqlite3"))
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from grading_engine import GradingEngine
+from knowledge_store import get_knowledge_store
+from triage_eval import load_eval_set
+
+CANNED_EVALUATION = {"score": 4, "justification": "התשובה נכונה ברובה.", "feedback": "כל הכבוד! כדאי להזכיר גם את מושגי המפתח החסרים."}
+
+# The benchmark measures the LLM path, so both answer caches are off unless --settings turns them on
+BENCHMARK_SETTINGS = {"use_response_cache": False, "use_near_duplicates": False}
+
+SESSION_LOGS_DDL = """
+CREATE TABLE IF NOT EXISTS session_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    session_id TEXT, event_type TEXT, details TEXT,
+    topic TEXT, difficulty TEXT, scope TEXT, score INTEGER
+)
+"""
+
+
+# --- Stand-ins ---
+class FakeLiteLLM:
+    """
+    Deterministic replacement for litellm.acompletion: fixed base latencies with seeded
+    jitter and canned outputs, including streaming and usage like the real client.
+    """
+
+    def __init__(self, triage_ms=400, evaluation_ms=1500, jitter=0.2, seed=0, triage_label="valid_attempt",
+                 evaluation=None, chunk_chars=12):
+        self.triage_ms = triage_ms
+        self.evaluation_ms = evaluation_ms
+        self.jitter = jitter
+        self.triage_label = triage_label
+        self.evaluation = evaluation or CANNED_EVALUATION
+        self.chunk_chars = chunk_chars
+        self._rng = random.Random(seed)
+        self.calls = defaultdict(int)
+        self.prompt_tokens = defaultdict(int)
+
+    async def __call__(self, model, messages, stream=False, **kwargs):
+        prompt = " ".join(message["content"] for message in messages)
+        if "classification agent" in prompt:
+            kind, content, latency_ms = "triage", self.triage_label, self.triage_ms
+        else:
+            batch_size = len(re.findall(r"^\s+\[\d+\] ", prompt, re.MULTILINE))
+            if batch_size:
+                kind = "batch_evaluation"
+                content = json.dumps({"evaluations": [{"index": i, **self.evaluation} for i in range(1, batch_size + 1)]},
+                                     ensure_ascii=False)
+            else:
+                kind, content = "evaluation", json.dumps(self.evaluation, ensure_ascii=False)
+            latency_ms = self.evaluation_ms
+        self.calls[kind] += 1
+        latency_ms *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        self.prompt_tokens[kind] += usage.prompt_tokens
+
+        if not stream:
+            await asyncio.sleep(latency_ms / 1000)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+        return self._stream(content, latency_ms, usage)
+
+    async def _stream(self, content, latency_ms, usage):
+        # Half the latency before the first token, the rest spread over the chunks
+        chunks = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        await asyncio.sleep(latency_ms / 2000)
+        for chunk in chunks:
+            await asyncio.sleep(latency_ms / 2000 / len(chunks))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class SqliteSessionLogs:
+    """
+    session_logs in a local SQLite file, written synchronously with a commit per event
+    (the cost model of the original one-connection-per-event logger).
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(SESSION_LOGS_DDL)
+
+    def log(self, session_id, event_type, details_dict, topic=None, difficulty=None, scope=None, score=None):
+        self.conn.execute(
+            "INSERT INTO session_logs (session_id, event_type, details, topic, difficulty, scope, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (session_id, event_type, json.dumps(details_dict, ensure_ascii=False), topic, difficulty, scope, score),
+        )
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM session_logs").fetchone()[0]
+
+
+# --- Measurement ---
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize_samples(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(percentile(ordered, 0.50), 3),
+        "p95": round(percentile(ordered, 0.95), 3),
+        "p99": round(percentile(ordered, 0.99), 3),
+    }
+
+
+def build_workload(submissions, seed=0):
+    """
+    Deterministic (question id, answer) pairs: the labeled triage answers spread over
+    every question, so the local fast path, the Triage Agent and the evaluator all run.
+    """
+    answers = [row["answer"] for row in load_eval_set()]
+    qids = get_knowledge_store().ids()
+    rng = random.Random(seed)
+    return [(rng.choice(qids), rng.choice(answers)) for _ in range(submissions)]
+
+
+async def run_level(engine, workload, concurrency, log_samples):
+    samples = defaultdict(list)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(index, qid, answer):
+        async with slots:
+            start = time.perf_counter()
+            result = await engine.grade(qid, answer, f"bench-{concurrency}-{index}", on_partial=lambda *_: None)
+            samples["total"].append((time.perf_counter() - start) * 1000)
+        for stage, key in (("triage", "triageMs"), ("evaluation", "evaluationMs"), ("parsing", "parseMs")):
+            if key in result.timing:
+                samples[stage].append(result.timing[key])
+        samples["errors"].append(1 if result.error else 0)
+
+    log_samples.clear()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i, qid, answer) for i, (qid, answer) in enumerate(workload)))
+    wall_s = time.perf_counter() - wall_start
+
+    errors = sum(samples.pop("errors"))
+    stages = {stage: summarize_samples(values) for stage, values in samples.items()}
+    stages.update({f"log.{event_type}": summarize_samples(values) for event_type, values in log_samples.items()})
+    return {
+        "concurrency": concurrency,
+        "submissions": len(workload),
+        "errors": errors,
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(len(workload) / wall_s, 2),
+        "stages_ms": stages,
+    }
+
+
+def run_benchmark(args):
+    fake = FakeLiteLLM(args.triage_ms, args.evaluation_ms, args.jitter, args.seed, args.triage_label)
+    session_logs = SqliteSessionLogs(os.path.join(tempfile.mkdtemp(prefix="psytrainer-bench-"), "session_logs.sqlite3"))
+    log_samples = defaultdict(list)
+
+    def log_event(session_id, event_type, details_dict, **kwargs):
+        start = time.perf_counter()
+        session_logs.log(session_id, event_type, details_dict, **kwargs)
+        log_samples[event_type].append((time.perf_counter() - start) * 1000)
+
+    settings = {**BENCHMARK_SETTINGS, **json.loads(args.settings)}
+    engine = GradingEngine(log_event, settings, acompletion=fake)
+    workload = build_workload(args.submissions, args.seed)
+
+    levels = []
+    for concurrency in args.concurrency:
+        level = asyncio.run(run_level(engine, workload, concurrency, log_samples))
+        levels.append(level)
+        print(f"concurrency {concurrency:>3}: {level['throughput_per_s']:>8.2f} submissions/s, "
+              f"p95 total {level['stages_ms']['total']['p95']:.1f} ms")
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "fake_backend": {"triage_ms": args.triage_ms, "evaluation_ms": args.evaluation_ms,
+                             "jitter": args.jitter, "seed": args.seed, "triage_label": args.triage_label},
+            "settings": settings,
+            "llm_calls": dict(fake.calls),
+            "prompt_tokens_per_call": {kind: round(fake.prompt_tokens[kind] / count, 1)
+                                       for kind, count in fake.calls.items()},
+            "logged_events": session_logs.count(),
+        },
+        "levels": levels,
+    }
+
+
+def compare(current, baseline):
+    """
+    Prints the p95 change of every stage at every concurrency level both runs share.
+    """
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        old = baseline_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"--- concurrency {level['concurrency']}: throughput "
+              f"{old['throughput_per_s']} -> {level['throughput_per_s']} /s")
+        for stage, stats in level["stages_ms"].items():
+            if stage in old["stages_ms"]:
+                before, after = old["stages_ms"][stage]["p95"], stats["p95"]
+                change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+                print(f"  {stage:<28} p95 {before:>10.3f} -> {after:>10.3f} ms  ({change})")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the grading flow against a fake LLM and SQLite session_logs.")
+    parser.add_argument("--concurrency", type=lambda text: [int(n) for n in text.split(",")], default=[1, 2, 4, 8, 16, 32],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--submissions", type=int, default=200, help="Submissions per level")
+    parser.add_argument("--triage-ms", type=float, default=400)
+    parser.add_argument("--evaluation-ms", type=float, default=1500)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter (0.2 = +-20%%)")
+    parser.add_argument("--triage-label", default="valid_attempt", help="Canned Triage Agent answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--settings", default="{}", help="JSON object of grading settings overrides")
+    parser.add_argument("-o", "--output", help="Results file (default: benchmarks/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    output = args.output or os.path.join("benchmarks", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
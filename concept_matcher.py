@@ -0,0 +1,158 @@
+# concept_matcher.py
+# Finds which key_concepts of a question a student's answer covers, in one pass
+# over the answer (Aho-Corasick over normalized Hebrew words). Tolerates niqqud,
+# final letter forms and attached prefix letters (ו/ה/ב/ל/מ/ש/כ).
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from hebrew_text import normalize_answer
+
+PREFIX_LETTERS = set("והבלמשכ")
+MAX_PREFIX_LETTERS = 3      # e.g. "ושכש..." is already implausible
+MIN_WORD_LENGTH = 3         # Shorter concept words ("על", "ל") are ignored unless nothing else is left
+
+# Coverage-based shortcuts that skip the Evaluator Agent (see grading secrets in the app)
+ZERO_COVERAGE_MAX_WORDS = 6         # A short answer with no concept at all
+FULL_COVERAGE_MIN_LENGTH_RATIO = 0.6  # Every concept, and at least this share of the ideal answer's length
+
+
+class AhoCorasick:
+    """
+    Minimal Aho-Corasick automaton. `find(text)` yields (start, pattern) for every occurrence.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0  # Depth-1 states fail to the root
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._out[state]:
+                yield i - len(pattern) + 1, pattern
+
+
+@dataclass
+class ConceptCoverage:
+    covered: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+
+    @property
+    def ratio(self):
+        total = len(self.covered) + len(self.missing)
+        return len(self.covered) / total if total else 0.0
+
+    def as_dict(self):
+        return {"covered": self.covered, "missing": self.missing, "ratio": round(self.ratio, 3)}
+
+
+def _concept_words(concept):
+    words = normalize_answer(concept, fold_finals=True).split()
+    content = [w for w in words if len(w) >= MIN_WORD_LENGTH]
+    return content or words
+
+
+class ConceptMatcher:
+    """
+    Matches all key concepts of one question at once. A concept counts as covered
+    when every one of its content words appears in the answer, in any order, at the
+    start of a word or after up to MAX_PREFIX_LETTERS prefix letters.
+    """
+
+    def __init__(self, concepts):
+        self.concepts = list(concepts)
+        self._words = {concept: _concept_words(concept) for concept in self.concepts}
+        self._automaton = AhoCorasick({w for words in self._words.values() for w in words})
+
+    def match(self, answer):
+        text = " " + normalize_answer(answer, fold_finals=True) + " "
+        found = set()
+        for start, word in self._automaton.find(text):
+            if word in found:
+                continue
+            # Walk back to the start of the answer word; only prefix letters may precede the match
+            word_start = start
+            while text[word_start - 1] != " ":
+                word_start -= 1
+            prefix = text[word_start:start]
+            if len(prefix) <= MAX_PREFIX_LETTERS and set(prefix) <= PREFIX_LETTERS:
+                found.add(word)
+
+        coverage = ConceptCoverage()
+        for concept in self.concepts:
+            (coverage.covered if all(w in found for w in self._words[concept]) else coverage.missing).append(concept)
+        return coverage
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def concept_coverage(unit, answer):
+    """
+    Coverage of `unit['key_concepts']` by `answer`, with the matcher built once per concept list.
+    """
+    key = tuple(unit["key_concepts"])
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            matcher = _matchers[key] = ConceptMatcher(key)
+    return matcher.match(answer)
+
+
+def coverage_shortcut(unit, answer, coverage):
+    """
+    Returns a locally produced evaluation dict for the clear-cut cases, or None:
+    - no concept covered and a very short answer -> score 1
+    - every concept covered and an answer of comparable length to the ideal one -> score 5
+    """
+    answer_words = len(normalize_answer(answer).split())
+    ideal_words = len(normalize_answer(unit["ideal_answer"]).split())
+    if not coverage.covered and answer_words <= ZERO_COVERAGE_MAX_WORDS:
+        return {
+            "score": 1,
+            "justification": "התשובה אינה מתייחסת לאף אחד מהמושגים המרכזיים של השאלה.",
+            "feedback": f"כדאי לחזור לעמוד {unit['page_number']} ולשים לב למושגים: {', '.join(unit['key_concepts'])}.",
+        }
+    if not coverage.missing and answer_words >= FULL_COVERAGE_MIN_LENGTH_RATIO * ideal_words:
+        return {
+            "score": 5,
+            "justification": "התשובה מתייחסת לכל המושגים המרכזיים של השאלה.",
+            "feedback": "כל הכבוד! התשובה שלך מלאה ומדויקת.",
+        }
+    return None
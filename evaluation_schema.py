@@ -0,0 +1,210 @@
+# evaluation_schema.py
+# Parsing of Evaluator Agent responses against an explicit schema, with local repair
+# of the usual malformations in one pass: code fences, text around the object, a
+# string or fractional score, missing or non-string justification/feedback, and as a
+# last resort the legacy markdown "**ציון:** 4/5" format. Only a response with no
+# recoverable score counts as failed (grading_engine.py then retries once).
+#
+#   evaluation, repairs = parse_evaluation(text)     # evaluation is None if unrecoverable
+
+import json
+import math
+import re
+import threading
+
+SCORE_RANGE = (1, 5)
+EVALUATION_SCHEMA = {
+    "score": {"type": int, "required": True},
+    "justification": {"type": str, "default": "לא סופק נימוק."},
+    "feedback": {"type": str, "default": "לא סופק משוב."},
+}
+
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_FRACTION = re.compile(r"(\d+(?:\.\d+)?)\s*(?:/|מתוך|out of)\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def parse_score_from_feedback(feedback_text):
+    """
+    Score from the legacy markdown feedback format ("**ציון:** 4/5"), or None.
+    """
+    match = re.search(r'\*\*?ציון:\*\*?\s*(\d+)\s*/\s*5', feedback_text)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def extract_balanced_object(text):
+    """
+    The first balanced {...} in `text` (braces inside JSON strings are ignored), or None.
+    """
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for index in range(start, len(text)):
+            char = text[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:index + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def load_json_object(text, repairs):
+    """
+    Decodes a JSON object from `text`, stripping fences and surrounding text if needed;
+    every repair applied is appended to `repairs`. Returns a dict or None.
+    """
+    if not isinstance(text, str):
+        return None
+    try:
+        value = json.loads(text)
+        return value if isinstance(value, dict) else None
+    except json.JSONDecodeError:
+        pass
+    fenced = _FENCE.match(text)
+    if fenced:
+        repairs.append("strip_fences")
+        text = fenced.group(1)
+        try:
+            value = json.loads(text)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+    candidate = extract_balanced_object(text)
+    if candidate is None:
+        return None
+    try:
+        value = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    repairs.append("extract_object")
+    return value if isinstance(value, dict) else None
+
+
+def _round_half_up(value):
+    return math.floor(value + 0.5)  # round() would make 2.5 -> 2 but 3.5 -> 4
+
+
+def coerce_score(value):
+    """
+    An int score in SCORE_RANGE from an int, a float or a string such as "4", "4/5",
+    "8/10", "4 מתוך 5", "ציון: 4" or "1-5: 4" (the part after the last ':' counts);
+    None if there is none or the string is ambiguous ("3 או 4"), so the repair prompt runs.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        score = _round_half_up(value)
+    elif isinstance(value, str):
+        text = value.rsplit(":", 1)[-1]
+        numbers = _NUMBER.findall(text)
+        fraction = _FRACTION.search(text)
+        if fraction is not None and len(numbers) == 2:
+            score = float(fraction.group(1))
+            if float(fraction.group(2)) not in (0, SCORE_RANGE[1]):
+                score = score / float(fraction.group(2)) * SCORE_RANGE[1]  # "8/10" -> 4
+        elif len(numbers) == 1:
+            score = float(numbers[0])
+        else:
+            return None
+        score = _round_half_up(score)
+    else:
+        return None
+    return score if SCORE_RANGE[0] <= score <= SCORE_RANGE[1] else None
+
+
+def validate_evaluation(data, repairs):
+    """
+    Checks a decoded object against EVALUATION_SCHEMA, coercing the score and filling
+    defaults; returns the clean {score, justification, feedback} or None without a usable score.
+    """
+    if not isinstance(data, dict):
+        return None
+    evaluation = {}
+    for key, rule in EVALUATION_SCHEMA.items():
+        value = data.get(key)
+        if isinstance(value, rule["type"]) and not isinstance(value, bool):
+            if key == "score" and not SCORE_RANGE[0] <= value <= SCORE_RANGE[1]:
+                return None
+            evaluation[key] = value
+        elif key == "score":
+            score = coerce_score(value)
+            if score is None:
+                return None
+            repairs.append("coerce_score")
+            evaluation[key] = score
+        elif value is not None and not isinstance(value, (dict, list)):
+            repairs.append(f"coerce_{key}")
+            evaluation[key] = str(value)
+        else:
+            repairs.append(f"default_{key}")
+            evaluation[key] = rule["default"]
+    return evaluation
+
+
+def parse_evaluation(text):
+    """
+    Returns (evaluation or None, list of repairs applied).
+    """
+    repairs = []
+    evaluation = validate_evaluation(load_json_object(text, repairs), repairs)
+    if evaluation is not None:
+        return evaluation, repairs
+    if isinstance(text, str):
+        score = parse_score_from_feedback(text)
+        if score is not None:
+            return {"score": score, "justification": EVALUATION_SCHEMA["justification"]["default"],
+                    "feedback": text.strip()}, ["legacy_markdown"]
+    return None, repairs
+
+
+class ParseStats:
+    """
+    Counts how evaluator responses were parsed: clean, repaired locally (per repair),
+    retried, recovered by the retry, or failed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"responses": 0, "clean": 0, "repaired": 0, "retried": 0, "retry_recovered": 0, "failed": 0}
+        self._repairs = {}
+
+    def record(self, repairs, retried=False, ok=True):
+        with self._lock:
+            self._counts["responses"] += 1
+            if not ok:
+                self._counts["failed"] += 1
+            elif retried:
+                self._counts["retry_recovered"] += 1
+            elif repairs:
+                self._counts["repaired"] += 1
+            else:
+                self._counts["clean"] += 1
+            self._counts["retried"] += retried
+            for repair in repairs:
+                self._repairs[repair] = self._repairs.get(repair, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self._counts)
+            snapshot["repairs"] = dict(self._repairs)
+        responses = snapshot["responses"]
+        snapshot["repair_rate"] = round(snapshot["repaired"] / responses, 4) if responses else 0.0
+        snapshot["retry_rate"] = round(snapshot["retried"] / responses, 4) if responses else 0.0
+        # Every local repair is a re-request that did not have to be paid for
+        snapshot["retries_avoided"] = snapshot["repaired"]
+        return snapshot
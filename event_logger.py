@@ -0,0 +1,285 @@
+# event_logger.py
+# Pooled, asynchronous, batched writer for the session_logs table.
+# The Streamlit script thread only enqueues events; a single background thread
+# drains the queue, appends each batch to the local spool (event_spool.py) and
+# then ships the spool to MySQL with multi-row inserts over a shared pool.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import mysql.connector
+from mysql.connector import pooling
+
+from event_spool import REPLAY_QUERY, EventSpool, event_to_row, orphaned_spools, replay_spool
+from resilience import CircuitBreaker, ExponentialBackoff
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel that tells the writer thread to drain and exit
+
+
+class EventLogger:
+    """
+    Collects session_logs events in memory and writes them from a background thread.
+
+    Events are spooled and shipped when `batch_size` events are waiting or
+    `flush_interval` seconds have passed since the oldest unflushed event.
+    While MySQL is down the circuit breaker stays open and events just accumulate
+    in the spool; they are replayed with exponential backoff once it recovers.
+    """
+
+    def __init__(self, db_config, pool_size=4, batch_size=50, flush_interval=0.5, max_queue=10000,
+                 spool=None, connect_timeout=3):
+        self.db_config = dict(db_config)
+        self.db_config.setdefault("connection_timeout", connect_timeout)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pool = None
+        self._spool = spool or EventSpool()
+        self._breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5.0, name="session_logs")
+        self._backoff = ExponentialBackoff(base=1.0, max_delay=120.0)
+        self._next_ship_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "ship_attempts": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="session-logs-writer", daemon=True)
+        self._thread.start()
+
+    # --- Public API ---
+    def log(self, session_id, event_type, details_dict, topic=None, difficulty=None, scope=None, score=None):
+        """
+        Enqueues one event. Never blocks the caller; drops the event if the queue is full.
+        """
+        with get_tracer().span("log_event", event_type=event_type):
+            return self._enqueue(session_id, event_type, details_dict, topic, difficulty, scope, score)
+
+    def _enqueue(self, session_id, event_type, details_dict, topic, difficulty, scope, score):
+        record = {
+            "event_id": str(uuid.uuid4()),
+            "event_time": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "session_id": session_id,
+            "event_type": event_type,
+            "details": json.dumps(details_dict, ensure_ascii=False),
+            "topic": topic,
+            "difficulty": difficulty,
+            "scope": scope,
+            "score": score,
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._bump("dropped")
+            logger.warning("session_logs queue is full, dropping %s event", event_type)
+            return False
+        self._bump("enqueued")
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Flushes everything that was enqueued and stops the writer thread.
+        """
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        Returns a snapshot of the queue-depth and flush-latency counters.
+        """
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["spool_pending_bytes"] = self._spool.pending_bytes()
+        snapshot["breaker_state"] = self._breaker.state
+        flushes = snapshot["flushes"]
+        snapshot["avg_flush_ms"] = snapshot["total_flush_ms"] / flushes if flushes else 0.0
+        return snapshot
+
+    # --- Writer thread ---
+    def _run(self):
+        batch = []
+        deadline = None
+        self._ship()  # Replay anything left over from a previous process
+        self._replay_orphans()
+        while True:
+            wakeups = [t for t in (deadline, self._retry_at()) if t is not None]
+            timeout = max(0.0, min(wakeups) - time.monotonic()) if wakeups else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Drain whatever is still in the queue before exiting
+                while True:
+                    try:
+                        leftover = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if leftover is not _STOP:
+                        batch.append(leftover)
+                if batch:
+                    self._flush_guarded(batch)
+                self._spool.close()
+                return
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush_guarded(batch)
+                batch = []
+                deadline = None
+            elif not batch and self._retry_at() is not None and time.monotonic() >= self._retry_at():
+                self._ship()
+
+    def _flush_guarded(self, batch):
+        """
+        `_flush`, except that a batch that cannot even be spooled (disk full, a value
+        that does not serialize) is logged and dropped instead of killing the thread.
+        """
+        try:
+            self._flush(batch)
+        except Exception:
+            self._bump("dropped", len(batch))
+            logger.exception("Could not spool %d session_logs events, dropping them", len(batch))
+
+    def _replay_orphans(self):
+        """
+        Ships the spools of processes that stopped before they were fully shipped
+        (`python event_spool.py` does the same when no writer is running).
+        """
+        conn = None
+        try:
+            for spool in orphaned_spools(os.path.dirname(self._spool.path), exclude={self._spool.name}):
+                try:
+                    if conn is None:
+                        conn = self._get_pool().get_connection()
+                    self._bump("written", replay_spool(spool, conn))
+                finally:
+                    spool.close(remove_if_shipped=True)
+        except Exception as err:
+            logger.error("Could not replay spools left by stopped processes, will retry on next start: %s", err)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _retry_at(self):
+        """
+        Monotonic time of the next replay attempt, or None if the spool is fully shipped.
+        """
+        if self._spool.pending_bytes() <= 0:
+            return None
+        return max(self._next_ship_at, time.monotonic() + self._breaker.seconds_until_retry())
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name="session_logs_pool",
+                pool_size=self.pool_size,
+                pool_reset_session=False,
+                **self.db_config,
+            )
+        return self._pool
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        with get_tracer().span("spool_append", rows=len(batch)):
+            self._spool.append(batch)  # One fsync per batch
+        self._ship()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+
+    def _ship(self):
+        """
+        Ships pending spooled events to MySQL, unless the breaker or backoff say wait.
+        """
+        if time.monotonic() < self._next_ship_at or not self._breaker.allow():
+            return
+        self._bump("ship_attempts")
+        conn = None
+        try:
+            conn = self._get_pool().get_connection()
+            while True:
+                events, end_offset = self._spool.read_pending(self.batch_size * 10)
+                if not events:
+                    break
+                with get_tracer().span("db_write", rows=len(events)):
+                    with conn.cursor() as cursor:
+                        cursor.executemany(REPLAY_QUERY, [event_to_row(e) for e in events])
+                    conn.commit()
+                self._spool.ack(end_offset)
+                self._bump("written", len(events))
+            self._breaker.record_success()
+            self._backoff.reset()
+            self._next_ship_at = 0.0
+        except Exception as err:
+            self._breaker.record_failure()
+            self._bump("failed")
+            self._next_ship_at = time.monotonic() + self._backoff.next_delay()
+            if isinstance(err, mysql.connector.Error):
+                logger.error("Could not ship spooled session_logs events, will retry: %s", err)
+            else:
+                logger.exception("Unexpected error while shipping spooled session_logs events, will retry")
+        finally:
+            if conn is not None:
+                conn.close()  # Returns the connection to the pool
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+# --- Process-wide singleton shared by every Streamlit session ---
+_event_logger = None
+_event_logger_lock = threading.Lock()
+
+
+def get_event_logger(db_config):
+    """
+    Returns the process-wide EventLogger, creating it on first use.
+    """
+    global _event_logger
+    with _event_logger_lock:
+        if _event_logger is None:
+            _event_logger = EventLogger(db_config)
+            atexit.register(_event_logger.close)
+        return _event_logger
+
+
+def set_event_logger(event_logger):
+    """
+    Replaces the process-wide logger, e.g. with a local stand-in for load tests.
+    Anything with EventLogger's `log()` signature works.
+    """
+    global _event_logger
+    with _event_logger_lock:
+        _event_logger = event_logger
@@ -0,0 +1,215 @@
+# event_spool.py
+# Durable local write-ahead spool for session_logs events.
+# Every event is appended to an append-only JSONL file before we try MySQL, so a
+# database outage never loses an event and never blocks the student.
+# The replayer ships spooled events idempotently (INSERT IGNORE on event_id).
+#
+# Each process (Streamlit workers, grading_server.py, batch_grade.py) writes its own
+# spool, session_logs-<pid>.jsonl, and holds an exclusive lock on it while it is open,
+# so no two processes ever append to or truncate the same file. Spools left behind by
+# stopped processes are picked up by the next writer (or this module's CLI).
+
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; spools are then only separated by pid
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_DIR = os.environ.get("PSYTRAINER_SPOOL_DIR", ".spool")
+
+# Column order of a spooled event; matches REPLAY_QUERY below
+EVENT_FIELDS = ("event_id", "event_time", "session_id", "event_type", "details", "topic", "difficulty", "scope", "score")
+
+REPLAY_QUERY = """
+INSERT IGNORE INTO session_logs (event_id, event_time, session_id, event_type, details, topic, difficulty, scope, score)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _lock_file(path, blocking=True):
+    """
+    Opens `path` and takes an exclusive flock on it; raises BlockingIOError when
+    `blocking` is False and another process holds it.
+    """
+    f = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            f.close()
+            raise
+    return f
+
+
+class EventSpool:
+    """
+    Append-only JSONL spool with a separate acknowledged-offset file, owned by one
+    process at a time (the default name is per process; see the module header).
+
+    - `append(events)` writes a batch and fsyncs once for the whole batch.
+    - `read_pending(limit)` returns the next unacknowledged events and the byte
+      offset just past them.
+    - `ack(offset)` records that everything before `offset` reached the database.
+      Once the whole file is acknowledged it is truncated.
+    """
+
+    def __init__(self, spool_dir=DEFAULT_SPOOL_DIR, name=None, compact_bytes=1 << 20, wait_for_lock=True):
+        os.makedirs(spool_dir, exist_ok=True)
+        self.name = name or f"session_logs-{os.getpid()}"
+        self.path = os.path.join(spool_dir, f"{self.name}.jsonl")
+        self.offset_path = os.path.join(spool_dir, f"{self.name}.offset")
+        self.compact_bytes = compact_bytes
+        self._owner = _lock_file(os.path.join(spool_dir, f"{self.name}.lock"), wait_for_lock)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "ab")
+        self._acked = self._load_offset()
+
+    # --- Writing ---
+    def append(self, events):
+        """
+        Appends a batch of event dicts and fsyncs once.
+        """
+        if not events:
+            return
+        payload = b"".join(
+            json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            for event in events
+        )
+        with self._lock:
+            self._file.write(payload)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    # --- Reading / acknowledging ---
+    def read_pending(self, limit=500):
+        """
+        Returns (events, end_offset) for up to `limit` unacknowledged events.
+        A trailing partial line (torn write) is left for later.
+        """
+        events = []
+        with self._lock:
+            offset = self._acked
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                while len(events) < limit:
+                    line = f.readline()
+                    if not line or not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.error("Skipping corrupt spool line at offset %d", offset - len(line))
+        return events, offset
+
+    def ack(self, offset):
+        with self._lock:
+            self._acked = offset
+            size = os.path.getsize(self.path)
+            if offset >= size and size >= self.compact_bytes:
+                # Everything is shipped: start over with an empty spool
+                self._file.truncate(0)
+                self._acked = 0
+            self._store_offset()
+
+    def pending_bytes(self):
+        with self._lock:
+            return os.path.getsize(self.path) - self._acked
+
+    def close(self, remove_if_shipped=False):
+        """
+        Closes the spool and releases it; with `remove_if_shipped` its files are
+        deleted first if every event has been acknowledged.
+        """
+        with self._lock:
+            self._file.close()
+            if remove_if_shipped and os.path.getsize(self.path) <= self._acked:
+                for path in (self.path, self.offset_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._owner.close()
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path, "r", encoding="utf-8") as f:
+                offset = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            offset = 0
+        return min(offset, os.path.getsize(self.path))
+
+    def _store_offset(self):
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(self._acked))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.offset_path)
+
+
+def orphaned_spools(spool_dir=DEFAULT_SPOOL_DIR, exclude=()):
+    """
+    Yields an open EventSpool for every spool in `spool_dir` that no running process
+    holds (names in `exclude` are skipped). The caller closes each one.
+    """
+    for path in sorted(glob.glob(os.path.join(spool_dir, "session_logs*.jsonl"))):
+        name = os.path.basename(path)[:-len(".jsonl")]
+        if name in exclude:
+            continue
+        try:
+            yield EventSpool(spool_dir, name, wait_for_lock=False)
+        except BlockingIOError:
+            continue  # Still owned by a live process
+
+
+def event_to_row(event):
+    return tuple(event.get(field) for field in EVENT_FIELDS)
+
+
+def replay_spool(spool, conn, batch_size=500):
+    """
+    Ships every pending spooled event through `conn`. Returns the number of events shipped.
+    Safe to run repeatedly: duplicates are ignored thanks to the unique event_id.
+    """
+    shipped = 0
+    while True:
+        events, end_offset = spool.read_pending(batch_size)
+        if not events:
+            return shipped
+        with conn.cursor() as cursor:
+            cursor.executemany(REPLAY_QUERY, [event_to_row(e) for e in events])
+        conn.commit()
+        spool.ack(end_offset)
+        shipped += len(events)
+
+
+# --- Command line: replay the spools left behind by stopped processes ---
+if __name__ == "__main__":
+    import mysql.connector
+
+    from app_config import DEFAULT_SECRETS_PATH, load_secrets
+
+    parser = argparse.ArgumentParser(description="Replay spooled session_logs events into MySQL.")
+    parser.add_argument("--spool-dir", default=DEFAULT_SPOOL_DIR)
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    args = parser.parse_args()
+
+    db_secrets = load_secrets(args.secrets)["mysql"]
+    conn = mysql.connector.connect(**db_secrets)
+    replayed = 0
+    try:
+        for spool in orphaned_spools(args.spool_dir):
+            try:
+                replayed += replay_spool(spool, conn)
+            finally:
+                spool.close(remove_if_shipped=True)
+        print(f"Replayed {replayed} events.")
+    finally:
+        conn.close()
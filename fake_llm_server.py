@@ -0,0 +1,114 @@
+# fake_llm_server.py
+# Local OpenAI-compatible endpoint with injected latency and errors, for exercising
+# model_router.py (deadlines, hedging, fallback, circuit breaking) without Gemini.
+#
+#   python fake_llm_server.py --port 8700 --profile fast:200:50:0 --profile flaky:1500:1000:0.3:0.1
+#
+# A profile is name:latency_ms:jitter_ms:error_rate[:hang_rate]. Point the grading
+# settings at it with routes such as
+#   evaluation_models = [{model = "openai/flaky", api_base = "http://localhost:8700/v1", api_key = "fake"},
+#                        {model = "openai/fast", api_base = "http://localhost:8700/v1", api_key = "fake"}]
+# Answers are canned: `valid_attempt` for the Triage Agent, a score-3 evaluation for
+# the Evaluator Agent and one evaluation per answer for batched evaluations.
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+DEFAULT_PROFILE = {"latency_ms": 300, "jitter_ms": 100, "error_rate": 0.0, "hang_rate": 0.0}
+HANG_SECONDS = 600
+
+CANNED_EVALUATION = {"score": 3, "justification": "התשובה נכונה בחלקה.", "feedback": "כדאי להרחיב ולהזכיר את מושגי המפתח."}
+
+
+def parse_profile(text):
+    name, *numbers = text.split(":")
+    latency_ms, jitter_ms, error_rate, hang_rate = (list(map(float, numbers)) + [0.0, 0.0, 0.0, 0.0])[:4]
+    return name, {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "hang_rate": hang_rate}
+
+
+def canned_reply(prompt):
+    if "classification agent" in prompt:
+        return "valid_attempt"
+    batch_size = len(re.findall(r"^\s+\[\d+\] ", prompt, re.MULTILINE))
+    if batch_size:
+        return json.dumps({"evaluations": [{"index": i, **CANNED_EVALUATION} for i in range(1, batch_size + 1)]},
+                          ensure_ascii=False)
+    return json.dumps(CANNED_EVALUATION, ensure_ascii=False)
+
+
+async def handle_chat_completions(request):
+    payload = await request.json()
+    profiles, rng, counters = request.app["profiles"], request.app["rng"], request.app["counters"]
+    model = payload.get("model", "")
+    profile = profiles.get(model, DEFAULT_PROFILE)
+    counters[model] = counters.get(model, 0) + 1
+
+    roll = rng.random()
+    if roll < profile["hang_rate"]:
+        await asyncio.sleep(HANG_SECONDS)
+    await asyncio.sleep(max(0.0, profile["latency_ms"] + rng.uniform(-1, 1) * profile["jitter_ms"]) / 1000)
+    if roll < profile["hang_rate"] + profile["error_rate"]:
+        return web.json_response({"error": {"message": "injected failure", "type": "server_error"}}, status=503)
+
+    prompt = " ".join(str(message.get("content", "")) for message in payload.get("messages", []))
+    content = canned_reply(prompt)
+    usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": model}
+
+    if not payload.get("stream"):
+        return web.json_response({
+            **base, "object": "chat.completion", "usage": usage,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for start in range(0, len(content), 12):
+        chunk = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "finish_reason": None, "delta": {"content": content[start:start + 12]}}]}
+        await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await asyncio.sleep(0.01)
+    final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]}
+    await response.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+    if payload.get("stream_options", {}).get("include_usage"):
+        usage_chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+        await response.write(f"data: {json.dumps(usage_chunk)}\n\n".encode("utf-8"))
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+async def handle_stats(request):
+    return web.json_response(request.app["counters"])
+
+
+def make_app(profiles, seed=0):
+    app = web.Application()
+    app["profiles"] = profiles
+    app["rng"] = random.Random(seed)
+    app["counters"] = {}
+    app.add_routes([
+        web.post("/v1/chat/completions", handle_chat_completions),
+        web.post("/chat/completions", handle_chat_completions),
+        web.get("/stats", handle_stats),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM endpoint with injected delays and errors.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--profile", action="append", default=[], help="name:latency_ms:jitter_ms:error_rate[:hang_rate]")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    web.run_app(make_app(dict(parse_profile(p) for p in args.profile), args.seed), host=args.host, port=args.port)
@@ -0,0 +1,35 @@
+# grading_client.py
+# Minimal blocking client for grading_server.py, used by the Streamlit page when
+# `service_url` is set in the [grading] secrets; `service_token` from the same section
+# is sent with every request.
+
+import json
+import urllib.request
+
+from grading_engine import GradingResult
+
+TOKEN_HEADER = "X-Grading-Token"
+
+
+def grade_remote(service_url, qid, answer, session_id, on_partial=None, timeout=120, token=None):
+    """
+    Sends one submission to the grading service and returns its GradingResult.
+    Streamed partial evaluations are forwarded to `on_partial(score, justification, feedback)`.
+    """
+    payload = {"question_id": qid, "answer": answer, "session_id": session_id, "stream": on_partial is not None}
+    request = urllib.request.Request(
+        service_url.rstrip("/") + "/grade",
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json", TOKEN_HEADER: token or ""},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if on_partial is None:
+            return GradingResult(**json.loads(response.read()))
+        for line in response:
+            message = json.loads(line)
+            if message.pop("type") == "partial":
+                on_partial(message["score"], message["justification"], message["feedback"])
+            else:
+                return GradingResult(**message)
+    raise ConnectionError("Grading service closed the stream without a result")
@@ -0,0 +1,434 @@
+# grading_engine.py
+# Headless grading pipeline: prompt building, triage, evaluation, parsing and
+# logging behind one async `grade(question_id, answer, session_id)` call.
+# Used in-process by the Streamlit page and by grading_server.py.
+
+import json
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from concept_matcher import concept_coverage, coverage_shortcut
+from evaluation_schema import ParseStats, parse_evaluation
+from incremental_json import IncrementalJsonObjectParser
+from knowledge_store import get_knowledge_store, question_id
+from local_triage import fast_path_triage
+from micro_batching import MicroBatcher
+from model_router import ModelRouter
+from prompts import (EVALUATION_COVERAGE_PROMPT_TEMPLATE, EVALUATION_MODEL, EVALUATION_PROMPT_TEMPLATE,
+                     EVALUATION_REPAIR_PROMPT, FALLBACK_MODEL, TRIAGE_MODEL, TRIAGE_PROMPT_TEMPLATE,
+                     build_coverage_evaluation_prompt, build_evaluation_prompt, build_triage_prompt,
+                     coverage_evaluation_prompt_prefix, evaluation_prompt_prefix, parse_triage_label)
+from response_cache import get_response_cache, make_cache_key, unit_fingerprint
+from similarity_index import get_near_duplicate_index
+from speculation import get_speculative_executor
+from tracing import get_tracer
+
+DEFAULT_SETTINGS = {
+    "compact_evaluation_prompt": False,      # Send the concept coverage summary instead of the ideal answer
+    "skip_llm_on_extreme_coverage": False,   # Grade zero/full concept coverage answers locally
+    "stream_evaluation": True,               # Stream the evaluation (on_partial gets each update)
+    "speculative_evaluation": False,         # Fire the evaluation together with the Triage Agent call
+    "use_response_cache": True,              # Reuse cached triage/evaluation responses (response_cache.py)
+    "use_near_duplicates": True,             # Reuse grades of near-identical answers (similarity_index.py)
+    "micro_batch_evaluation": False,         # Coalesce concurrent evaluations of a question (micro_batching.py)
+    "micro_batch_size": 8,
+    "micro_batch_wait_ms": 50,
+    # Routes for model_router.py, primary first (model names or dicts of litellm kwargs)
+    "triage_models": [TRIAGE_MODEL, FALLBACK_MODEL],
+    "evaluation_models": [EVALUATION_MODEL, FALLBACK_MODEL],
+    "llm_deadline_s": 30,                    # Per-call deadline across fallbacks and hedges
+    "hedge_requests": True,                  # Ask the next model too once the primary passes its p95
+}
+
+NO_KNOWLEDGE_TEXT = (
+    "אין שום בעיה! זו הרגשה טבעית לגמרי בתהליך למידה. "
+    "הנושא הזה מופיע בעמוד {page_number}. נסי לקרוא שוב את החלק הרלוונטי ולנסות שוב!"
+)
+GIBBERISH_TEXT = "נראה שהתשובה שהוקלדה אינה ברורה. אנא נסי לנסח תשובה מלאה."
+
+
+@dataclass
+class GradingResult:
+    submission_id: str
+    classification: str = None     # valid_attempt / no_knowledge / gibberish / empty_answer / unknown text
+    triage_source: str = None       # local / cache / llm
+    evaluation: dict = None         # {"score", "justification", "feedback"} when graded
+    evaluation_source: str = None   # cache / coverage_rule / near_duplicate / llm / llm_batch
+    response_type: str = None       # hint_and_encourage / request_clearer_answer
+    response_text: str = None
+    raw_response: str = None        # Set when the evaluation could not be parsed
+    error: str = None
+    error_type: str = None          # Exception class name, e.g. LLMUnavailableError
+    timing: dict = field(default_factory=dict)
+    usage: dict = field(default_factory=dict)  # prompt_tokens / completion_tokens summed over LLM calls
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _add_usage(result, response):
+    """
+    Adds the token counts of one LiteLLM response (or stream chunk) to the result.
+    """
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return
+    for key in ("prompt_tokens", "completion_tokens"):
+        result.usage[key] = result.usage.get(key, 0) + (getattr(usage, key, 0) or 0)
+
+
+def _add_usage_dict(result, usage):
+    for key, value in usage.items():
+        result.usage[key] = result.usage.get(key, 0) + value
+
+
+class GradingEngine:
+    """
+    Grades one submission at a time per call; many calls can run concurrently on one event loop.
+
+    `log_event(session_id, event_type, details_dict, topic=None, difficulty=None, scope=None, score=None)`
+    receives every session_logs event; pass `log_event_to_mysql` or `EventLogger.log`.
+    `acompletion` replaces litellm.acompletion for every LLM call (benchmark.py uses a fake).
+    """
+
+    def __init__(self, log_event, settings=None, questions=None, acompletion=None):
+        self.log_event = log_event
+        self.acompletion = acompletion
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        # Question id -> unit; the compiled knowledge store unless an explicit list is given
+        self.questions = ({question_id(unit): unit for unit in questions} if questions is not None
+                          else get_knowledge_store())
+        self.response_cache = get_response_cache()
+        self.near_index = get_near_duplicate_index()
+        self.speculative_executor = get_speculative_executor()
+        self.triage_router = self._make_router(self.settings["triage_models"])
+        self.evaluation_router = self._make_router(self.settings["evaluation_models"])
+        self.parse_stats = ParseStats()
+        self.micro_batcher = MicroBatcher(self.evaluation_router.complete,
+                                          self.settings["micro_batch_size"], self.settings["micro_batch_wait_ms"])
+
+    def _make_router(self, routes):
+        return ModelRouter(routes, deadline_s=self.settings["llm_deadline_s"], hedge=self.settings["hedge_requests"],
+                           acompletion=self.acompletion)
+
+    def get_question(self, qid):
+        try:
+            return self.questions[qid]
+        except KeyError:
+            raise ValueError(f"Unknown question id: {qid}") from None
+
+    def prepare(self, qid):
+        """
+        Does a question's one-time grading work ahead of its first submission (e.g. while
+        the student is still reading it): loads the large fields and compiles the evaluation
+        prompt prefix and the key-concept matcher.
+        """
+        unit = self.get_question(qid)
+        if self.settings["compact_evaluation_prompt"]:
+            coverage_evaluation_prompt_prefix(unit['question'])
+        else:
+            evaluation_prompt_prefix(unit['ideal_answer'], tuple(unit['key_concepts']))
+        concept_coverage(unit, "")
+        return unit
+
+    async def grade(self, qid, answer, session_id, on_partial=None):
+        """
+        Runs the whole pipeline for one answer and returns a GradingResult.
+        With streaming enabled, `on_partial(score, justification, feedback)` is called
+        for every update of the evaluation; `score` stays None until it is complete.
+        """
+        unit = self.get_question(qid)
+        result = GradingResult(submission_id=str(uuid.uuid4()))
+        tracer = get_tracer()
+        with tracer.trace("submission", session_id, result.submission_id, question_id=qid,
+                          topic=unit['topic'], difficulty=unit['difficulty']) as root_span:
+            self.log_event(
+                session_id, "SUBMISSION_ATTEMPT",
+                {"questionText": unit['question'], "studentAnswer": answer, "submissionId": result.submission_id,
+                 "questionId": qid},
+                topic=unit['topic'], difficulty=unit['difficulty'], scope=unit['scope'],
+            )
+            try:
+                if not answer.strip():
+                    result.classification = "empty_answer"
+                    self.log_event(session_id, "TRIAGE_RESULT", {"classification": "empty_answer"},
+                                   topic=unit['topic'], difficulty=unit['difficulty'], scope=unit['scope'])
+                else:
+                    await self._grade(unit, answer, session_id, result, on_partial)
+            except Exception as e:
+                result.error = str(e)
+                result.error_type = type(e).__name__
+                self.log_event(session_id, "ERROR", {"source": "main_logic_block", "message": str(e),
+                                                     "errorType": result.error_type,
+                                                     "submissionId": result.submission_id})
+            root_span.set(classification=result.classification, evaluation_source=result.evaluation_source,
+                          error=result.error_type)
+        if tracer.persist_with_events:
+            self.log_event(session_id, "TRACE", {"submissionId": result.submission_id, "spans": root_span.spans},
+                           topic=unit['topic'], difficulty=unit['difficulty'], scope=unit['scope'])
+        return result
+
+    # --- Pipeline ---
+    def _evaluation_template(self):
+        if self.settings["compact_evaluation_prompt"]:
+            return EVALUATION_COVERAGE_PROMPT_TEMPLATE
+        return EVALUATION_PROMPT_TEMPLATE
+
+    async def _grade(self, unit, answer, session_id, result, on_partial):
+        settings = self.settings
+        compact_prompt = settings["compact_evaluation_prompt"]
+        evaluation_cache_key = make_cache_key(self.evaluation_router.primary_model, self._evaluation_template(),
+                                              question_id(unit), answer, unit)
+        coverage = concept_coverage(unit, answer)
+        evaluation_messages = [{"role": "user", "content": (
+            build_coverage_evaluation_prompt(unit, answer, coverage) if compact_prompt
+            else build_evaluation_prompt(unit, answer)
+        )}]
+        speculative_call = None
+
+        # --- AGENT 1: Triage (local fast path first, Triage Agent only if uncertain) ---
+        triage_start = time.perf_counter()
+        local_decision = fast_path_triage(answer, coverage=coverage)
+        if local_decision is not None:
+            classification = local_decision.label
+            triage_details = {"classification": classification, "source": "local",
+                              "confidence": round(local_decision.confidence, 3), "reason": local_decision.reason}
+        else:
+            triage_cache_key = make_cache_key(self.triage_router.primary_model, TRIAGE_PROMPT_TEMPLATE, None, answer)
+            classification = self.response_cache.get(triage_cache_key) if settings["use_response_cache"] else None
+            if classification is not None:
+                triage_details = {"classification": classification, "source": "cache"}
+            else:
+                if settings["speculative_evaluation"] and self.response_cache.get(evaluation_cache_key) is None:
+                    # Start the evaluation now; it is cancelled below unless triage says valid_attempt
+                    speculative_call = self.speculative_executor.submit(
+                        session_id, lambda: self.evaluation_router.complete(evaluation_messages,
+                                                                        response_format={"type": "json_object"})
+                    )
+                try:
+                    triage_response = await self.triage_router.complete(
+                        [{"role": "user", "content": build_triage_prompt(answer)}]
+                    )
+                except BaseException:
+                    if speculative_call is not None:
+                        speculative_call.cancel()
+                    raise
+                _add_usage(result, triage_response)
+                classification = parse_triage_label(triage_response.choices[0].message.content)
+                self.response_cache.set(triage_cache_key, classification)
+                triage_details = {"classification": classification, "source": "llm"}
+        result.classification = classification
+        result.triage_source = triage_details["source"]
+        result.timing["triageMs"] = round((time.perf_counter() - triage_start) * 1000, 1)
+        get_tracer().record("triage", result.timing["triageMs"], source=result.triage_source,
+                            cache_hit=result.triage_source == "cache", classification=classification)
+
+        if speculative_call is not None:
+            triage_details["speculativeEvaluation"] = "valid_attempt" in classification
+            if "valid_attempt" not in classification:
+                speculative_call.cancel()
+                speculative_call = None
+
+        triage_details["submissionId"] = result.submission_id
+        self.log_event(session_id, "TRIAGE_RESULT", triage_details,
+                       topic=unit['topic'], difficulty=unit['difficulty'], scope=unit['scope'])
+
+        if "valid_attempt" in classification:
+            await self._evaluate(unit, answer, session_id, result, on_partial, coverage,
+                                 evaluation_cache_key, evaluation_messages, speculative_call)
+        elif "no_knowledge" in classification:
+            self._respond(session_id, result, "hint_and_encourage", NO_KNOWLEDGE_TEXT.format(page_number=unit['page_number']))
+        elif "gibberish" in classification:
+            self._respond(session_id, result, "request_clearer_answer", GIBBERISH_TEXT)
+        else:  # Fallback for unknown classification from Triage Agent
+            self.log_event(session_id, "ERROR", {"source": "triage_logic", "message": "Unknown classification",
+                                                 "submissionId": result.submission_id})
+
+    async def _evaluate(self, unit, answer, session_id, result, on_partial, coverage,
+                        evaluation_cache_key, evaluation_messages, speculative_call):
+        qid, fingerprint = question_id(unit), unit_fingerprint(unit)
+        # Near-duplicate grades, like cached ones, are only reused from the same evaluator model and prompt
+        index_key = (self.evaluation_router.primary_model, self._evaluation_template(), qid, fingerprint)
+        evaluation_start = time.perf_counter()
+
+        feedback_json_string = self.response_cache.get(evaluation_cache_key) if self.settings["use_response_cache"] else None
+        evaluation_source = "cache" if feedback_json_string is not None else None
+
+        if evaluation_source is None and self.settings["skip_llm_on_extreme_coverage"]:
+            local_evaluation = coverage_shortcut(unit, answer, coverage)
+            if local_evaluation is not None:
+                feedback_json_string = json.dumps(local_evaluation, ensure_ascii=False)
+                evaluation_source = "coverage_rule"
+
+        # Reuse the grade of a near-identical answer to the same question
+        near_match = None
+        if evaluation_source is None and self.settings["use_near_duplicates"]:
+            near_match = self.near_index.lookup(*index_key, answer)
+            if near_match is not None and not near_match["spot_check"]:
+                feedback_json_string = near_match["evaluation"]
+                evaluation_source = "near_duplicate"
+
+        first_score_ms = None
+        if speculative_call is not None and evaluation_source is not None:
+            speculative_call.cancel()  # Resolved locally after all
+        elif speculative_call is not None:
+            evaluation_source = "llm"
+            result.timing["speculative"] = True
+            evaluation_response = await speculative_call.result()
+            _add_usage(result, evaluation_response)
+            feedback_json_string = evaluation_response.choices[0].message.content
+        elif evaluation_source is None:
+            evaluation_source = "llm"
+            if self.settings["micro_batch_evaluation"] and not self.settings["compact_evaluation_prompt"]:
+                # Batched answers cannot stream; the score arrives with the whole batch
+                evaluation_source = "llm_batch"
+                feedback_json_string, usage = await self.micro_batcher.evaluate(qid, unit, answer)
+                _add_usage_dict(result, usage)
+            elif self.settings["stream_evaluation"]:
+                feedback_json_string, first_score_ms = await self._stream_evaluation(
+                    evaluation_messages, on_partial, evaluation_start, result
+                )
+            else:
+                evaluation_response = await self.evaluation_router.complete(
+                    evaluation_messages, response_format={"type": "json_object"}
+                )
+                _add_usage(result, evaluation_response)
+                feedback_json_string = evaluation_response.choices[0].message.content
+        total_ms = round((time.perf_counter() - evaluation_start) * 1000, 1)
+        result.timing["timeToFirstScoreMs"] = round(first_score_ms, 1) if first_score_ms is not None else total_ms
+        result.timing["evaluationMs"] = total_ms
+        result.evaluation_source = evaluation_source
+        get_tracer().record("evaluation", total_ms, source=evaluation_source,
+                            cache_hit=evaluation_source in ("cache", "near_duplicate"),
+                            speculative=result.timing.get("speculative", False))
+
+        parse_start = time.perf_counter()
+        evaluation_data, repairs = parse_evaluation(feedback_json_string)
+        parse_ms = (time.perf_counter() - parse_start) * 1000
+        retried = False
+        if evaluation_data is None and evaluation_source in ("llm", "llm_batch"):
+            # Nothing to repair locally: one targeted retry instead of wasting the paid call
+            retried = True
+            retry_start = time.perf_counter()
+            try:
+                retry_response = await self.evaluation_router.complete(
+                    evaluation_messages + [{"role": "assistant", "content": feedback_json_string or ""},
+                                           {"role": "user", "content": EVALUATION_REPAIR_PROMPT}],
+                    response_format={"type": "json_object"},
+                )
+                _add_usage(result, retry_response)
+                feedback_json_string = retry_response.choices[0].message.content
+            except Exception as e:
+                self.log_event(session_id, "ERROR", {"source": "parse_retry", "message": str(e),
+                                                     "submissionId": result.submission_id})
+            else:
+                parse_start = time.perf_counter()
+                evaluation_data, repairs = parse_evaluation(feedback_json_string)
+                parse_ms += (time.perf_counter() - parse_start) * 1000
+            result.timing["parseRetryMs"] = round((time.perf_counter() - retry_start) * 1000, 1)
+        self.parse_stats.record(repairs, retried, ok=evaluation_data is not None)
+        result.timing["parseMs"] = round(parse_ms, 3)
+        get_tracer().record("parsing", result.timing["parseMs"], ok=evaluation_data is not None,
+                            repairs=repairs, retried=retried)
+
+        if evaluation_data is None:
+            # Unrecoverable even after the retry: show the raw text so nothing is lost
+            result.raw_response = feedback_json_string
+            self.log_event(
+                session_id, "ERROR",
+                {"source": "json_parsing", "rawResponse": feedback_json_string, "repairs": repairs,
+                 "retried": retried, "submissionId": result.submission_id},
+                topic=unit['topic'],
+            )
+            return
+        numeric_score = evaluation_data["score"]
+
+        evaluation_details = {"rawFeedback": evaluation_data, "source": evaluation_source,
+                              "conceptCoverage": coverage.as_dict(), "timing": dict(result.timing),
+                              "submissionId": result.submission_id, "questionId": question_id(unit)}
+        if repairs:
+            evaluation_details["parseRepairs"] = repairs
+        if retried:
+            evaluation_details["parseRetried"] = True
+        if evaluation_source in ("llm", "llm_batch"):
+            # Only valid evaluations are cached, in their repaired form
+            normalized_json = json.dumps(evaluation_data, ensure_ascii=False)
+            self.response_cache.set(evaluation_cache_key, normalized_json)
+            self.near_index.add(*index_key, answer, normalized_json)
+        if near_match is not None:
+            evaluation_details["similarity"] = near_match["similarity"]
+            if near_match["spot_check"]:
+                evaluation_details["spotCheckDrift"] = self.near_index.record_drift(near_match["evaluation"], numeric_score)
+
+        result.evaluation = evaluation_data
+        self.log_event(
+            session_id, "EVALUATION_RESULT", evaluation_details,
+            topic=unit['topic'], difficulty=unit['difficulty'], scope=unit['scope'], score=numeric_score,
+        )
+
+    async def _stream_evaluation(self, evaluation_messages, on_partial, evaluation_start, result):
+        """
+        Streams the evaluation, forwarding partial fields to `on_partial`.
+        Returns (full response text, ms until the score was complete or None).
+        """
+        stream_parser = IncrementalJsonObjectParser()
+        streamed_parts = []
+        first_score_ms = None
+        response = await self.evaluation_router.complete(evaluation_messages, response_format={"type": "json_object"},
+                                                         stream=True, stream_options={"include_usage": True})
+        with get_tracer().span("llm_stream") as span:
+            async for chunk in response:
+                _add_usage(result, chunk)  # Only the last chunk carries usage
+                span.add_usage(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                streamed_parts.append(delta)
+                if stream_parser.feed(delta):
+                    score_complete = "score" in stream_parser.complete
+                    if first_score_ms is None and score_complete:
+                        first_score_ms = (time.perf_counter() - evaluation_start) * 1000
+                    if on_partial is not None:
+                        partial = stream_parser.values
+                        on_partial(partial.get('score') if score_complete else None,
+                                   partial.get('justification', ""), partial.get('feedback', ""))
+            span.set(model=getattr(response, "model", None), first_score_ms=first_score_ms)
+        return "".join(streamed_parts), first_score_ms
+
+    def _respond(self, session_id, result, response_type, response_text):
+        result.response_type = response_type
+        result.response_text = response_text
+        self.log_event(session_id, "SYSTEM_RESPONSE",
+                       {"type": response_type, "text": response_text, "submissionId": result.submission_id})
+
+    def metrics(self):
+        return {
+            "response_cache": self.response_cache.metrics(),
+            "near_duplicates": self.near_index.metrics(),
+            "speculation": self.speculative_executor.stats(),
+            "micro_batching": self.micro_batcher.stats(),
+            "parsing": self.parse_stats.snapshot(),
+            "triage_models": self.triage_router.metrics(),
+            "evaluation_models": self.evaluation_router.metrics(),
+            "tracing": get_tracer().metrics(),
+        }
+
+
+# --- Process-wide singleton for in-process use (the Streamlit page) ---
+_grading_engine = None
+
+
+def get_grading_engine(log_event, settings=None):
+    global _grading_engine
+    if _grading_engine is None:
+        _grading_engine = GradingEngine(log_event, settings)
+    return _grading_engine
+
+
+def set_grading_engine(engine):
+    """
+    Replaces the in-process engine, e.g. with one on a fake LLM backend for load tests.
+    """
+    global _grading_engine
+    _grading_engine = engine
@@ -0,0 +1,132 @@
+# grading_server.py
+# Lightweight HTTP front for GradingEngine: many concurrent gradings on one event loop.
+# Several Streamlit replicas can point at it with `service_url` in their [grading] secrets.
+#
+#   python grading_server.py --port 8601                      # localhost only
+#   python grading_server.py --host 0.0.0.0 --port 8601       # reachable by other hosts
+#
+# Every request but /healthz must carry the shared secret `service_token` from the
+# [grading] section of secrets.toml in the X-Grading-Token header (grading_client.py
+# sends it); without one configured the server refuses to start, since a grading call
+# spends the Gemini budget and writes session_logs rows under any session_id.
+#
+#   POST /grade   {"question_id": ..., "answer": ..., "session_id": ..., "stream": false}
+#                 -> GradingResult JSON, or NDJSON lines ({"type": "partial", ...} then
+#                    {"type": "result", ...}) when "stream" is true
+#   GET  /metrics -> cache / near-duplicate / speculation / routing / tracing / event logger counters
+#   GET  /healthz
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+
+from aiohttp import web
+
+from app_config import DEFAULT_SECRETS_PATH, load_secrets
+from event_logger import get_event_logger
+from grading_client import TOKEN_HEADER
+from grading_engine import GradingEngine
+from tracing import configure_tracer
+
+_dumps = lambda obj: json.dumps(obj, ensure_ascii=False)  # noqa: E731
+
+
+@web.middleware
+async def require_token(request, handler):
+    if request.path != "/healthz":
+        supplied = request.headers.get(TOKEN_HEADER, "").encode("utf-8")
+        if not hmac.compare_digest(supplied, request.app["service_token"].encode("utf-8")):
+            return web.json_response({"error": "Missing or wrong " + TOKEN_HEADER}, status=401)
+    return await handler(request)
+
+
+async def handle_grade(request):
+    try:
+        payload = await request.json()
+        qid, answer, session_id = payload["question_id"], payload["answer"], payload["session_id"]
+    except (ValueError, KeyError) as e:
+        return web.json_response({"error": f"Bad request: {e}"}, status=400)
+
+    engine = request.app["engine"]
+    if qid not in engine.questions:
+        return web.json_response({"error": f"Unknown question id: {qid}"}, status=404)
+
+    async with request.app["slots"]:
+        if not payload.get("stream"):
+            result = await engine.grade(qid, answer, session_id)
+            return web.json_response(result.to_dict(), dumps=_dumps)
+
+        # Streaming: forward every partial evaluation as one NDJSON line
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        updates = asyncio.Queue()
+        task = asyncio.ensure_future(engine.grade(
+            qid, answer, session_id,
+            on_partial=lambda score, justification, feedback: updates.put_nowait(
+                {"type": "partial", "score": score, "justification": justification, "feedback": feedback}
+            ),
+        ))
+        task.add_done_callback(lambda _: updates.put_nowait(None))
+        while (update := await updates.get()) is not None:
+            await response.write((_dumps(update) + "\n").encode("utf-8"))
+        await response.write((_dumps({"type": "result", **task.result().to_dict()}) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+
+async def handle_metrics(request):
+    metrics = request.app["engine"].metrics()
+    metrics["event_logger"] = request.app["event_logger"].stats()
+    return web.json_response(metrics, dumps=_dumps)
+
+
+async def handle_healthz(request):
+    return web.Response(text="ok")
+
+
+def make_app(secrets, max_concurrent=256):
+    grading_settings = secrets.get("grading", {})
+    service_token = grading_settings.get("service_token")
+    if not service_token:
+        raise ValueError("No [grading] service_token in secrets.toml; refusing to serve without authentication")
+    os.environ.setdefault("GEMINI_API_KEY", secrets["GEMINI_API_KEY"])
+    configure_tracer(secrets.get("tracing", {}))
+    event_logger = get_event_logger(secrets["mysql"])
+    return create_app(GradingEngine(event_logger.log, grading_settings), event_logger, service_token, max_concurrent)
+
+
+def create_app(engine, event_logger, service_token, max_concurrent=256):
+    """
+    The aiohttp application around an existing engine and event logger.
+    """
+    if not service_token:
+        raise ValueError("service_token must be set")
+    app = web.Application(middlewares=[require_token])
+    app["service_token"] = service_token
+    app["event_logger"] = event_logger
+    app["engine"] = engine
+    app["slots"] = asyncio.Semaphore(max_concurrent)
+    app.add_routes([
+        web.post("/grade", handle_grade),
+        web.get("/metrics", handle_metrics),
+        web.get("/healthz", handle_healthz),
+    ])
+    app.on_shutdown.append(lambda _: asyncio.to_thread(event_logger.close))
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the grading engine over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for all)")
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    parser.add_argument("--max-concurrent", type=int, default=256, help="Gradings in flight at once")
+    args = parser.parse_args()
+
+    try:
+        app = make_app(load_secrets(args.secrets), args.max_concurrent)
+    except ValueError as e:
+        parser.error(str(e))
+    web.run_app(app, host=args.host, port=args.port)
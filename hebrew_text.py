@@ -0,0 +1,47 @@
+# hebrew_text.py
+# Hebrew-aware text normalization shared by the triage, caching and matching code.
+
+import re
+import unicodedata
+
+# Niqqud and cantillation marks, excluding maqaf (U+05BE) and sof pasuq (U+05C3) which are punctuation
+_NIQQUD_RE = re.compile("[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")
+
+# Final letter forms -> regular forms (ך->כ, ם->מ, ן->נ, ף->פ, ץ->צ)
+FINAL_FORMS = str.maketrans("ךםןףץ", "כמנפצ")
+
+# Anything that is not a letter or digit becomes a space (includes maqaf, geresh, quotes)
+_PUNCT_RE = re.compile(r"[^\w]+", re.UNICODE)
+_SPACES_RE = re.compile(r"\s+")
+
+HEBREW_LETTERS = set("אבגדהוזחטיכלמנסעפצקרשת" + "ךםןףץ")
+
+
+def strip_niqqud(text: str) -> str:
+    """
+    Removes Hebrew vowel points and cantillation marks.
+    """
+    return _NIQQUD_RE.sub("", unicodedata.normalize("NFC", text))
+
+
+def normalize_answer(text: str, fold_finals: bool = False) -> str:
+    """
+    Canonical form of a free-text answer: no niqqud, no punctuation, lower-cased
+    Latin, single spaces. With `fold_finals` final letters are mapped to regular forms.
+    """
+    text = strip_niqqud(text or "").lower()
+    text = _PUNCT_RE.sub(" ", text).replace("_", " ")
+    text = _SPACES_RE.sub(" ", text).strip()
+    if fold_finals:
+        text = text.translate(FINAL_FORMS)
+    return text
+
+
+def hebrew_ratio(text: str) -> float:
+    """
+    Fraction of the letters in `text` that are Hebrew.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return 0.0
+    return sum(1 for c in letters if c in HEBREW_LETTERS) / len(letters)
@@ -1,51 +1,17 @@
 import streamlit as st
-import re
-import mysql.connector
-import json
 
-# --- HELPER FUNCTION: Parse Score ---
-def parse_score_from_feedback(feedback_text):
-    match = re.search(r'\*\*?ציון:\*\*?\s*(\d+)\s*/\s*5', feedback_text)
-    if match:
-        return int(match.group(1))
-    return None
+from app_resources import event_logger
+# Re-exported; the legacy score parser is now the last-resort repair in evaluation_schema.py
+from evaluation_schema import parse_score_from_feedback
 
 
-# --- HELPER FUNCTION: Log to Database (Connect-on-Demand version) ---
+# --- HELPER FUNCTION: Log to Database (Pooled, background-writer version) ---
 def log_event_to_mysql(session_id, event_type, details_dict, topic=None, difficulty=None, scope=None, score=None):
     """
-    Establishes a new connection, logs an event, and closes the connection.
-    """
-    conn = None  # Initialize conn to None to ensure it's available in the finally block
-    try:
-        # 1. Establish a new connection for this specific event
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=st.secrets["mysql"]["port"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"]
-        )
-        
-        # 2. Use a 'with' statement for the cursor to ensure it's closed
-        with conn.cursor() as cursor:
-            details_json = json.dumps(details_dict, ensure_ascii=False)
-            insert_query = """
-            INSERT INTO session_logs (session_id, event_type, details, topic, difficulty, scope, score)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            record = (session_id, event_type, details_json, topic, difficulty, scope, score)
-            cursor.execute(insert_query, record)
-            conn.commit()
-
-    except mysql.connector.Error as err:
-        # Log the error to the Streamlit console for debugging
-        st.error(f"Database Error: {err}")
-        
-    finally:
-        # 3. IMPORTANT: Always close the connection
-        if conn and conn.is_connected():
-            conn.close()
+    Enqueues an event for the shared background writer (see event_logger.py).
+    The actual INSERT happens off the request path, batched with other events.
+    """
+    event_logger().log(session_id, event_type, details_dict, topic=topic, difficulty=difficulty, scope=scope, score=score)
 
 
 # --- HELPER FUNCTION: Display RTL Text ---
@@ -57,3 +23,47 @@ def st_rtl_write(text: str):
         f'<div style="direction: rtl; text-align: right;">{text}</div>',
         unsafe_allow_html=True
     )
+
+
+# --- HELPER FUNCTION: Evaluation Result Display ---
+def evaluation_html(numeric_score, justification_text, feedback_text):
+    """
+    Builds the RTL HTML block that shows a score, its justification and the feedback.
+    Any part may still be partial while the evaluation is streaming.
+    """
+    score_text = f"{numeric_score}/5" if numeric_score is not None else "..."
+    return f"""
+    <div style="direction: rtl; text-align: right;">
+        <b>ציון:</b> {score_text}<br>
+        <b>נימוק:</b> {justification_text}<br>
+        <b>משוב:</b> {feedback_text}
+    </div>
+    """
+
+
+def st_evaluation_placeholder():
+    """
+    Writes the evaluation header and returns an empty slot for evaluation_html() updates.
+    """
+    st.markdown("---")
+    st.markdown('<h3 style="direction: rtl; text-align: right;">הערכה של תשובתך:</h3>', unsafe_allow_html=True)
+    return st.empty()
+
+
+class EvaluationView:
+    """
+    Shows an evaluation in one slot that is created on the first update, so streamed
+    partial updates and the final result render in the same place.
+    """
+
+    def __init__(self):
+        self.slot = None
+
+    def update(self, numeric_score, justification_text, feedback_text):
+        if self.slot is None:
+            self.slot = st_evaluation_placeholder()
+        self.slot.markdown(evaluation_html(numeric_score, justification_text, feedback_text), unsafe_allow_html=True)
+
+    def clear(self):
+        if self.slot is not None:
+            self.slot.empty()
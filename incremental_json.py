@@ -0,0 +1,163 @@
+# incremental_json.py
+# Incremental parser for a streamed, flat JSON object such as the evaluator's
+# {"score": 4, "justification": "...", "feedback": "..."}.
+# Fed chunk by chunk, it exposes each top-level value as soon as it is (partially)
+# known, so the UI can show the score and stream the text fields.
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalJsonObjectParser:
+    """
+    Streaming parser for the top level of one JSON object.
+
+    - `values` maps each key to its value so far (strings grow as chunks arrive).
+    - `complete` is the set of keys whose value has been fully read.
+    - Nested objects/arrays are captured as raw text and parsed by the caller.
+    Text before the first '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.complete = set()
+        self.done = False
+
+        self._state = "before_object"
+        self._key = None
+        self._buffer = []
+        self._escape = None       # None, "" (after backslash) or partial \\uXXXX digits
+        self._depth = 0
+        self._in_nested_string = False
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk and returns the set of keys whose value changed.
+        """
+        changed = set()
+        for ch in chunk:
+            if self.done:
+                break
+            self._step(ch, changed)
+        return changed
+
+    # --- State machine ---
+    def _step(self, ch, changed):
+        state = self._state
+        if state == "before_object":
+            if ch == "{":
+                self._state = "before_key"
+        elif state == "before_key":
+            if ch == '"':
+                self._state = "key"
+                self._buffer = []
+            elif ch == "}":
+                self.done = True
+        elif state == "key":
+            if self._read_string_char(ch):
+                self._key = "".join(self._buffer)
+                self._state = "colon"
+        elif state == "colon":
+            if ch == ":":
+                self._state = "before_value"
+        elif state == "before_value":
+            if ch.isspace():
+                return
+            self._buffer = []
+            if ch == '"':
+                self._state = "string_value"
+                self.values[self._key] = ""
+                changed.add(self._key)
+            elif ch in "{[":
+                self._state = "nested_value"
+                self._depth = 1
+                self._buffer.append(ch)
+            else:
+                self._state = "scalar_value"
+                self._buffer.append(ch)
+        elif state == "string_value":
+            finished = self._read_string_char(ch)
+            self.values[self._key] = "".join(self._buffer)
+            changed.add(self._key)
+            if finished:
+                self._finish_value(changed)
+        elif state == "scalar_value":
+            if ch in ",}" or ch.isspace():
+                self.values[self._key] = self._scalar("".join(self._buffer))
+                self._finish_value(changed)
+                if ch == ",":
+                    self._state = "before_key"
+                elif ch == "}":
+                    self.done = True
+            else:
+                self._buffer.append(ch)
+        elif state == "nested_value":
+            self._buffer.append(ch)
+            if self._in_nested_string:
+                if self._escape is not None:
+                    self._escape = None
+                elif ch == "\\":
+                    self._escape = ""
+                elif ch == '"':
+                    self._in_nested_string = False
+            elif ch == '"':
+                self._in_nested_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.values[self._key] = "".join(self._buffer)
+                    self._finish_value(changed)
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "before_key"
+            elif ch == "}":
+                self.done = True
+
+    def _finish_value(self, changed):
+        self.complete.add(self._key)
+        changed.add(self._key)
+        self._state = "after_value"
+
+    def _read_string_char(self, ch):
+        """
+        Appends one character of a JSON string to the buffer. Returns True at the closing quote.
+        """
+        if self._escape is not None:
+            if self._escape == "" and ch != "u":
+                self._buffer.append(_ESCAPES.get(ch, ch))
+                self._escape = None
+            elif self._escape == "":
+                self._escape = "u"
+            else:
+                self._escape += ch
+                if len(self._escape) == 5:
+                    code = int(self._escape[1:], 16)
+                    if 0xDC00 <= code <= 0xDFFF and self._buffer and 0xD800 <= ord(self._buffer[-1]) <= 0xDBFF:
+                        # Second half of a surrogate pair ("\ud83d\ude00" -> one emoji), as json.loads does
+                        code = 0x10000 + ((ord(self._buffer.pop()) - 0xD800) << 10) + (code - 0xDC00)
+                    self._buffer.append(chr(code))
+                    self._escape = None
+            return False
+        if ch == "\\":
+            self._escape = ""
+            return False
+        if ch == '"':
+            return True
+        self._buffer.append(ch)
+        return False
+
+    @staticmethod
+    def _scalar(text):
+        text = text.strip()
+        if text in ("true", "false"):
+            return text == "true"
+        if text == "null":
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                return float(text)
+            except ValueError:
+                return text
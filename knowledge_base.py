@@ -2,12 +2,18 @@
 # בסיס ידע מובנה ומורחב עבור "פסימון", כולל מספרי עמודים, סוג והערכת קושי
 # פרק 1: מבוא לפסיכולוגיה חברתית
 # סה"כ: 21 שאלות
+#
+# This file is a source: the app reads the compiled store (knowledge_store.py).
+# Further chapters go in knowledge_sources/*.json. Every entry keeps its "id" for good:
+# scheduler history, rollups and cached grades refer to it, so rewording a question
+# must not change it.
 
 knowledge_base = [
     # ----------------------------------------------------
     # --- המקבץ המקורי (עם השדות החדשים שנוספו) ---
     # ----------------------------------------------------
     {
+        "id": "q_b91d9e6a315e",
         "topic": "הגדרת פסיכולוגיה חברתית",
         "question": "מהי פסיכולוגיה חברתית ומהם שלושת התחומים העיקריים שבהם היא מתמקדת?",
         "ideal_answer": "פסיכולוגיה חברתית היא החקירה המדעית של האופן שבו אנשים חושבים על אחרים (חשיבה חברתית), משפיעים זה על זה (השפעה חברתית), ומתייחסים זה לזה (יחסים חברתיים). היא בוחנת כיצד סיטואציות משפיעות על התפיסות וההתנהגות שלנו.",
@@ -18,6 +24,7 @@ knowledge_base = [
         "difficulty": "Easy"
     },
     {
+        "id": "q_7067e53c0d2c",
         "topic": "הרעיון המרכזי: בניית המציאות החברתית",
         "question": "הסבר את הרעיון המרכזי בפסיכולוגיה חברתית לפיו 'אנו מבנים את המציאות החברתית שלנו'. תן דוגמה.",
         "ideal_answer": "הרעיון אומר שלמרות שקיימת מציאות אובייקטיבית, אנו תמיד תופסים ומפרשים אותה דרך 'העדשות' של האמונות והערכים שלנו. לדוגמה, במחקר על משחק הפוטבול בין פרינסטון לדרטמות, סטודנטים מכל קבוצה ראו מספר שונה לחלוטין של עברות שביצעה הקבוצה השנייה, למרות שצפו באותו סרט בדיוק.",
@@ -28,6 +35,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_63598d378192",
         "topic": "הרעיון המרכזי: כוחן וסכנותיהן של אינטואיציות חברתיות",
         "question": "מהו המושג 'עיבוד דואלי' וכיצד הוא מסביר את כוחן וסכנותיהן של אינטואיציות?",
         "ideal_answer": "'עיבוד דואלי' הוא הרעיון שהחשיבה שלנו פועלת בשתי רמות במקביל: האחת מודעת ושקולה, והשנייה בלתי מודעת ואוטומטית (אינטואיטיבית). האינטואיציה מהירה וחזקה אך גם מועדת לטעויות, ולכן היא גם מועילה וגם מסוכנת.",
@@ -38,6 +46,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_22ca14a7bf93",
         "topic": "הרעיון המרכזי: השפעות חברתיות",
         "question": "הסבר באמצעות דוגמה כיצד כוחה של סיטואציה חברתית יכול להשפיע על התנהגות.",
         "ideal_answer": "הסביבה והתרבות שלנו מעצבות אותנו מאוד. כוחה של סיטואציה חברתית יכול להיות עצום, עד כדי כך שהוא גורם לאנשים רגילים לפעול בניגוד לערכיהם. דוגמה לכך היא ניסויי הציות של מילגרם, בהם אנשים רגילים הסכימו לתת שוק חשמלי כואב לאדם אחר רק כי דמות סמכותית הורתה להם לעשות זאת.",
@@ -48,6 +57,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_7877378fc1b0",
         "topic": "הרעיון המרכזי: השפעת עמדות ונטיות אישיות",
         "question": "האם רק כוחות חיצוניים משפיעים עלינו, או שגם לכוחות פנימיים יש תפקיד? תן דוגמה.",
         "ideal_answer": "לא, אנחנו לא פסיביים. גם לכוחות הפנימיים שלנו, כמו עמדות ונטיות אישיות, יש השפעה מכרעת על ההתנהגות. לדוגמה, לאחר שחרורו מהכלא, נלסון מנדלה בחר בדרך של פיוס ואחדות עם אויביו לשעבר, בניגוד לאדם אחר שהיה יכול לבחור בנקמה. עמדות ואישיות משפיעות על ההתנהגות.",
@@ -58,6 +68,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_2145fd946524",
         "topic": "הרעיון המרכזי: שורשים ביולוגיים להתנהגות חברתית",
         "question": "מה הקשר בין ביולוגיה לפסיכולוגיה חברתית, ומהי פסיכולוגיה אבולוציונית?",
         "ideal_answer": "התנהגות חברתית מושרשת בביולוגיה. פסיכולוגיה אבולוציונית גורסת שהבררה הטבעית עיצבה לא רק תכונות פיזיות אלא גם נטיות פסיכולוגיות והתנהגויות חברתיות שעזרו לאבותינו לשרוד. לכל אירוע פסיכולוגי יש גם בסיס ביולוגי במוח.",
@@ -68,6 +79,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_a7b2e66cbea3",
         "topic": "השפעה גלויה של ערכים",
         "question": "כיצד ערכים אישיים יכולים להשפיע באופן גלוי על המחקר בפסיכולוגיה חברתית?",
         "ideal_answer": "ערכים משפיעים באופן גלוי על בחירת נושאי המחקר של הפסיכולוגים. למשל, העניין הגובר בנושאי מגדר ואפליה בשנות ה-70 נבע מהשפעת התנועה הפמיניסטית. כמו כן, הערכים משפיעים על סוג האנשים הנמשכים לתחום מסוים.",
@@ -81,6 +93,7 @@ knowledge_base = [
     # ---           מקבץ חדש שנוסף                ---
     # ----------------------------------------------------
     {
+        "id": "q_4d56d651aa02",
         "topic": "כוחה של הסיטואציה (אנקדוטת פתיחה)",
         "question": "בתחילת הפרק, המחבר משתמש בסיפור של סינדרלה. מהי הנקודה העיקרית שהסיפור הזה בא להדגים לגבי פסיכולוגיה חברתית?",
         "ideal_answer": "הסיפור מדגים את כוחה העצום של הסיטואציה בעיצוב ההתנהגות. סינדרלה התנהגה באופן שונה לחלוטין (כנועה ובלתי מושכת מול שובת לב ויפה) בשתי סיטואציות שונות (בבית מול בנשף). זה מראה שלא ניתן להבין אדם במנותק מהסיטואציה שהוא פועל בתוכה.",
@@ -91,6 +104,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_20a452ff5a43",
         "topic": "שלושת תחומי הליבה של פסיכולוגיה חברתית",
         "question": "על פי התרשים בעמוד 4, מהם שלושת התחומים שמרכיבים את חקירתה של הפסיכולוגיה החברתית? תן דוגמה לנושא אחד מכל תחום.",
         "ideal_answer": "שלושת התחומים הם: 1. חשיבה חברתית (למשל, איך אנו תופסים את עצמנו ואת זולתנו). 2. השפעה חברתית (למשל, לחצים לקונפורמיות). 3. יחסים חברתיים (למשל, מה גורם לדעות קדומות או למשיכה).",
@@ -101,6 +115,7 @@ knowledge_base = [
         "difficulty": "Easy"
     },
     {
+        "id": "q_2405f16b46dc",
         "topic": "סכנות האינטואיציה (יישום)",
         "question": "הספר טוען שהאינטואיציות שלנו הן 'רבות עוצמה אך טומנות בחובן גם מידה של סיכון'. השתמש בדוגמה של הפחד מטיסות לאחר ה-11 בספטמבר כדי להסביר טענה זו.",
         "ideal_answer": "הדוגמה מראה כיצד האינטואיציה שלנו יכולה להטעות. לאחר ה-11 בספטמבר, דימויים של התרסקות מטוסים הפכו לזמינים מאוד בזיכרון, מה שגרם לאנשים רבים לפחד מטיסות יותר מנהיגה. אינטואיטיבית, טיסה הרגישה מסוכנת יותר. אולם, סטטיסטית, נהיגה היא מסוכנת הרבה יותר. זהו סיכון שבו האינטואיציה שופטת לא נכון.",
@@ -111,6 +126,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_8264dca4aae9",
         "topic": "השפעת התרבות",
         "question": "כיצד התרבות שבה אנו חיים עוזרת להגדיר את הסיטואציות החברתיות שלנו? תן דוגמה מהטקסט.",
         "ideal_answer": "התרבות מספקת לנו את הכללים והנורמות שמגדירים סיטואציות. לדוגמה, התרבות קובעת את אמות המידה שלנו לדברים כמו דייקנות, כנות, או קוד לבוש. עמדה לגבי צדק חברתי (האם הוא שוויון או זכות) יכולה להיות תלויה באידיאולוגיה התרבותית (סוציאליזם מול קפיטליזם) שהשפיעה עלינו.",
@@ -121,6 +137,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_a8dc606ce4eb",
         "topic": "מדעי העצב החברתיים",
         "question": "מהם 'מדעי העצב החברתיים' (social neuroscience), ומהי התובנה המרכזית של תחום זה לגבי הקשר בין ביולוגיה והתנהגות חברתית?",
         "ideal_answer": "מדעי העצב החברתיים הם תחום המשלב נקודות מבט ביולוגיות וחברתיות כדי לחקור את הבסיסים העצביים והפסיכולוגיים של התנהגות חברתית. התובנה המרכזית היא שלא ניתן להבין התנהגות חברתית רק על ידי התבוננות במוח או רק על ידי התבוננות בהשפעות חברתיות; יש להבין את יחסי הגומלין בין השניים. אנחנו 'אורגניזמים ביו-פסיכו-חברתיים'.",
@@ -131,6 +148,7 @@ knowledge_base = [
         "difficulty": "Easy"
     },
     {
+        "id": "q_065f001686e2",
         "topic": "פניו הסובייקטיביים של המדע",
         "question": "בעמוד 12 מוצג איור 1.3 (כתמים שחורים שיוצרים דמות של כלב דלמטי). כיצד איור זה מדגים את 'ההשפעה הסמויה של ערכים' על הפסיכולוגיה?",
         "ideal_answer": "האיור מדגים את העובדה שתפיסה אינה פסיבית אלא פעולה של פרשנות. כמו שהמוח שלנו צריך 'לדעת' לחפש כלב כדי לראות אותו בתוך הכתמים, כך גם מדענים (וכל בני האדם) רואים את המציאות דרך העדשות של התפיסות המוקדמות, הציפיות והערכים שלהם. זהו היבט סובייקטיבי שחודר למדע באופן סמוי.",
@@ -141,6 +159,7 @@ knowledge_base = [
         "difficulty": "Hard"
     },
     {
+        "id": "q_d8892d46d7a5",
         "topic": "ייצוגים חברתיים",
         "question": "מהם 'ייצוגים חברתיים' (social representation) ומדוע הם נחשבים לסוג של השפעה סמויה של ערכים?",
         "ideal_answer": "ייצוגים חברתיים הם אמונות חברתיות נפוצות, רעיונות וערכים המשותפים לתרבות או קבוצה מסוימת, שלעתים קרובות נתפסים כמובנים מאליהם. הם השפעה סמויה של ערכים מכיוון שהם מהווים 'הנחות יסוד' שלא נבדקות באופן ביקורתי, אך עדיין מכוונים את האופן שבו אנו מפרשים את העולם.",
@@ -151,6 +170,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_b7922ca3c5d6",
         "topic": "ערכים חבויים במושגים (מסלאו)",
         "question": "הספר מבקר את תיאוריית 'מימוש עצמי' של אברהם מסלאו. מהי הביקורת, וכיצד היא מדגימה שערכים יכולים להיות חבויים בתוך תאוריות פסיכולוגיות?",
         "ideal_answer": "הביקורת היא שהגדרתו של מסלאו ל'אדם המממש את עצמו' לא הייתה אובייקטיבית, אלא שיקפה את הערכים האישיים שלו (כמו ספונטניות ואוטונומיה). הוא בחר דמויות שמתאימות לערכיו. אם היה בוחר דמויות אחרות (כמו נפוליאון), התיאור של 'מימוש עצמי' היה שונה לגמרי. זה מדגים כיצד ערכיו של התאורטיקן יכולים לעצב באופן סמוי את התוכן של התיאוריה עצמה.",
@@ -161,6 +181,7 @@ knowledge_base = [
         "difficulty": "Hard"
     },
     {
+        "id": "q_816f8f38bf82",
         "topic": "השלכותיה של הטיית החכמה בדיעבד",
         "question": "מהן שתי ההשלכות השליליות העיקריות של 'הטיית החכמה בדיעבד' (תופעת 'ידעתי זאת מזמן')?",
         "ideal_answer": "שתי ההשלכות העיקריות הן: 1. יהירות: אנחנו מפתחים הערכת יתר של כוחנו האינטלקטואלי וחושבים שאנחנו יודעים יותר ממה שאנחנו באמת יודעים. 2. האשמת הקורבן או מקבלי החלטות: מכיוון שבדיעבד התוצאות נראות ברורות וצפויות, אנו נוטים להאשים בקלות רבה מדי מקבלי החלטות על 'טעויות' שבזמן אמת כלל לא היו ברורות.",
@@ -171,6 +192,7 @@ knowledge_base = [
         "difficulty": "Medium"
     },
     {
+        "id": "q_8f7cfd9a0c5b",
         "topic": "תאוריה מול השערה",
         "question": "מה ההבדל בין 'תאוריה' ל'השערה' (hypothesis) במחקר המדעי?",
         "ideal_answer": "תאוריה היא מערך רחב ומשולב של עקרונות שמסכם, מסביר ומארגן אוסף של עובדות ותצפיות. השערה, לעומת זאת, היא ניבוי ספציפי הניתן לבדיקה, שנגזר מתוך תאוריה. במילים אחרות, תאוריות הן הסברים כלליים, והשערות הן הבדיקות הספציפיות של ההסברים הללו.",
@@ -181,6 +203,7 @@ knowledge_base = [
         "difficulty": "Easy"
     },
     {
+        "id": "q_0a6ca46adcee",
         "topic": "בעיית המשתנה השלישי במתאם",
         "question": "הספר דן במתאם בין הערכה עצמית להישגים לימודיים. הסבר את שלוש האפשרויות הסיבתיות לקשר זה, תוך התמקדות ב'בעיית המשתנה השלישי'.",
         "ideal_answer": "המתאם יכול להיות מוסבר כך: 1) הערכה עצמית גבוהה גורמת להישגים גבוהים. 2) הישגים גבוהים גורמים להערכה עצמית גבוהה. 3) זוהי 'בעיית המשתנה השלישי': ייתכן שמשתנה שלישי, שלא נמדד, גורם לשניהם. למשל, רמת משכל גבוהה ו/או מעמד חברתי-כלכלי של המשפחה יכולים לגרום גם להערכה עצמית גבוהה וגם להישגים גבוהים.",
@@ -191,6 +214,7 @@ knowledge_base = [
         "difficulty": "Hard"
     },
     {
+        "id": "q_609ded261491",
         "topic": "האתיקה של הטעיה בניסוי",
         "question": "מדוע חוקרים בפסיכולוגיה חברתית משתמשים לעתים ב'הטעיה בניסוי' (deception), ומהם הכללים האתיים המגבילים את השימוש בה?",
         "ideal_answer": "חוקרים משתמשים בהטעיה כדי להשיג 'ממשיות ניסויית' - כלומר, לעורר במשתתפים תהליכים פסיכולוגיים אמיתיים ואותנטיים. אם המשתתפים ידעו את מטרת הניסוי האמיתית, הם עלולים להתנהג באופן לא טבעי. הכללים האתיים מחייבים להשתמש בהטעיה רק אם אין ברירה אחרת והמטרה המדעית מצדיקה זאת, ואסור להטעות לגבי היבטים שעלולים להשפיע על נכונותם של אנשים להשתתף.",
@@ -201,6 +225,7 @@ knowledge_base = [
         "difficulty": "Hard"
     },
     {
+        "id": "q_ca12518e6581",
         "topic": "ממשיות יומיומית מול ממשיות ניסויית",
         "question": "הסבר את ההבדל בין 'ממשיות יומיומית' (mundane realism) לבין 'ממשיות ניסויית' (experimental realism). איזה מהם חשוב יותר בניסוי פסיכולוגי, ומדוע?",
         "ideal_answer": "'ממשיות יומיומית' היא המידה שבה הניסוי דומה באופן שטחי לסיטואציות בחיים האמיתיים. 'ממשיות ניסויית' היא המידה שבה הניסוי מעורר במשתתפים מעורבות ותהליכים פסיכולוגיים אמיתיים. 'ממשיות ניסויית' היא החשובה יותר, כי המטרה היא לחקור תהליכים פסיכולוגיים אמיתיים (כמו תוקפנות או קונפורמיות), גם אם הסיטואציה שיוצרת אותם במעבדה היא מלאכותית.",
@@ -211,6 +236,7 @@ knowledge_base = [
         "difficulty": "Hard"
     },
     {
+        "id": "q_75816848ef65",
         "topic": "תהליך שיחת ההבהרה",
         "question": "מהי 'שיחת הבהרה' (debriefing) במחקר פסיכולוגי, ומהן שתי מטרותיה העיקריות?",
         "ideal_answer": "שיחת הבהרה היא הסבר שניתן למשתתפים לאחר סיום הניסוי. יש לה שתי מטרות: 1. מטרה חינוכית: להסביר למשתתפים את מטרות הניסוי, את ההשערות, וכל הטעיה שהייתה כרוכה בו. 2. מטרה אתית: לוודא שהמשתתפים לא יוצאים מהניסוי עם הרגשה רעה לגבי עצמם, ולטפל בכל מצוקה שעלולה הייתה להיגרם.",
@@ -220,4 +246,5 @@ knowledge_base = [
         "scope": "Specific",
         "difficulty": "Medium"
     }
-]
\ No newline at end of file
+]
+
@@ -0,0 +1,349 @@
+# knowledge_store.py
+# Compiled, indexed knowledge base. The hand-written sources (knowledge_base.py for
+# chapter 1, knowledge_sources/*.json for the rest) are validated and compiled into
+# one SQLite file; sessions then read only the small per-question fields, and the
+# large ones (ideal_answer, source_text) are loaded when a question is graded.
+#
+#   python knowledge_store.py build            # validate the sources and (re)compile the store
+#   python knowledge_store.py validate         # only validate
+#
+# A knowledge_sources/*.json file looks like
+#   {"chapter": 2, "title": "...", "questions": [{"id": "q_...", "topic": ..., "question": ..., ...}, ...]}
+#
+# Every entry carries an explicit, permanent "id" (any unique string; new ones are
+# conventionally "q_" + 12 hex digits). Ids used to be derived from the question text,
+# so rewording a question orphaned its history; `python knowledge_store.py validate`
+# prints that old id for any entry still missing one, to be pasted in once.
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+
+DEFAULT_STORE_PATH = os.environ.get("PSYTRAINER_KB_PATH", os.path.join(".cache", "knowledge_base.sqlite3"))
+_HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCES_DIR = os.path.join(_HERE, "knowledge_sources")
+BASE_SOURCE = os.path.join(_HERE, "knowledge_base.py")
+
+REQUIRED_FIELDS = {
+    "id": str,
+    "topic": str,
+    "question": str,
+    "ideal_answer": str,
+    "key_concepts": list,
+    "source_text": str,
+    "page_number": int,
+    "scope": str,
+    "difficulty": str,
+}
+SCOPES = ("General", "Specific")
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+LARGE_FIELDS = ("ideal_answer", "source_text")
+
+SCHEMA = """
+CREATE TABLE chapters (
+    chapter INTEGER PRIMARY KEY,
+    title TEXT
+);
+CREATE TABLE questions (
+    id TEXT PRIMARY KEY,
+    chapter INTEGER NOT NULL REFERENCES chapters (chapter),
+    position INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    question TEXT NOT NULL,
+    key_concepts TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    difficulty TEXT NOT NULL
+);
+CREATE TABLE question_texts (
+    id TEXT PRIMARY KEY REFERENCES questions (id),
+    ideal_answer TEXT NOT NULL,
+    source_text TEXT NOT NULL
+);
+CREATE INDEX idx_questions_chapter ON questions (chapter, position);
+CREATE INDEX idx_questions_topic ON questions (topic);
+CREATE INDEX idx_questions_scope ON questions (scope);
+CREATE INDEX idx_questions_difficulty ON questions (difficulty);
+CREATE INDEX idx_questions_page ON questions (page_number);
+"""
+
+
+def legacy_question_id(unit):
+    """
+    The id a question had when ids were derived from its text; only for migrating
+    entries that have no explicit "id" yet.
+    """
+    return "q_" + hashlib.sha1(unit["question"].encode("utf-8")).hexdigest()[:12]
+
+
+def question_id(unit):
+    """
+    Stable identifier of a question: its explicit "id", which survives edits to its text.
+    """
+    return unit.get("id") or legacy_question_id(unit)
+
+
+# --- Sources and validation ---
+def load_sources(sources_dir=SOURCES_DIR):
+    """
+    Returns [(chapter, title, entries, source name)] for knowledge_base.py and every JSON source.
+    """
+    from knowledge_base import knowledge_base
+
+    chapters = [(1, "מבוא לפסיכולוגיה חברתית", knowledge_base, os.path.basename(BASE_SOURCE))]
+    for path in sorted(glob.glob(os.path.join(sources_dir, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            source = json.load(f)
+        chapters.append((source["chapter"], source.get("title"), source["questions"], path))
+    return chapters
+
+
+def validate_sources(chapters):
+    """
+    Returns a list of human-readable errors; an empty list means the sources compile.
+    """
+    errors = []
+    seen_chapters = {}
+    seen_ids = {}
+    seen_questions = {}
+    for chapter, _, entries, source in chapters:
+        if chapter in seen_chapters:
+            errors.append(f"{source}: chapter {chapter} is also defined in {seen_chapters[chapter]}")
+        seen_chapters[chapter] = source
+        for index, entry in enumerate(entries):
+            where = f"{source} #{index + 1}"
+            if not isinstance(entry, dict):
+                errors.append(f"{where}: entry is not an object")
+                continue
+            for field, expected_type in REQUIRED_FIELDS.items():
+                value = entry.get(field)
+                if field == "id" and not value and isinstance(entry.get("question"), str) and entry["question"]:
+                    legacy_id = legacy_question_id(entry)
+                    errors.append(f"{where}: missing field 'id' (its text-derived id was \"{legacy_id}\")")
+                elif value is None or (isinstance(value, (str, list)) and not value):
+                    errors.append(f"{where}: missing or empty field '{field}'")
+                elif not isinstance(value, expected_type) or isinstance(value, bool):
+                    errors.append(f"{where}: field '{field}' should be {expected_type.__name__}")
+            unknown = set(entry) - set(REQUIRED_FIELDS)
+            if unknown:
+                errors.append(f"{where}: unknown fields {sorted(unknown)}")
+            if isinstance(entry.get("key_concepts"), list):
+                concepts = entry["key_concepts"]
+                if not all(isinstance(concept, str) and concept.strip() for concept in concepts):
+                    errors.append(f"{where}: key_concepts must be non-empty strings")
+                elif len(set(concepts)) != len(concepts):
+                    errors.append(f"{where}: duplicate key_concepts")
+            if entry.get("scope") not in SCOPES:
+                errors.append(f"{where}: scope must be one of {SCOPES}")
+            if entry.get("difficulty") not in DIFFICULTIES:
+                errors.append(f"{where}: difficulty must be one of {DIFFICULTIES}")
+            if isinstance(entry.get("id"), str) and entry["id"]:
+                if entry["id"] in seen_ids:
+                    errors.append(f"{where}: duplicate id '{entry['id']}' (also {seen_ids[entry['id']]})")
+                seen_ids[entry["id"]] = where
+            if isinstance(entry.get("question"), str) and entry["question"]:
+                if entry["question"] in seen_questions:
+                    errors.append(f"{where}: duplicate question (same text as {seen_questions[entry['question']]})")
+                seen_questions[entry["question"]] = where
+    return errors
+
+
+def build_store(path=DEFAULT_STORE_PATH, sources_dir=SOURCES_DIR):
+    """
+    Validates the sources and atomically replaces the compiled store. Raises ValueError on invalid sources.
+    """
+    chapters = load_sources(sources_dir)
+    errors = validate_sources(chapters)
+    if errors:
+        raise ValueError("Invalid knowledge base sources:\n" + "\n".join(errors))
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for chapter, title, entries, _ in chapters:
+            conn.execute("INSERT INTO chapters (chapter, title) VALUES (?, ?)", (chapter, title))
+            for position, entry in enumerate(entries):
+                qid = entry["id"]
+                conn.execute(
+                    "INSERT INTO questions (id, chapter, position, topic, question, key_concepts, page_number, "
+                    "scope, difficulty) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (qid, chapter, position, entry["topic"], entry["question"],
+                     json.dumps(entry["key_concepts"], ensure_ascii=False), entry["page_number"],
+                     entry["scope"], entry["difficulty"]),
+                )
+                conn.execute("INSERT INTO question_texts (id, ideal_answer, source_text) VALUES (?, ?, ?)",
+                             (qid, entry["ideal_answer"], entry["source_text"]))
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return sum(len(entries) for _, _, entries, _ in chapters)
+
+
+def _sources_mtime(sources_dir=SOURCES_DIR):
+    paths = [BASE_SOURCE] + glob.glob(os.path.join(sources_dir, "*.json"))
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+# --- Reading ---
+class QuestionUnit(Mapping):
+    """
+    One question as a read-only dict. The small fields are loaded with the question;
+    ideal_answer and source_text are fetched from the store on first access.
+    """
+
+    def __init__(self, store, fields):
+        self._store = store
+        self._fields = fields
+
+    def __getitem__(self, key):
+        if key in LARGE_FIELDS and key not in self._fields:
+            self._fields.update(self._store._large_fields(self._fields["id"]))
+        return self._fields[key]
+
+    def __iter__(self):
+        return iter(list(self._fields) + [field for field in LARGE_FIELDS if field not in self._fields])
+
+    def __len__(self):
+        return len(set(self._fields) | set(LARGE_FIELDS))
+
+    def __getstate__(self):
+        # Pickled (st.session_state) without the store; the large fields are resolved lazily again
+        return {"fields": {k: v for k, v in self._fields.items() if k not in LARGE_FIELDS}}
+
+    def __setstate__(self, state):
+        self._store = get_knowledge_store()
+        self._fields = state["fields"]
+
+    def __repr__(self):
+        return f"QuestionUnit({self._fields['id']!r}, topic={self._fields['topic']!r})"
+
+
+class KnowledgeStore(Mapping):
+    """
+    Read-only view of the compiled store, usable as a {question id: QuestionUnit} mapping.
+    Queries go through one shared connection guarded by a lock.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._ids = tuple(row[0] for row in self._query("SELECT id FROM questions ORDER BY chapter, position"))
+        self._id_set = frozenset(self._ids)
+        self._large_fields = lru_cache(maxsize=256)(self._load_large_fields)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Mapping interface ---
+    def __getitem__(self, qid):
+        rows = self._query(
+            "SELECT id, chapter, topic, question, key_concepts, page_number, scope, difficulty "
+            "FROM questions WHERE id = ?", (qid,),
+        )
+        if not rows:
+            raise KeyError(qid)
+        qid, chapter, topic, question, key_concepts, page_number, scope, difficulty = rows[0]
+        return QuestionUnit(self, {
+            "id": qid, "chapter": chapter, "topic": topic, "question": question,
+            "key_concepts": json.loads(key_concepts), "page_number": page_number,
+            "scope": scope, "difficulty": difficulty,
+        })
+
+    def __contains__(self, qid):
+        return qid in self._id_set
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --- Indexed lookups ---
+    def ids(self, chapter=None, topic=None, scope=None, difficulty=None, page_number=None):
+        """
+        Question ids matching every given filter, in chapter order.
+        """
+        filters = {"chapter": chapter, "topic": topic, "scope": scope, "difficulty": difficulty,
+                   "page_number": page_number}
+        clauses = [(f"{column} = ?", value) for column, value in filters.items() if value is not None]
+        if not clauses:
+            return list(self._ids)
+        where = " AND ".join(clause for clause, _ in clauses)
+        return [row[0] for row in self._query(
+            f"SELECT id FROM questions WHERE {where} ORDER BY chapter, position", [value for _, value in clauses]
+        )]
+
+    def chapters(self):
+        return self._query("SELECT chapter, title FROM chapters ORDER BY chapter")
+
+    def id_for_question(self, question_text):
+        rows = self._query("SELECT id FROM questions WHERE question = ?", (question_text,))
+        return rows[0][0] if rows else None
+
+    def iter_corpus(self):
+        """
+        Every text field of every question (for training the local triage model).
+        """
+        for question, key_concepts, ideal_answer, source_text in self._query(
+            "SELECT q.question, q.key_concepts, t.ideal_answer, t.source_text "
+            "FROM questions q JOIN question_texts t ON t.id = q.id"
+        ):
+            yield question
+            yield ideal_answer
+            yield source_text
+            yield " ".join(json.loads(key_concepts))
+
+    def _load_large_fields(self, qid):
+        rows = self._query("SELECT ideal_answer, source_text FROM question_texts WHERE id = ?", (qid,))
+        return dict(zip(LARGE_FIELDS, rows[0])) if rows else {}
+
+
+# --- Process-wide store, compiled on first use if missing or older than its sources ---
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_knowledge_store(path=DEFAULT_STORE_PATH):
+    global _store
+    with _store_lock:
+        if _store is None:
+            if not os.path.exists(path) or os.path.getmtime(path) < _sources_mtime():
+                build_store(path)
+            _store = KnowledgeStore(path)
+        return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate and compile the knowledge base.")
+    parser.add_argument("command", choices=["build", "validate"])
+    parser.add_argument("--path", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--sources", default=SOURCES_DIR)
+    args = parser.parse_args()
+
+    if args.command == "validate":
+        problems = validate_sources(load_sources(args.sources))
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} problem(s) found")
+        sys.exit(1 if problems else 0)
+
+    try:
+        count = build_store(args.path, args.sources)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"compiled {count} questions into {args.path}")
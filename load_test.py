@@ -0,0 +1,284 @@
+# load_test.py
+# Drives N simultaneous virtual students through streamlit_app.py with Streamlit's
+# AppTest, on the same fake LLM backend as benchmark.py and a thread-safe SQLite
+# stand-in for session_logs, to find how many students one app instance can serve.
+#
+#   python load_test.py                                  # 1,2,4,...,64 students -> load_tests/<time>.json
+#   python load_test.py --students 4,16,64 --rounds 5 --evaluation-ms 800
+#
+# Every virtual student opens the page (a question is shown), types an answer,
+# submits and reruns, `--rounds` times. Per level the report has sessions/sec,
+# rerun latency percentiles, memory per session, database connection counts and the
+# per-stage p95s; the saturation point is the first level where adding students no
+# longer adds throughput (or rerun p95 blows up), and the stage that slowed down the
+# most by then is flagged as the first bottleneck.
+
+import os
+import tempfile
+
+# Keep the process-wide response cache / near-duplicate index out of the real .cache (see benchmark.py)
+os.environ.setdefault("PSYTRAINER_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="psytrainer-load-"),
+                                                            "llm_responses.sqlite3"))
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+from benchmark import BENCHMARK_SETTINGS, SESSION_LOGS_DDL, FakeLiteLLM, build_workload, summarize_samples
+from event_logger import set_event_logger
+from grading_engine import GradingEngine, set_grading_engine
+from helper_functions import log_event_to_mysql
+from question_scheduler import QuestionScheduler, set_question_scheduler
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# Adding students must add at least this much throughput, and rerun p95 may grow at
+# most this much over the single-student level, before the instance counts as saturated
+MIN_THROUGHPUT_GAIN = 1.10
+MAX_P95_GROWTH = 3.0
+
+
+class SqliteSessionLogsStandIn:
+    """
+    session_logs in a local SQLite file with one connection per writing thread (the
+    app's script threads), counting connections opened and the peak held at once.
+    Every write also times itself, and the timings in EVALUATION_RESULT details are
+    collected as the grading stages. `query_delay_s` adds a database round trip to
+    every scheduler query, which SQLite in the same process does not have.
+    """
+
+    def __init__(self, path, query_delay_s=0.0):
+        self.path = path
+        self.query_delay_s = query_delay_s
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.connections_opened = 0
+        self.peak_connections_in_use = 0
+        self.samples = defaultdict(list)
+        with sqlite3.connect(path) as conn:
+            conn.execute(SESSION_LOGS_DDL)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            with self._lock:
+                self.connections_opened += 1
+        return conn
+
+    def log(self, session_id, event_type, details_dict, topic=None, difficulty=None, scope=None, score=None):
+        start = time.perf_counter()
+        with self._lock:
+            self._in_use += 1
+            self.peak_connections_in_use = max(self.peak_connections_in_use, self._in_use)
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO session_logs (session_id, event_type, details, topic, difficulty, scope, score) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, event_type, json.dumps(details_dict, ensure_ascii=False), topic, difficulty, scope, score),
+            )
+            conn.commit()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._in_use -= 1
+                self.samples["db_write"].append(elapsed_ms)
+                for stage, key in (("triage", "triageMs"), ("evaluation", "evaluationMs"), ("parsing", "parseMs")):
+                    if key in details_dict.get("timing", {}):
+                        self.samples[stage].append(details_dict["timing"][key])
+
+    def fetch_rows(self, student_id, after_id, limit):
+        """
+        QuestionScheduler's delta query against the stand-in (no event_time column here).
+        """
+        if self.query_delay_s:
+            time.sleep(self.query_delay_s)
+        return self._connection().execute(
+            "SELECT id, CAST(strftime('%s', created_at) AS REAL), event_type, details, score FROM session_logs "
+            "WHERE session_id = ? AND event_type IN ('SUBMISSION_ATTEMPT', 'EVALUATION_RESULT') AND id > ? "
+            "ORDER BY id LIMIT ?", (student_id, after_id, limit),
+        ).fetchall()
+
+    def reset_level(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+            self.peak_connections_in_use = 0
+            self.connections_opened = 0
+
+
+def install_stand_ins(settings, fake, query_delay_s=0.0, min_sync_interval_s=5.0):
+    """
+    Installs the same stand-ins as benchmark.py as the app's process-wide logger, engine
+    and scheduler; returns the session_logs stand-in and the secrets to run the app with.
+    """
+    sink = SqliteSessionLogsStandIn(os.path.join(tempfile.mkdtemp(prefix="psytrainer-load-"), "session_logs.sqlite3"),
+                                    query_delay_s)
+    set_event_logger(sink)
+    set_grading_engine(GradingEngine(log_event_to_mysql, settings, acompletion=fake))
+    set_question_scheduler(QuestionScheduler(sink.fetch_rows, state_path=os.path.join(
+        tempfile.mkdtemp(prefix="psytrainer-load-"), "scheduler_state.sqlite3"), min_sync_interval_s=min_sync_interval_s))
+    return sink, {"GEMINI_API_KEY": "load-test", "mysql": {"host": "stand-in"}, "grading": settings}
+
+
+def rss_bytes():
+    """
+    Resident set size of this process (Linux /proc; 0 elsewhere).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def make_session(secrets, timeout):
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for key, value in secrets.items():
+        app.secrets[key] = value
+    return app
+
+
+def virtual_student(app, answers, rerun_samples):
+    """
+    One student: open the page, then `len(answers)` times type an answer, submit and rerun.
+    """
+    start = time.perf_counter()
+    app.run()
+    rerun_samples["page_load"].append((time.perf_counter() - start) * 1000)
+    for answer in answers:
+        app.text_area[0].input(answer)
+        app.button[0].click()
+        start = time.perf_counter()
+        app.run()
+        rerun_samples["submit_rerun"].append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+
+def run_level(students, rounds, workload, secrets, sink, timeout):
+    rerun_samples = defaultdict(list)
+    sink.reset_level()
+    rss_before = rss_bytes()
+    sessions = [make_session(secrets, timeout) for _ in range(students)]
+    failures = []
+
+    def student(index):
+        answers = [workload[(index * rounds + r) % len(workload)][1] for r in range(rounds)]
+        try:
+            virtual_student(sessions[index], answers, rerun_samples)
+        except Exception as e:  # Keep the other students going; count the failure
+            failures.append(str(e))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=students) as pool:
+        list(pool.map(student, range(students)))
+    wall_s = time.perf_counter() - wall_start
+    rss_after = rss_bytes()  # Sessions are still alive here
+
+    level = {
+        "students": students,
+        "rounds": rounds,
+        "failures": len(failures),
+        "first_failure": failures[0] if failures else None,
+        "wall_s": round(wall_s, 3),
+        "sessions_per_s": round(students / wall_s, 3),
+        "submissions_per_s": round(students * rounds / wall_s, 3),
+        "memory_per_session_kb": round((rss_after - rss_before) / students / 1024, 1) if rss_before else None,
+        "db_connections_opened": sink.connections_opened,
+        "db_peak_connections_in_use": sink.peak_connections_in_use,
+        "stages_ms": {stage: summarize_samples(values)
+                      for stage, values in {**rerun_samples, **sink.samples}.items() if values},
+    }
+    del sessions
+    return level
+
+
+def find_saturation(levels):
+    """
+    Returns (saturated level or None, first bottleneck, p95 growth per stage by then).
+    """
+    baseline = levels[0]
+    saturated = None
+    for previous, level in zip(levels, levels[1:]):
+        throughput_gain = level["submissions_per_s"] / previous["submissions_per_s"]
+        if level["failures"] or "submit_rerun" not in level["stages_ms"]:
+            saturated = level
+            break
+        rerun_growth = level["stages_ms"]["submit_rerun"]["p95"] / baseline["stages_ms"]["submit_rerun"]["p95"]
+        if throughput_gain < MIN_THROUGHPUT_GAIN or rerun_growth > MAX_P95_GROWTH:
+            saturated = level
+            break
+    reference = saturated or levels[-1]
+
+    growth = {
+        stage: reference["stages_ms"][stage]["p95"] / stats["p95"]
+        for stage, stats in baseline["stages_ms"].items()
+        if stage in reference["stages_ms"] and stats["p95"] > 0
+    }
+    # A submit rerun contains every other stage; if it grew much more than any of them,
+    # the time went into running the script itself (rerun queueing, rendering, the GIL)
+    stage_growth = {stage: value for stage, value in growth.items() if stage not in ("page_load", "submit_rerun")}
+    bottleneck = max(stage_growth, key=stage_growth.get) if stage_growth else None
+    if bottleneck is None or growth.get("submit_rerun", 0) > 1.5 * stage_growth[bottleneck]:
+        bottleneck = "script_execution"
+    return saturated, bottleneck, {stage: round(value, 2) for stage, value in growth.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test streamlit_app.py with virtual students (Streamlit AppTest).")
+    parser.add_argument("--students", type=lambda text: [int(n) for n in text.split(",")],
+                        default=[1, 2, 4, 8, 16, 32, 64], help="Comma-separated numbers of simultaneous students")
+    parser.add_argument("--rounds", type=int, default=3, help="Submissions per student")
+    parser.add_argument("--triage-ms", type=float, default=400)
+    parser.add_argument("--evaluation-ms", type=float, default=1500)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--settings", default="{}", help="JSON object of grading settings overrides")
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest per-run timeout (seconds)")
+    parser.add_argument("-o", "--output", help="Results file (default: load_tests/<timestamp>.json)")
+    args = parser.parse_args()
+
+    settings = {**BENCHMARK_SETTINGS, **json.loads(args.settings)}
+    fake = FakeLiteLLM(args.triage_ms, args.evaluation_ms, args.jitter, args.seed)
+    sink, secrets = install_stand_ins(settings, fake)
+
+    workload = build_workload(max(args.students) * args.rounds, args.seed)
+    levels = []
+    for students in args.students:
+        level = run_level(students, args.rounds, workload, secrets, sink, args.timeout)
+        levels.append(level)
+        print(f"{students:>4} students: {level['sessions_per_s']:>7.3f} sessions/s, "
+              f"{level['submissions_per_s']:>7.3f} submissions/s, "
+              f"rerun p95 {level['stages_ms'].get('submit_rerun', {}).get('p95', float('nan')):.0f} ms, "
+              f"{level['failures']} failures")
+
+    saturated, bottleneck, growth = find_saturation(levels)
+    results = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "rounds": args.rounds, "settings": settings,
+                 "fake_backend": {"triage_ms": args.triage_ms, "evaluation_ms": args.evaluation_ms,
+                                  "jitter": args.jitter, "seed": args.seed},
+                 "llm_calls": dict(fake.calls)},
+        "levels": levels,
+        "saturation_students": saturated["students"] if saturated else None,
+        "first_bottleneck": bottleneck,
+        "p95_growth_at_saturation": growth,
+    }
+    if saturated:
+        print(f"saturated at {saturated['students']} students; first bottleneck: {bottleneck}")
+    else:
+        print(f"no saturation up to {levels[-1]['students']} students; fastest-growing stage: {bottleneck}")
+
+    output = args.output or os.path.join("load_tests", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
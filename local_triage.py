@@ -0,0 +1,174 @@
+# local_triage.py
+# Zero-network triage for the obvious cases: keyboard mashing, "לא יודעת",
+# single characters. Confident decisions skip the Triage Agent entirely;
+# everything else is escalated to the LLM.
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+from hebrew_text import hebrew_ratio, normalize_answer
+from knowledge_store import get_knowledge_store
+
+# Decisions with at least this confidence are trusted without calling the LLM.
+# Tune with `python triage_eval.py --sweep`.
+DEFAULT_ESCALATION_THRESHOLD = 0.9
+
+# Answers that mean "I don't know" (normalized, final letters folded)
+NO_KNOWLEDGE_PHRASES = [
+    "לא יודע", "לא יודעת", "אני לא יודע", "אני לא יודעת", "אין לי מושג", "אין מושג",
+    "לא זוכר", "לא זוכרת", "לא בטוח", "לא בטוחה", "אני לא בטוח", "אני לא בטוחה",
+    "לא למדתי", "לא קראתי", "לא הבנתי", "אין לי תשובה", "לא יודעת מה לענות", "אין לי מושג מה",
+    "idk", "i dont know", "i don t know", "dont know", "no idea", "not sure",
+]
+_NO_KNOWLEDGE_RE = re.compile(
+    r"(?<!\S)[וש]?(?:" + "|".join(re.escape(normalize_answer(p, fold_finals=True))
+                                  for p in sorted(NO_KNOWLEDGE_PHRASES, key=len, reverse=True)) + r")(?!\S)"
+)
+# Words that may accompany such a phrase ("לא קראתי את הפרק עדיין"); anything else
+# left over ("לא בטוחה, אולי עיבוד דואלי") makes it a hedged attempt for the LLM
+NO_KNOWLEDGE_FILLER_WORDS = {normalize_answer(w, fold_finals=True) for w in (
+    "אני", "את", "זה", "מה", "התשובה", "הפרק", "החומר", "עדיין", "באמת", "ממש", "בכלל", "פשוט", "סליחה",
+)}
+
+# Physical keyboard rows (Hebrew standard layout and QWERTY), finals folded
+KEYBOARD_ROWS = [normalize_answer(row, fold_finals=True) for row in (
+    "קראטוןםפ", "שדגכעיחלךף", "זסבהנמצתץ", "qwertyuiop", "asdfghjkl", "zxcvbnm",
+)]
+
+
+@dataclass
+class TriageDecision:
+    label: str          # valid_attempt / no_knowledge / gibberish
+    confidence: float   # 0..1
+    reason: str         # Short machine-readable explanation, logged with TRIAGE_RESULT
+
+
+# --- Character bigram model trained on the knowledge base itself ---
+class CharBigramModel:
+    """
+    Add-k smoothed character bigram model over normalized text.
+    `score(text)` is the mean log-probability per bigram; real Hebrew scores high,
+    keyboard mashing scores low.
+    """
+
+    def __init__(self, corpus, k=0.1):
+        self.k = k
+        self.bigrams = Counter()
+        self.unigrams = Counter()
+        for text in corpus:
+            padded = f" {normalize_answer(text, fold_finals=True)} "
+            self.unigrams.update(padded[:-1])
+            self.bigrams.update(zip(padded, padded[1:]))
+        self.vocab_size = len(set(self.unigrams)) + 1
+
+    def score(self, text):
+        padded = f" {normalize_answer(text, fold_finals=True)} "
+        if len(padded) < 3:
+            return float("-inf")
+        total = 0.0
+        for a, b in zip(padded, padded[1:]):
+            total += math.log((self.bigrams[(a, b)] + self.k) / (self.unigrams[a] + self.k * self.vocab_size))
+        return total / (len(padded) - 1)
+
+
+@lru_cache(maxsize=None)
+def bigram_model():
+    """
+    The model over the whole knowledge base, trained on the first triage rather than at
+    import, so importing the grading modules does not read every source_text.
+    """
+    return CharBigramModel(get_knowledge_store().iter_corpus())
+
+
+# Mean bigram log-probability boundaries, hand-tuned on the human labels in
+# triage_eval_set.jsonl (there are no Triage Agent labels yet: `python triage_eval.py
+# --call-llm` adds them and reports the agreement). The confidences below are
+# rough, not calibrated probabilities.
+GIBBERISH_SCORE = -4.6
+VALID_SCORE = -3.4
+
+
+def _is_keyboard_run(word):
+    return len(word) >= 4 and any(set(word) <= set(row) for row in KEYBOARD_ROWS)
+
+
+def _squash(x, scale):
+    """
+    Maps a positive margin to a confidence in (0.5, 1).
+    """
+    return 0.5 + 0.5 * (1 - math.exp(-max(x, 0.0) / scale))
+
+
+def triage_locally(answer: str, coverage=None) -> TriageDecision:
+    """
+    Classifies an answer with heuristics and the bigram model only.
+    Callers should escalate to the Triage Agent when `confidence` is below threshold.
+    An answer that contains digits or covers one of the question's key concepts
+    (`coverage`, from concept_matcher.py) is never rejected locally.
+    """
+    decision = _classify(answer)
+    if decision.label != "valid_attempt":
+        if coverage is not None and coverage.covered:
+            return TriageDecision("valid_attempt", 0.5, "key_concept")
+        if any(c.isdigit() for c in answer or ""):
+            return TriageDecision("valid_attempt", 0.5, "contains_digits")
+    return decision
+
+
+def _classify(answer):
+    raw = (answer or "").strip()
+    norm = normalize_answer(raw, fold_finals=True)
+    letters = [c for c in norm if c.isalpha()]
+    words = norm.split()
+
+    if not letters:
+        if "?" in raw and set(raw) <= set("?. "):
+            return TriageDecision("no_knowledge", 0.91, "question_marks_only")
+        return TriageDecision("gibberish", 0.93, "no_letters")
+
+    if len(letters) <= 2:
+        return TriageDecision("gibberish", 0.92, "too_short")
+
+    # Only a bare "לא יודעת" is settled; "לא בטוחה אבל..." is usually a hedged attempt
+    hedged = False
+    if _NO_KNOWLEDGE_RE.search(norm):
+        rest = _NO_KNOWLEDGE_RE.sub(" ", norm).split()
+        if all(w in NO_KNOWLEDGE_FILLER_WORDS for w in rest):
+            return TriageDecision("no_knowledge", 0.93, "no_knowledge_phrase")
+        hedged = True
+
+    if len(set(letters)) <= 2 or max(Counter(letters).values()) / len(letters) > 0.6:
+        return TriageDecision("gibberish", 0.93, "repeated_characters")
+
+    if len(words) >= 3 and len(set(words)) == 1:
+        return TriageDecision("gibberish", 0.91, "repeated_words")
+
+    if all(_is_keyboard_run(w) or len(w) <= 1 for w in words):
+        return TriageDecision("gibberish", 0.92, "keyboard_run")
+
+    if hebrew_ratio(norm) < 0.5:
+        # The bigram model only knows Hebrew; leave Latin-script answers to the LLM
+        return TriageDecision("valid_attempt", 0.5, "non_hebrew")
+
+    score = bigram_model().score(norm)
+    if score <= GIBBERISH_SCORE:
+        return TriageDecision("gibberish", _squash(GIBBERISH_SCORE - score, 0.3), "low_ngram_score")
+    if hedged:
+        return TriageDecision("valid_attempt", 0.6, "hedged_attempt")
+    if score >= VALID_SCORE and len(words) >= 3:
+        # More words means more evidence that the answer is real language
+        return TriageDecision("valid_attempt", _squash((score - VALID_SCORE) + 0.15 * len(words), 0.5), "high_ngram_score")
+    return TriageDecision("valid_attempt", 0.5, "uncertain")
+
+
+def fast_path_triage(answer: str, threshold: float = DEFAULT_ESCALATION_THRESHOLD, coverage=None):
+    """
+    Returns the local TriageDecision if it is confident enough, otherwise None.
+    """
+    decision = triage_locally(answer, coverage)
+    if decision.confidence >= threshold:
+        return decision
+    return None
@@ -0,0 +1,207 @@
+# micro_batching.py
+# Coalesces concurrent evaluations of the same question into one Evaluator Agent
+# call. When a whole class answers the same question at once, the ideal answer and
+# key concepts are sent once per batch instead of once per student; each waiting
+# grading gets its own {score, justification, feedback} back.
+
+import asyncio
+import bisect
+import json
+import logging
+import threading
+import time
+
+from evaluation_schema import load_json_object, validate_evaluation
+from prompts import build_batch_evaluation_prompt, build_evaluation_prompt
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: counts[i] is the number of values <= bounds[i]; the last
+    count is the overflow bucket.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "mean": round(self.sum / self.total, 2) if self.total else None,
+        }
+
+
+class _BatchItem:
+    def __init__(self, answer, future):
+        self.answer = answer
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects evaluations per question id for at most `max_wait_ms` (or until
+    `max_batch_size` answers are waiting) and sends them as one request.
+
+    `complete(messages, **kwargs)` sends one request (litellm.acompletion semantics,
+    e.g. ModelRouter.complete). `await evaluate(qid, unit, answer)` returns (evaluation JSON string, usage dict).
+    Batch responses that are malformed, or that miss some answers, are completed with
+    ordinary per-answer calls for the affected answers. Batches never span event loops,
+    so coalescing only pays off where many gradings share a loop (grading_server.py).
+    """
+
+    def __init__(self, complete, max_batch_size=8, max_wait_ms=50):
+        self.complete = complete
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending = {}  # (event loop, qid) -> (unit, [_BatchItem], timer handle)
+        self._tasks = set()  # Batches in flight; the loop only keeps weak references to tasks
+        self._lock = threading.Lock()
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._batch_latency = Histogram(LATENCY_BUCKETS_MS)
+        self._item_latency = Histogram(LATENCY_BUCKETS_MS)
+        self._stats = {"batches": 0, "batched_answers": 0, "malformed_batches": 0, "fallback_answers": 0,
+                       "failed_batches": 0}
+
+    async def evaluate(self, qid, unit, answer):
+        loop = asyncio.get_running_loop()
+        item = _BatchItem(answer, loop.create_future())
+        key = (loop, qid)
+        if key not in self._pending:
+            self._pending[key] = (unit, [], loop.call_later(self.max_wait, self._flush, key))
+        items = self._pending[key][1]
+        items.append(item)
+        if len(items) >= self.max_batch_size:
+            self._flush(key)
+        return await item.future
+
+    def _flush(self, key):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        unit, items, timer = pending
+        timer.cancel()
+        task = asyncio.ensure_future(self._run_batch(unit, items))
+        with self._lock:
+            self._tasks.add(task)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        with self._lock:
+            self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # _run_batch hands every expected error to the waiting gradings, so this is a bug
+            logger.error("Evaluation batch crashed", exc_info=task.exception())
+
+    async def _run_batch(self, unit, items):
+        start = time.perf_counter()
+        try:
+            if len(items) == 1:
+                results = [await self._evaluate_single(unit, items[0].answer)]
+            else:
+                results = await self._evaluate_batch(unit, items)
+        except Exception as e:
+            with self._lock:
+                self._stats["failed_batches"] += 1
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batched_answers"] += len(items)
+            self._batch_sizes.observe(len(items))
+            self._batch_latency.observe((now - start) * 1000)
+            for item in items:
+                self._item_latency.observe((now - item.enqueued_at) * 1000)
+        for item, result in zip(items, results):
+            if not item.future.done():  # The waiting grading may have been cancelled
+                item.future.set_result(result)
+
+    async def _evaluate_batch(self, unit, items):
+        """
+        One call for the whole batch; the prompt tokens are split evenly between the answers.
+        """
+        response = await self.complete(
+            [{"role": "user", "content": build_batch_evaluation_prompt(unit, [i.answer for i in items])}],
+            response_format={"type": "json_object"},
+        )
+        shared_usage = _split_usage(response, len(items))
+        evaluations = parse_batch_evaluations(response.choices[0].message.content, len(items))
+
+        results = [(json.dumps(evaluation, ensure_ascii=False), dict(shared_usage)) for evaluation in evaluations]
+        missing = [index for index, evaluation in enumerate(evaluations) if evaluation is None]
+        if not missing:
+            return results
+
+        with self._lock:
+            self._stats["malformed_batches"] += 1
+            self._stats["fallback_answers"] += len(missing)
+        fallbacks = await asyncio.gather(*(self._evaluate_single(unit, items[i].answer) for i in missing))
+        for index, (fallback_json, fallback_usage) in zip(missing, fallbacks):
+            results[index] = (fallback_json, {key: shared_usage.get(key, 0) + fallback_usage.get(key, 0)
+                                              for key in ("prompt_tokens", "completion_tokens")})
+        return results
+
+    async def _evaluate_single(self, unit, answer):
+        response = await self.complete(
+            [{"role": "user", "content": build_evaluation_prompt(unit, answer)}],
+            response_format={"type": "json_object"},
+        )
+        return response.choices[0].message.content, _split_usage(response, 1)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["batch_size_histogram"] = self._batch_sizes.as_dict()
+            snapshot["batch_latency_ms_histogram"] = self._batch_latency.as_dict()
+            snapshot["answer_latency_ms_histogram"] = self._item_latency.as_dict()
+        snapshot["waiting_batches"] = len(self._pending)
+        return snapshot
+
+
+def parse_batch_evaluations(content, expected):
+    """
+    Returns a list of `expected` evaluation dicts, with None for every answer the
+    batch response does not cover with a usable {score, justification, feedback}
+    (repaired like single evaluations, see evaluation_schema.py).
+    """
+    evaluations = [None] * expected
+    data = load_json_object(content, [])
+    entries = data.get("evaluations") if data is not None else None
+    if not isinstance(entries, list):
+        return evaluations
+
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("index", position + 1)
+        if not isinstance(index, int) or not 1 <= index <= expected or evaluations[index - 1] is not None:
+            continue
+        evaluations[index - 1] = validate_evaluation(entry, [])
+    return evaluations
+
+
+def _split_usage(response, parts):
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return {}
+    return {key: (getattr(usage, key, 0) or 0) // parts for key in ("prompt_tokens", "completion_tokens")}
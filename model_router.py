@@ -0,0 +1,260 @@
+# model_router.py
+# Routing layer in front of litellm.acompletion for both agents: per-call deadlines,
+# fallback to alternate models, per-model circuit breakers and latency tracking, and
+# hedged requests (if the primary has not answered by its observed p95, an alternate
+# model is asked as well and the first answer wins).
+#
+# A route is a model name or a dict of litellm kwargs, e.g.
+#   {"model": "openai/fake-fast", "api_base": "http://localhost:8700/v1", "api_key": "x"}
+# so the whole layer can be exercised against fake_llm_server.py.
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+import litellm
+
+from resilience import CircuitBreaker
+from tracing import get_tracer
+
+
+class LLMUnavailableError(Exception):
+    """
+    Every route failed, was circuit-broken or ran past the deadline.
+    """
+
+
+def _route_kwargs(route):
+    return dict(route) if isinstance(route, dict) else {"model": route}
+
+
+class DeadlineStream:
+    """
+    Wraps a streamed response so iterating it stays within the call's deadline: each
+    chunk is awaited for at most the time left, and running out raises LLMUnavailableError.
+    Other attributes (e.g. `model`) are read from the wrapped stream.
+    """
+
+    def __init__(self, stream, deadline, deadline_s, on_timeout=None):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._deadline = deadline
+        self._deadline_s = deadline_s
+        self._on_timeout = on_timeout
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        remaining = self._deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(self._iterator.__anext__(), remaining)
+        except asyncio.TimeoutError:
+            await self.aclose()
+            if self._on_timeout is not None:
+                self._on_timeout()
+            raise LLMUnavailableError(f"The stream did not finish within {self._deadline_s:g}s") from None
+
+    async def aclose(self):
+        close = getattr(self._iterator, "aclose", None) or getattr(self._stream, "aclose", None)
+        if close is not None:
+            try:
+                await close()
+            except Exception:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ModelStats:
+    """
+    Latency EWMA, a window of recent latencies (for the hedge delay) and a breaker for one route.
+    """
+
+    def __init__(self, name, ewma_alpha=0.2, window=200, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.ewma_alpha = ewma_alpha
+        self.ewma_ms = None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, name=name)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._counts = {"calls": 0, "successes": 0, "failures": 0, "hedges_won": 0}
+
+    def record_success(self, latency_ms, hedge=False):
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self.ewma_ms = latency_ms if self.ewma_ms is None else (
+                self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * self.ewma_ms
+            )
+            self._counts["successes"] += 1
+            self._counts["hedges_won"] += hedge
+
+    def record_abandoned(self, latency_ms):
+        """
+        A call cancelled after `latency_ms` (lost a hedge race) took at least that long;
+        keeping it in the window stops the p95 from forgetting the slow tail.
+        """
+        self.breaker.release_trial()
+        with self._lock:
+            self._latencies.append(latency_ms)
+
+    def record_failure(self):
+        self.breaker.record_failure()
+        with self._lock:
+            self._counts["failures"] += 1
+
+    def record_call(self):
+        with self._lock:
+            self._counts["calls"] += 1
+
+    def percentile_ms(self, fraction, min_samples):
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self._counts)
+        snapshot["ewma_ms"] = round(self.ewma_ms, 1) if self.ewma_ms is not None else None
+        snapshot["p95_ms"] = self.percentile_ms(0.95, 1)
+        snapshot["breaker_state"] = self.breaker.state
+        return snapshot
+
+
+class ModelRouter:
+    """
+    `await router.complete(messages, **kwargs)` behaves like litellm.acompletion on the
+    first available route, with fallback, hedging and a deadline on top.
+
+    - Routes whose breaker is open are skipped.
+    - A failed call moves on to the next route, all within `deadline_s`.
+    - With `hedge=True`, when the current call has not answered after its route's p95
+      (or `default_hedge_delay_s` until `min_samples` latencies are known), the next
+      route is called too and the first success wins; the loser is cancelled.
+    - Streaming calls (stream=True) fall back but never hedge, since the stream has
+      already started rendering by the time the p95 passes. The returned stream is a
+      DeadlineStream, so the deadline covers the tokens as well as opening the call.
+    `acompletion` replaces litellm.acompletion (e.g. a fake backend for benchmarks).
+    """
+
+    def __init__(self, routes, deadline_s=30.0, hedge=True, hedge_percentile=0.95,
+                 default_hedge_delay_s=3.0, min_samples=20, acompletion=None):
+        if not routes:
+            raise ValueError("ModelRouter needs at least one route")
+        self.routes = [_route_kwargs(route) for route in routes]
+        self.deadline_s = deadline_s
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay_s = default_hedge_delay_s
+        self.min_samples = min_samples
+        self.acompletion = acompletion
+        self.stats = {route["model"]: ModelStats(route["model"]) for route in self.routes}
+
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "fallbacks": 0, "hedges_fired": 0, "deadline_exceeded": 0, "unavailable": 0}
+
+    @property
+    def primary_model(self):
+        return self.routes[0]["model"]
+
+    async def complete(self, messages, **kwargs):
+        self._bump("calls")
+        deadline = time.monotonic() + self.deadline_s
+        try:
+            response = await asyncio.wait_for(self._complete(messages, kwargs), self.deadline_s)
+        except asyncio.TimeoutError:
+            self._bump("deadline_exceeded")
+            raise LLMUnavailableError(f"No model answered within {self.deadline_s:g}s") from None
+        if kwargs.get("stream"):
+            return DeadlineStream(response, deadline, self.deadline_s, lambda: self._bump("deadline_exceeded"))
+        return response
+
+    async def _complete(self, messages, kwargs):
+        hedge = self.hedge and not kwargs.get("stream")
+        remaining = list(self.routes)
+        running = {}  # task -> model name
+        last_error = None
+
+        def launch(is_hedge):
+            # Breakers are asked only when a route is really about to be called, so a
+            # half-open breaker's single trial is never reserved for a call that is not made
+            while remaining:
+                route = remaining.pop(0)
+                if self.stats[route["model"]].breaker.allow():
+                    task = asyncio.ensure_future(self._call(route, messages, kwargs, is_hedge))
+                    running[task] = route["model"]
+                    return True
+            return False
+
+        if not launch(False):
+            self._bump("unavailable")
+            raise LLMUnavailableError("All models are circuit-broken")
+        try:
+            while running:
+                timeout = None
+                if hedge and len(running) == 1 and remaining:
+                    timeout = self._hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:  # The current call is slower than its p95: hedge
+                    if launch(True):
+                        self._bump("hedges_fired")
+                    continue
+
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not running:
+                    if not launch(False):
+                        break
+                    self._bump("fallbacks")
+        finally:
+            for task in running:
+                task.cancel()
+
+        self._bump("unavailable")
+        raise LLMUnavailableError(f"All models failed: {last_error}") from last_error
+
+    async def _call(self, route, messages, kwargs, is_hedge):
+        stats = self.stats[route["model"]]
+        stats.record_call()
+        start = time.perf_counter()
+        # For streams the span covers opening the stream; tokens arrive on the llm_stream span
+        with get_tracer().span("llm_call", model=route["model"], hedge=is_hedge,
+                               streamed=bool(kwargs.get("stream"))) as span:
+            try:
+                response = await (self.acompletion or litellm.acompletion)(messages=messages, **route, **kwargs)
+            except asyncio.CancelledError:
+                stats.record_abandoned((time.perf_counter() - start) * 1000)
+                span.set(outcome="cancelled")
+                raise  # Lost a hedge race; says nothing about the model's health
+            except Exception:
+                stats.record_failure()
+                raise
+            span.add_usage(response)
+        stats.record_success((time.perf_counter() - start) * 1000, hedge=is_hedge)
+        return response
+
+    def _hedge_delay(self, model):
+        p95_ms = self.stats[model].percentile_ms(self.hedge_percentile, self.min_samples)
+        return p95_ms / 1000 if p95_ms is not None else self.default_hedge_delay_s
+
+    def _bump(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._counts)
+        snapshot["models"] = {name: stats.snapshot() for name, stats in self.stats.items()}
+        return snapshot
@@ -0,0 +1,88 @@
+# pages/instructor_dashboard.py
+# Instructor view of how students are doing, per topic, per difficulty and per day.
+# Reads only the rollup tables maintained by rollups.py (never session_logs), so it
+# stays interactive however large session_logs grows.
+#
+# Required [instructor] section in secrets.toml (without it the page shows nothing,
+# since Streamlit lists every page in pages/ in every student's sidebar):
+#   password = "..."      -> asked for before showing anything
+
+import hmac
+
+import streamlit as st
+
+from rollups import connect, daily_summary, default_range, difficulty_summary, rollup_status, topic_summary
+
+st.title("📊  לוח מחוונים למרצה")
+
+password = st.secrets.get("instructor", {}).get("password")
+if not password:
+    st.error("הדף אינו זמין: לא הוגדרה סיסמת מרצה ([instructor] password ב-secrets.toml).")
+    st.stop()
+if not hmac.compare_digest(st.text_input("סיסמה", type="password").encode("utf-8"), password.encode("utf-8")):
+    st.stop()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load(view, start, end, filter_value=None):
+    """
+    One rollup query, cached for a minute per (view, range, filter).
+    """
+    conn = connect(st.secrets["mysql"])
+    try:
+        if view == "topic":
+            return topic_summary(conn, start, end, filter_value)
+        if view == "difficulty":
+            return difficulty_summary(conn, start, end)
+        if view == "day":
+            return daily_summary(conn, start, end, filter_value)
+        return rollup_status(conn)
+    finally:
+        conn.close()
+
+
+date_range = st.date_input("טווח תאריכים", value=default_range())
+if len(date_range) != 2:  # Only the first day picked so far
+    st.stop()
+start, end = date_range
+
+status = load("status", None, None)
+if status:
+    st.caption(f"עודכן לאחרונה: {status['updated_at']} · {status['rows_processed']:,} אירועים עובדו")
+else:
+    st.warning("טבלאות הסיכום ריקות. יש להריץ `python rollups.py update`.")
+
+# --- Per difficulty ---
+st.header("לפי רמת קושי")
+by_difficulty = load("difficulty", start, end)
+st.dataframe(
+    [{"רמת קושי": row["difficulty"] or "—", "הגשות": row["submissions"], "ציון ממוצע": row["avg_score"],
+      "שיעור 'אין ידע'": row["no_knowledge_rate"], "ציונים נמוכים": row["low_scores"]} for row in by_difficulty],
+    hide_index=True, use_container_width=True,
+)
+st.bar_chart(
+    [{"difficulty": row["difficulty"] or "—", "valid_attempt": row["triage_valid"],
+      "no_knowledge": row["triage_no_knowledge"], "gibberish": row["triage_gibberish"],
+      "empty_answer": row["empty_answers"]} for row in by_difficulty],
+    x="difficulty", y=["valid_attempt", "no_knowledge", "gibberish", "empty_answer"],
+)
+
+# --- Per topic ---
+st.header("לפי נושא")
+difficulty = st.selectbox("רמת קושי", ["הכול"] + [row["difficulty"] for row in by_difficulty if row["difficulty"]])
+by_topic = load("topic", start, end, None if difficulty == "הכול" else difficulty)
+st.dataframe(
+    [{"נושא": row["topic"] or "—", "הוצגו": row["questions_presented"], "הגשות": row["submissions"],
+      "הערכות": row["evaluations"], "ציון ממוצע": row["avg_score"], "שיעור 'אין ידע'": row["no_knowledge_rate"],
+      "שגיאות": row["errors"]} for row in by_topic],
+    hide_index=True, use_container_width=True,
+)
+
+# --- Per day ---
+st.header("לפי יום")
+topic = st.selectbox("נושא", ["הכול"] + [row["topic"] for row in by_topic if row["topic"]])
+by_day = load("day", start, end, None if topic == "הכול" else topic)
+st.line_chart([{"day": row["day"], "submissions": row["submissions"], "evaluations": row["evaluations"]}
+               for row in by_day], x="day", y=["submissions", "evaluations"])
+st.line_chart([{"day": row["day"], "avg_score": row["avg_score"]} for row in by_day if row["avg_score"] is not None],
+              x="day", y="avg_score")
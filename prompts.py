@@ -0,0 +1,146 @@
+# prompts.py
+# Prompt templates for the two agents, kept in one place so the app, the
+# evaluation scripts and the caches all build byte-identical prompts.
+
+import json
+from functools import lru_cache
+
+TRIAGE_MODEL = "gemini/gemini-1.5-flash-latest"
+EVALUATION_MODEL = "gemini/gemini-1.5-flash-latest"
+FALLBACK_MODEL = "gemini/gemini-1.5-flash-8b"  # Alternate route for both agents (model_router.py)
+
+TRIAGE_LABELS = ("valid_attempt", "no_knowledge", "gibberish")
+
+TRIAGE_PROMPT_TEMPLATE = """
+                You are a text classification agent. Classify the student's answer into one of these three categories:
+                - `valid_attempt`: The student is trying to answer the question.
+                - `no_knowledge`: The student states they don't know the answer or are unsure.
+                - `gibberish`: The answer is nonsense or random characters.
+                Student's Answer: "{student_answer}"
+                ---
+                Respond with ONLY ONE WORD: valid_attempt, no_knowledge, or gibberish.
+                """
+
+# The evaluator prompts are ordered static -> per question -> per answer: the instructions
+# are byte-identical for every grading and the per-question prefix for every student
+# answering that question, so provider-side prompt caching can reuse them; only the
+# student's answer at the end differs. The per-question prefixes are compiled once
+# (evaluation_prompt_prefix) instead of re-formatting the whole template on every click.
+EVALUATION_INSTRUCTIONS = """You are an assistant that evaluates a student's answer against an ideal answer from a textbook. The interaction must be in HEBREW, Female form (You are a male trainer, and the student is female).
+Based ONLY on the information given below, perform the following tasks in HEBREW for the student's answer at the end:
+1. Provide a score from 1 (completely wrong) to 5 (perfect).
+2. Provide a short, one-sentence justification for your score.
+3. Provide friendly and constructive feedback to help the student learn.
+
+Format your response as a single, valid JSON object with ONLY the following keys:
+- "score": An integer from 1 to 5.
+- "justification": A string containing the justification.
+- "feedback": A string containing the feedback.
+---
+"""
+
+EVALUATION_QUESTION_TEMPLATE = """**Sample of an Ideal Answer (in Hebrew) to this question:** {ideal_answer}
+**Key Concepts the student should mention (in Hebrew):** {key_concepts}
+---
+"""
+
+EVALUATION_ANSWER_TEMPLATE = """**Student's Answer (in Hebrew):** {student_answer}
+"""
+
+# The whole prompt, for cache keys (response_cache.template_hash)
+EVALUATION_PROMPT_TEMPLATE = EVALUATION_INSTRUCTIONS + EVALUATION_QUESTION_TEMPLATE + EVALUATION_ANSWER_TEMPLATE
+
+# Compact variant: instead of the full ideal answer, the evaluator gets the result
+# of the local key-concept matcher (concept_matcher.py)
+EVALUATION_COVERAGE_QUESTION_TEMPLATE = """**Question (in Hebrew):** {question}
+---
+"""
+
+EVALUATION_COVERAGE_ANSWER_TEMPLATE = """**Key Concepts the student mentioned (in Hebrew):** {covered_concepts}
+**Key Concepts the student did NOT mention (in Hebrew):** {missing_concepts}
+**Student's Answer (in Hebrew):** {student_answer}
+"""
+
+EVALUATION_COVERAGE_INSTRUCTIONS = EVALUATION_INSTRUCTIONS.replace("against an ideal answer from", "to a question from")
+
+EVALUATION_COVERAGE_PROMPT_TEMPLATE = (EVALUATION_COVERAGE_INSTRUCTIONS + EVALUATION_COVERAGE_QUESTION_TEMPLATE
+                                       + EVALUATION_COVERAGE_ANSWER_TEMPLATE)
+
+# Micro-batched variant (micro_batching.py): the single-answer prompt's instructions and
+# per-question prefix, byte for byte, then several student answers and the array format
+BATCH_EVALUATION_ANSWERS_TEMPLATE = """**Students' Answers (in Hebrew), each evaluated independently of the others:**
+{numbered_answers}
+---
+These answers come from several students: perform the tasks above for EACH answer. Instead of a single object,
+format your response as a single, valid JSON object with ONLY the key "evaluations": an array with exactly
+{answer_count} objects, in the same order as the answers, each with ONLY the key "index" (the number of the
+answer) and the keys "score", "justification" and "feedback" described above.
+"""
+
+BATCH_EVALUATION_PROMPT_TEMPLATE = (EVALUATION_INSTRUCTIONS + EVALUATION_QUESTION_TEMPLATE
+                                    + BATCH_EVALUATION_ANSWERS_TEMPLATE)
+
+# Follow-up sent once, after the evaluator's own unparseable response (grading_engine.py),
+# when evaluation_schema.py could not repair it locally
+EVALUATION_REPAIR_PROMPT = """
+                    Your previous response could not be read as the required JSON object.
+                    Respond again with ONLY a single, valid JSON object, without code fences or any other text, with ONLY the following keys:
+                    - "score": An integer from 1 to 5.
+                    - "justification": A string containing the justification.
+                    - "feedback": A string containing the feedback.
+                    """
+
+
+def build_triage_prompt(student_answer):
+    return TRIAGE_PROMPT_TEMPLATE.format(student_answer=student_answer)
+
+
+@lru_cache(maxsize=4096)
+def evaluation_prompt_prefix(ideal_answer, key_concepts):
+    """
+    Everything before the student's answer, compiled once per (ideal answer, key concepts tuple).
+    """
+    return EVALUATION_INSTRUCTIONS + EVALUATION_QUESTION_TEMPLATE.format(
+        ideal_answer=ideal_answer,
+        key_concepts=", ".join(key_concepts),
+    )
+
+
+@lru_cache(maxsize=4096)
+def coverage_evaluation_prompt_prefix(question):
+    return EVALUATION_COVERAGE_INSTRUCTIONS + EVALUATION_COVERAGE_QUESTION_TEMPLATE.format(question=question)
+
+
+def build_evaluation_prompt(unit, student_answer):
+    prefix = evaluation_prompt_prefix(unit['ideal_answer'], tuple(unit['key_concepts']))
+    return prefix + EVALUATION_ANSWER_TEMPLATE.format(student_answer=student_answer)
+
+
+def build_coverage_evaluation_prompt(unit, student_answer, coverage):
+    return coverage_evaluation_prompt_prefix(unit['question']) + EVALUATION_COVERAGE_ANSWER_TEMPLATE.format(
+        covered_concepts=", ".join(coverage.covered) or "-",
+        missing_concepts=", ".join(coverage.missing) or "-",
+        student_answer=student_answer,
+    )
+
+
+def build_batch_evaluation_prompt(unit, student_answers):
+    numbered_answers = "\n".join(
+        f"  [{index}] {json.dumps(answer, ensure_ascii=False)}" for index, answer in enumerate(student_answers, 1)
+    )
+    prefix = evaluation_prompt_prefix(unit['ideal_answer'], tuple(unit['key_concepts']))
+    return prefix + BATCH_EVALUATION_ANSWERS_TEMPLATE.format(
+        numbered_answers=numbered_answers,
+        answer_count=len(student_answers),
+    )
+
+
+def parse_triage_label(content):
+    """
+    Maps the Triage Agent's free-text reply to one of TRIAGE_LABELS (or the raw text if none match).
+    """
+    classification = (content or "").strip().lower()
+    for label in TRIAGE_LABELS:
+        if label in classification:
+            return label
+    return classification
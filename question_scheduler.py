@@ -0,0 +1,344 @@
+# question_scheduler.py
+# Adaptive spaced-repetition question selection. Every student has a priority queue
+# of the questions they were graded on, keyed by when each one is due again; the
+# interval grows with good EVALUATION_RESULT scores, collapses after poor ones and is
+# shorter for hard and specific questions. Questions never seen come in a fixed
+# easy-to-hard, general-to-specific order once nothing is due.
+#
+# A student's schedule is built from session_logs incrementally: only rows after the
+# last applied id (the watermark) are read, the result is snapshotted to a local SQLite
+# file, and the schedule object is cached in-process, so a returning student costs one
+# indexed query for whatever happened since their last sync.
+#
+#   scheduler = get_question_scheduler(st.secrets["mysql"])
+#   qid = scheduler.next_question(student_id, exclude=(current_qid,))
+#   scheduler.record(student_id, qid, score, submission_id)      # right after grading
+
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from knowledge_store import DIFFICULTIES, SCOPES, get_knowledge_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.environ.get("PSYTRAINER_SCHEDULER_PATH", os.path.join(".cache", "scheduler_state.sqlite3"))
+
+# --- Scheduling policy ---
+RELEARN_INTERVAL_S = 10 * 60          # A score of 2 or less brings the question back after this long
+BASE_INTERVAL_S = 6 * 3600            # Interval at strength 0 (a score of 3 on first try)
+INTERVAL_GROWTH = 2.5                 # Each strength step multiplies the interval by this
+MAX_INTERVAL_S = 180 * 24 * 3600
+DIFFICULTY_INTERVAL_FACTOR = {"Easy": 1.5, "Medium": 1.0, "Hard": 0.6}
+SCOPE_INTERVAL_FACTOR = {"General": 1.0, "Specific": 0.8}
+MAX_STRENGTH = 12
+
+# Rows read from session_logs per round trip while catching up
+SYNC_PAGE_SIZE = 5000
+# Rows younger than this are left for a later sync, as in rollups.py: auto-increment ids
+# can become visible out of order while concurrent inserts (other app processes, a spool
+# replay) commit, and an id skipped past the watermark is never read again. Grades given
+# in this process are applied at once by record(), so the delay only hides other writers.
+SETTLE_SECONDS = 5
+
+DELTA_QUERY = """
+SELECT id, UNIX_TIMESTAMP(COALESCE(event_time, created_at)), event_type, details, score
+FROM session_logs
+WHERE session_id = %s AND event_type IN ('SUBMISSION_ATTEMPT', 'EVALUATION_RESULT') AND id > %s
+  AND created_at < NOW() - INTERVAL %s SECOND
+ORDER BY id
+LIMIT %s
+"""
+
+
+def next_interval(strength, score, difficulty, scope):
+    """
+    Seconds until a question graded `score` at the given (already updated) strength is due again.
+    """
+    if score is not None and score <= 2:
+        return RELEARN_INTERVAL_S
+    interval = BASE_INTERVAL_S * INTERVAL_GROWTH ** strength
+    interval *= DIFFICULTY_INTERVAL_FACTOR.get(difficulty, 1.0) * SCOPE_INTERVAL_FACTOR.get(scope, 1.0)
+    return min(interval, MAX_INTERVAL_S)
+
+
+def next_strength(strength, score):
+    if score is None:
+        return strength
+    if score <= 2:
+        return 0
+    return max(0, min(MAX_STRENGTH, strength + score - 3))
+
+
+class StudentSchedule:
+    """
+    One student's review state: {question id: [strength, last_seen, last_score, attempts, due_at]}
+    plus a heap of (due_at, question id). Updates push a new heap entry (O(log n)); entries
+    whose due_at no longer matches the state are stale and skipped when they reach the top.
+    """
+
+    def __init__(self, student_id):
+        self.student_id = student_id
+        self.watermark = 0            # Highest session_logs id applied
+        self.last_attempt_qid = None  # Pairs legacy EVALUATION_RESULT rows (no questionId) with their attempt
+        self.pending = set()          # Submission ids recorded locally but not yet read back from session_logs
+        self.states = {}
+        self.last_sync = 0.0
+        self.lock = threading.Lock()
+        self._heap = []
+        self._new_cursor = 0          # Questions before this index of the new-question order were all seen
+
+    def record(self, qid, score, at, difficulty, scope):
+        strength, _, _, attempts, _ = self.states.get(qid, (0, 0.0, None, 0, 0.0))
+        strength = next_strength(strength, score)
+        due_at = at + next_interval(strength, score, difficulty, scope)
+        self.states[qid] = [strength, at, score, attempts + 1, due_at]
+        heapq.heappush(self._heap, (due_at, qid))
+        if len(self._heap) > 2 * len(self.states) + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(state[4], qid) for qid, state in self.states.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_valid(self):
+        while self._heap:
+            due_at, qid = heapq.heappop(self._heap)
+            if self.states[qid][4] == due_at:
+                return due_at, qid
+        return None
+
+    def next_question(self, new_order, now, exclude=()):
+        """
+        The most overdue question, else the next unseen one, else the one due soonest.
+        """
+        skipped = []
+        due = None
+        while True:
+            entry = self._pop_valid()
+            if entry is None or entry[1] not in exclude:
+                due = entry
+                break
+            skipped.append(entry)
+        for entry in skipped + ([due] if due else []):
+            heapq.heappush(self._heap, entry)
+
+        if due is not None and due[0] <= now:
+            return due[1]
+        while self._new_cursor < len(new_order) and new_order[self._new_cursor] in self.states:
+            self._new_cursor += 1
+        for index in range(self._new_cursor, len(new_order)):
+            qid = new_order[index]
+            if qid not in self.states and qid not in exclude:
+                return qid
+        return due[1] if due else None
+
+    def to_snapshot(self):
+        return json.dumps({"watermark": self.watermark, "last_attempt_qid": self.last_attempt_qid,
+                           "pending": sorted(self.pending), "states": self.states}, ensure_ascii=False)
+
+    @classmethod
+    def from_snapshot(cls, student_id, snapshot):
+        schedule = cls(student_id)
+        data = json.loads(snapshot)
+        schedule.watermark = data["watermark"]
+        schedule.last_attempt_qid = data["last_attempt_qid"]
+        schedule.pending = set(data["pending"])
+        schedule.states = data["states"]
+        schedule._rebuild_heap()
+        return schedule
+
+
+class QuestionScheduler:
+    """
+    Hands out the next question per student. `fetch_rows(student_id, after_id, limit)`
+    returns session_logs rows (id, unix time, event_type, details JSON, score) in id order;
+    schedules are kept in an in-process LRU and snapshotted to `state_path`.
+    """
+
+    def __init__(self, fetch_rows, store=None, state_path=DEFAULT_STATE_PATH, cached_students=2000,
+                 min_sync_interval_s=5.0):
+        self.fetch_rows = fetch_rows
+        self.store = store if store is not None else get_knowledge_store()
+        self.cached_students = cached_students
+        self.min_sync_interval_s = min_sync_interval_s
+        self.levels = {}  # Question id -> (difficulty, scope)
+        self.new_order = self._new_question_order()
+
+        self._lock = threading.Lock()
+        self._schedules = OrderedDict()  # student id -> StudentSchedule
+        if os.path.dirname(state_path):
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        self._db = sqlite3.connect(state_path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS schedules (student_id TEXT PRIMARY KEY, snapshot TEXT NOT NULL)")
+        self._metrics = {"selections": 0, "syncs": 0, "rows_applied": 0, "snapshot_loads": 0, "total_sync_ms": 0.0}
+
+    def _new_question_order(self):
+        order = []
+        for difficulty in DIFFICULTIES:
+            for scope in SCOPES:
+                for qid in self.store.ids(difficulty=difficulty, scope=scope):
+                    order.append(qid)
+                    self.levels[qid] = (difficulty, scope)
+        for qid in self.store.ids():  # Unexpected difficulty/scope values last
+            if qid not in self.levels:
+                order.append(qid)
+                self.levels[qid] = (self.store[qid]["difficulty"], self.store[qid]["scope"])
+        return tuple(order)
+
+    # --- Public API ---
+    def next_question(self, student_id, exclude=(), now=None):
+        """
+        Id of the question to show `student_id` next (never one in `exclude` unless nothing else is left).
+        """
+        schedule = self._schedule(student_id)
+        now = time.time() if now is None else now
+        with schedule.lock:
+            self._sync(schedule, now)
+            qid = schedule.next_question(self.new_order, now, set(exclude))
+        self._bump("selections")
+        return qid if qid is not None else next(iter(exclude), None)
+
+    def record(self, student_id, qid, score, submission_id=None, at=None):
+        """
+        Applies a grade immediately; the matching EVALUATION_RESULT row is skipped when it is synced.
+        """
+        if qid not in self.levels:
+            return
+        schedule = self._schedule(student_id)
+        with schedule.lock:
+            schedule.record(qid, score, time.time() if at is None else at, *self.levels[qid])
+            if submission_id:
+                schedule.pending.add(submission_id)
+        # Not snapshotted here: if the process dies first, the EVALUATION_RESULT row is applied on the next sync
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["cached_students"] = len(self._schedules)
+        snapshot["mean_sync_ms"] = round(snapshot["total_sync_ms"] / snapshot["syncs"], 3) if snapshot["syncs"] else 0.0
+        return snapshot
+
+    # --- State ---
+    def _schedule(self, student_id):
+        with self._lock:
+            schedule = self._schedules.get(student_id)
+            if schedule is not None:
+                self._schedules.move_to_end(student_id)
+                return schedule
+        with self._db_lock:
+            row = self._db.execute("SELECT snapshot FROM schedules WHERE student_id = ?", (student_id,)).fetchone()
+        schedule = StudentSchedule.from_snapshot(student_id, row[0]) if row else StudentSchedule(student_id)
+        with self._lock:
+            if row:
+                self._metrics["snapshot_loads"] += 1
+            schedule = self._schedules.setdefault(student_id, schedule)  # Another thread may have won
+            self._schedules.move_to_end(student_id)
+            while len(self._schedules) > self.cached_students:
+                self._schedules.popitem(last=False)
+        return schedule
+
+    def _sync(self, schedule, now):
+        """
+        Applies session_logs rows newer than the watermark (caller holds schedule.lock).
+        """
+        if now - schedule.last_sync < self.min_sync_interval_s:
+            return
+        start = time.perf_counter()
+        watermark = schedule.watermark
+        applied = 0
+        try:
+            while True:
+                rows = self.fetch_rows(schedule.student_id, schedule.watermark, SYNC_PAGE_SIZE)
+                for row in rows:
+                    applied += self._apply_row(schedule, *row)
+                if len(rows) < SYNC_PAGE_SIZE:
+                    break
+        except Exception as e:  # A database outage must not block question selection
+            logger.warning("Could not sync the schedule of %s, using cached state: %s", schedule.student_id, e)
+            return
+        schedule.last_sync = now
+        if schedule.watermark != watermark:
+            self._save(schedule)
+        with self._lock:
+            self._metrics["syncs"] += 1
+            self._metrics["rows_applied"] += applied
+            self._metrics["total_sync_ms"] += (time.perf_counter() - start) * 1000
+
+    def _apply_row(self, schedule, row_id, at, event_type, details, score):
+        schedule.watermark = max(schedule.watermark, row_id)
+        details = json.loads(details) if isinstance(details, (str, bytes)) else (details or {})
+        if event_type == "SUBMISSION_ATTEMPT":
+            schedule.last_attempt_qid = details.get("questionId") or self.store.id_for_question(
+                details.get("questionText", ""))
+            return 0
+        if details.get("submissionId") in schedule.pending:
+            schedule.pending.discard(details["submissionId"])
+            return 0
+        qid = details.get("questionId") or schedule.last_attempt_qid
+        if qid not in self.levels:
+            return 0
+        schedule.record(qid, score, float(at), *self.levels[qid])
+        return 1
+
+    def _save(self, schedule):
+        snapshot = schedule.to_snapshot()
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO schedules (student_id, snapshot) VALUES (?, ?)",
+                             (schedule.student_id, snapshot))
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._metrics[key] += amount
+
+
+def mysql_row_fetcher(db_config, pool_size=2, settle_seconds=SETTLE_SECONDS):
+    """
+    fetch_rows for QuestionScheduler over a small dedicated pool, returning only rows
+    older than `settle_seconds`; times are read in UTC (event_time is written in UTC by
+    event_logger.py).
+    """
+    from mysql.connector import pooling
+
+    pool = pooling.MySQLConnectionPool(pool_name="scheduler_pool", pool_size=pool_size, pool_reset_session=False,
+                                       time_zone="+00:00", **db_config)
+
+    def fetch_rows(student_id, after_id, limit):
+        conn = pool.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(DELTA_QUERY, (student_id, after_id, settle_seconds, limit))
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    return fetch_rows
+
+
+# --- Process-wide scheduler shared by every Streamlit session ---
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_question_scheduler(db_config):
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QuestionScheduler(mysql_row_fetcher(db_config))
+        return _scheduler
+
+
+def set_question_scheduler(scheduler):
+    """
+    Replaces the process-wide scheduler, e.g. with one reading a SQLite stand-in for load tests.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -0,0 +1,159 @@
+# response_cache.py
+# Two-tier cache for Triage / Evaluator Agent responses: an in-process LRU in
+# front of a SQLite file. Keys cover everything that can change the answer, so
+# editing a prompt template or a knowledge_base entry invalidates old entries.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from hebrew_text import normalize_answer
+
+DEFAULT_CACHE_PATH = os.environ.get("PSYTRAINER_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def template_hash(template):
+    return _sha256(template)[:16]
+
+
+def unit_fingerprint(unit):
+    """
+    Hash of the knowledge_base fields the evaluator sees; changes when they are edited.
+    """
+    if unit is None:
+        return ""
+    return _sha256(json.dumps([unit["ideal_answer"], unit["key_concepts"]], ensure_ascii=False))[:16]
+
+
+def make_cache_key(model, template, question_id, answer, unit=None):
+    """
+    Cache key = model + prompt template hash + question id + knowledge-base
+    fingerprint + normalized answer.
+    """
+    parts = [model, template_hash(template), question_id or "", unit_fingerprint(unit), normalize_answer(answer)]
+    return _sha256("\x1f".join(parts))
+
+
+class ResponseCache:
+    """
+    In-process LRU tier backed by SQLite, with TTL and size-based eviction.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_entries=2048, disk_entries=100000, ttl_seconds=30 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "expired": 0, "evicted": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._metrics["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._metrics["misses"] += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._disk_count -= 1
+                self._metrics["expired"] += 1
+                self._metrics["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._remember(key, value, created_at)
+            self._metrics["disk_hits"] += 1
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            # Only a new key adds a row; replacing one must not count it twice
+            cursor = self._db.execute(
+                "UPDATE responses SET value = ?, created_at = ?, last_access = ? WHERE key = ?", (value, now, now, key)
+            )
+            if cursor.rowcount == 0:
+                self._db.execute(
+                    "INSERT INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._disk_count += 1
+            self._metrics["sets"] += 1
+            if self._disk_count > self.disk_entries:
+                self._evict_disk()
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["memory_entries"] = len(self._memory)
+            snapshot["disk_entries"] = self._disk_count
+        lookups = snapshot["memory_hits"] + snapshot["disk_hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = (snapshot["memory_hits"] + snapshot["disk_hits"]) / lookups if lookups else 0.0
+        return snapshot
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        Drops expired rows, then the least recently used ones, down to 90% of capacity.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        self._metrics["expired"] += self._db.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - int(self.disk_entries * 0.9)
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self._metrics["evicted"] += excess
+            count -= excess
+        self._disk_count = count
+
+
+# --- Process-wide singleton shared by every Streamlit session ---
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
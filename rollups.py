@@ -0,0 +1,240 @@
+# rollups.py
+# Incrementally maintained analytics over session_logs. A watermark job reads only the
+# rows added since its last run (by id), aggregates them per (day, topic, difficulty,
+# scope) and folds them into the rollup_daily table with additive upserts, in the same
+# transaction that advances the watermark. Per-topic, per-difficulty and per-day views
+# are small GROUP BYs over that table; the instructor page (pages/instructor_dashboard.py)
+# reads nothing else.
+#
+#   python rollups.py update                 # catch up once
+#   python rollups.py update --loop 60       # keep catching up every 60 seconds
+#   python rollups.py rebuild                # drop the aggregates and recompute from id 0
+#
+# The tables are created by schema.sql.
+
+import argparse
+import logging
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app_config import DEFAULT_SECRETS_PATH, load_secrets
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "rollup_daily"
+BATCH_ROWS = 20000
+# Rows younger than this are left for the next run: auto-increment ids can become
+# visible out of order while concurrent inserts commit, and a skipped id is never read again
+SETTLE_SECONDS = 5
+
+COUNTERS = (
+    "questions_presented", "submissions", "empty_answers",
+    "triage_valid", "triage_no_knowledge", "triage_gibberish", "triage_other",
+    "evaluations", "score_sum", "score_count", "low_scores", "errors",
+)
+
+# Only the classification is pulled out of `details`; the rest of the JSON never leaves the server
+DELTA_QUERY = """
+SELECT id, DATE(COALESCE(event_time, created_at)), session_id, event_type,
+       CASE WHEN event_type = 'TRIAGE_RESULT' THEN JSON_UNQUOTE(JSON_EXTRACT(details, '$.classification')) END,
+       topic, difficulty, scope, score
+FROM session_logs
+WHERE id > %s AND created_at < NOW() - INTERVAL %s SECOND
+ORDER BY id
+LIMIT %s
+"""
+
+# The latest SUBMISSION_ATTEMPT at or before the watermark per session, for rows in a
+# batch that need the context of an earlier batch or run; served by idx_session_logs_session_type_id
+CONTEXT_QUERY = """
+SELECT s.session_id, s.topic, s.difficulty, s.scope
+FROM session_logs s
+JOIN (SELECT session_id, MAX(id) AS id FROM session_logs
+      WHERE event_type = 'SUBMISSION_ATTEMPT' AND id <= %s AND session_id IN ({placeholders})
+      GROUP BY session_id) latest ON s.id = latest.id
+"""
+CONTEXT_LOOKUP_CHUNK = 500
+
+UPSERT_QUERY = (
+    "INSERT INTO rollup_daily (day, topic, difficulty, scope, " + ", ".join(COUNTERS) + ") "
+    "VALUES (%s, %s, %s, %s, " + ", ".join(["%s"] * len(COUNTERS)) + ") "
+    "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = {c} + VALUES({c})" for c in COUNTERS)
+)
+
+
+# --- Aggregation ---
+def aggregate_rows(rows, last_context=None):
+    """
+    Folds session_logs rows (id, day, session_id, event_type, classification, topic,
+    difficulty, scope, score) into {(day, topic, difficulty, scope): {counter: value}}.
+    Events logged without a topic (TRIAGE_RESULT before it carried one) take it from the
+    session's latest SUBMISSION_ATTEMPT; `last_context` holds that per session (update_rollups
+    seeds it from session_logs with load_missing_context).
+    """
+    last_context = {} if last_context is None else last_context
+    buckets = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for _, day, session_id, event_type, classification, topic, difficulty, scope, score in rows:
+        if topic is None:
+            topic, difficulty, scope = last_context.get(session_id, ("", "", ""))
+        counters = buckets[(day, topic or "", difficulty or "", scope or "")]
+
+        if event_type == "QUESTION_PRESENTED":
+            counters["questions_presented"] += 1
+        elif event_type == "SUBMISSION_ATTEMPT":
+            counters["submissions"] += 1
+            last_context[session_id] = (topic, difficulty, scope)
+        elif event_type == "TRIAGE_RESULT":
+            classification = classification or ""
+            if classification == "empty_answer":
+                counters["empty_answers"] += 1
+            elif "valid_attempt" in classification:
+                counters["triage_valid"] += 1
+            elif "no_knowledge" in classification:
+                counters["triage_no_knowledge"] += 1
+            elif "gibberish" in classification:
+                counters["triage_gibberish"] += 1
+            else:
+                counters["triage_other"] += 1
+        elif event_type == "EVALUATION_RESULT":
+            counters["evaluations"] += 1
+            if score is not None:
+                counters["score_sum"] += score
+                counters["score_count"] += 1
+                counters["low_scores"] += score <= 2
+        elif event_type == "ERROR":
+            counters["errors"] += 1
+    return buckets
+
+
+def load_missing_context(cursor, rows, last_id, last_context):
+    """
+    Fills `last_context` for the sessions in `rows` that have a row without a topic but
+    no context yet, from their latest SUBMISSION_ATTEMPT up to `last_id`, so the
+    inheritance does not depend on what this process happened to see before.
+    """
+    missing = sorted({row[2] for row in rows if row[5] is None and row[3] != "SUBMISSION_ATTEMPT"} - last_context.keys())
+    for start in range(0, len(missing), CONTEXT_LOOKUP_CHUNK):
+        chunk = missing[start:start + CONTEXT_LOOKUP_CHUNK]
+        cursor.execute(CONTEXT_QUERY.format(placeholders=", ".join(["%s"] * len(chunk))), (last_id, *chunk))
+        for session_id, topic, difficulty, scope in cursor.fetchall():
+            last_context[session_id] = (topic, difficulty, scope)
+
+
+# --- Watermark job ---
+def update_rollups(conn, batch_rows=BATCH_ROWS, settle_seconds=SETTLE_SECONDS):
+    """
+    Applies every settled session_logs row past the watermark; returns the number of rows read.
+    Each batch commits its upserts together with the new watermark, so a crash never counts a row twice.
+    """
+    cursor = conn.cursor()
+    cursor.execute("INSERT IGNORE INTO rollup_state (name, last_id) VALUES (%s, 0)", (WATERMARK_NAME,))
+    conn.commit()
+    last_context = {}
+    total = 0
+    while True:
+        cursor.execute("SELECT last_id FROM rollup_state WHERE name = %s FOR UPDATE", (WATERMARK_NAME,))
+        (last_id,) = cursor.fetchone()
+        cursor.execute(DELTA_QUERY, (last_id, settle_seconds, batch_rows))
+        rows = cursor.fetchall()
+        if not rows:
+            conn.rollback()
+            break
+        load_missing_context(cursor, rows, last_id, last_context)
+        buckets = aggregate_rows(rows, last_context)
+        cursor.executemany(UPSERT_QUERY, [(*key, *(counters[c] for c in COUNTERS)) for key, counters in buckets.items()])
+        cursor.execute("UPDATE rollup_state SET last_id = %s, rows_processed = rows_processed + %s WHERE name = %s",
+                       (rows[-1][0], len(rows), WATERMARK_NAME))
+        conn.commit()
+        total += len(rows)
+        if len(rows) < batch_rows:
+            break
+    cursor.close()
+    return total
+
+
+def rebuild_rollups(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM rollup_daily")
+    cursor.execute("REPLACE INTO rollup_state (name, last_id, rows_processed) VALUES (%s, 0, 0)", (WATERMARK_NAME,))
+    conn.commit()
+    cursor.close()
+    return update_rollups(conn)
+
+
+# --- Reads (the instructor page) ---
+def _summary(conn, group_by, start, end, extra_where="", params=()):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT {group_by}, " + ", ".join(f"SUM({c}) AS {c}" for c in COUNTERS) + " "
+        f"FROM rollup_daily WHERE day BETWEEN %s AND %s {extra_where} GROUP BY {group_by} ORDER BY {group_by}",
+        (start, end, *params),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    for row in rows:
+        for c in COUNTERS:
+            row[c] = int(row[c] or 0)
+        triaged = row["triage_valid"] + row["triage_no_knowledge"] + row["triage_gibberish"] + row["triage_other"]
+        row["avg_score"] = round(row["score_sum"] / row["score_count"], 2) if row["score_count"] else None
+        row["no_knowledge_rate"] = round(row["triage_no_knowledge"] / triaged, 3) if triaged else None
+    return rows
+
+
+def topic_summary(conn, start, end, difficulty=None):
+    if difficulty:
+        return _summary(conn, "topic", start, end, "AND difficulty = %s", (difficulty,))
+    return _summary(conn, "topic", start, end)
+
+
+def difficulty_summary(conn, start, end):
+    return _summary(conn, "difficulty", start, end)
+
+
+def daily_summary(conn, start, end, topic=None):
+    if topic:
+        return _summary(conn, "day", start, end, "AND topic = %s", (topic,))
+    return _summary(conn, "day", start, end)
+
+
+def rollup_status(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT last_id, rows_processed, updated_at FROM rollup_state WHERE name = %s", (WATERMARK_NAME,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row
+
+
+def default_range(days=30):
+    end = date.today()
+    return end - timedelta(days=days - 1), end
+
+
+def connect(db_config):
+    import mysql.connector
+
+    # Days are UTC, like event_time (event_logger.py)
+    return mysql.connector.connect(time_zone="+00:00", **db_config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the session_logs rollup tables.")
+    parser.add_argument("command", choices=["update", "rebuild"])
+    parser.add_argument("--loop", type=float, help="Keep updating every N seconds")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    conn = connect(load_secrets(args.secrets)["mysql"])
+    try:
+        if args.command == "rebuild":
+            logger.info("rebuilt rollups from %d rows", rebuild_rollups(conn))
+        while True:
+            start = time.perf_counter()
+            count = update_rollups(conn)
+            logger.info("applied %d rows in %.1f s", count, time.perf_counter() - start)
+            if not args.loop:
+                break
+            time.sleep(args.loop)
+    finally:
+        conn.close()
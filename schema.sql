@@ -0,0 +1,61 @@
+-- schema.sql
+-- session_logs table used by the app, plus the migrations needed by newer features.
+
+-- Baseline table (as deployed)
+CREATE TABLE IF NOT EXISTS session_logs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    session_id VARCHAR(36) NOT NULL,
+    event_type VARCHAR(64) NOT NULL,
+    details JSON,
+    topic VARCHAR(255),
+    difficulty VARCHAR(32),
+    scope VARCHAR(32),
+    score INT
+);
+
+-- Local spool and replay (event_spool.py):
+-- every event carries a client-generated id so replays are idempotent (INSERT IGNORE),
+-- and the time it happened, which can be well before the time it was replayed.
+ALTER TABLE session_logs
+    ADD COLUMN event_id CHAR(36) NULL,
+    ADD COLUMN event_time DATETIME(3) NULL,
+    ADD UNIQUE KEY uq_session_logs_event_id (event_id);
+
+-- Question scheduler (question_scheduler.py): reads a student's SUBMISSION_ATTEMPT /
+-- EVALUATION_RESULT rows after its watermark id.
+CREATE INDEX idx_session_logs_session_type_id ON session_logs (session_id, event_type, id);
+
+-- Analytics rollups (rollups.py): one row of additive counters per (UTC day, topic,
+-- difficulty, scope), folded in by a watermark job that remembers the last session_logs id.
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day DATE NOT NULL,
+    topic VARCHAR(255) NOT NULL DEFAULT '',
+    difficulty VARCHAR(32) NOT NULL DEFAULT '',
+    scope VARCHAR(32) NOT NULL DEFAULT '',
+    questions_presented INT NOT NULL DEFAULT 0,
+    submissions INT NOT NULL DEFAULT 0,
+    empty_answers INT NOT NULL DEFAULT 0,
+    triage_valid INT NOT NULL DEFAULT 0,
+    triage_no_knowledge INT NOT NULL DEFAULT 0,
+    triage_gibberish INT NOT NULL DEFAULT 0,
+    triage_other INT NOT NULL DEFAULT 0,
+    evaluations INT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_count INT NOT NULL DEFAULT 0,
+    low_scores INT NOT NULL DEFAULT 0,
+    errors INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, topic, difficulty, scope),
+    KEY idx_rollup_daily_topic_day (topic, day),
+    KEY idx_rollup_daily_difficulty_day (difficulty, day)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    rows_processed BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Archival export (archive_logs.py): oldest-first keyset scan per event type.
+CREATE INDEX idx_session_logs_type_created ON session_logs (event_type, created_at, id);
@@ -0,0 +1,278 @@
+# similarity_index.py
+# Near-duplicate answer cache. For every question we keep sparse character n-gram
+# counts of previously graded answers (a few hundred non-zeros per answer, never a
+# dense matrix); a new answer is scored against all of them with one TF-IDF-weighted
+# sparse product in NumPy, and above a cosine threshold the stored evaluation JSON is reused.
+# Like response_cache.py, grades are only reused for the same model, prompt template
+# and knowledge-base entry, and old rows expire after a TTL or when the table is full.
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from hebrew_text import normalize_answer
+from response_cache import DEFAULT_CACHE_PATH, template_hash
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.9
+DEFAULT_SPOT_CHECK_RATE = 0.05   # Share of near-duplicate hits that are still graded fresh
+NGRAM_SIZES = (3, 4, 5)
+MAX_ANSWERS_PER_QUESTION = 2000  # Ring buffer: the oldest answer is overwritten
+MAX_CACHED_QUESTIONS = 256       # Question indexes kept in memory; the rest reload from SQLite on use
+
+
+def ngram_features(text):
+    """
+    Hashed character n-gram counts of the normalized answer as two arrays: the sorted
+    unique 32-bit n-gram hashes (int64) and their counts (float32).
+    """
+    padded = f" {normalize_answer(text, fold_finals=True)} "
+    hashes = np.fromiter((zlib.crc32(padded[i:i + n].encode("utf-8"))
+                          for n in NGRAM_SIZES for i in range(len(padded) - n + 1)), dtype=np.int64)
+    hashes, counts = np.unique(hashes, return_counts=True)
+    return hashes, counts.astype(np.float32)
+
+
+class _QuestionIndex:
+    """
+    Sparse term counts for one question's answers. Each answer is a row of (columns,
+    counts), columns being ids in this question's own n-gram vocabulary; rows live in
+    a ring of MAX_ANSWERS_PER_QUESTION slots, so adding is O(row) even when full. The
+    flattened arrays cosine scoring needs are rebuilt lazily after a change.
+    """
+
+    def __init__(self):
+        self.vocabulary = {}  # n-gram hash -> column
+        self.doc_freq = np.zeros(1024, dtype=np.float32)
+        self.rows = []
+        self.answers = []
+        self.evaluations = []
+        self.created = []     # When each answer was graded, for the TTL
+        self._next_slot = 0   # Slot the next answer overwrites once the ring is full
+        self._flat = None
+
+    @property
+    def size(self):
+        return len(self.rows)
+
+    def add(self, features, answer, evaluation_json, created_at=0.0):
+        hashes, counts = features
+        vocabulary = self.vocabulary
+        columns = np.fromiter((vocabulary.setdefault(h, len(vocabulary)) for h in hashes.tolist()),
+                              dtype=np.int64, count=len(hashes))
+        if len(vocabulary) > len(self.doc_freq):
+            grown = np.zeros(max(len(vocabulary), 2 * len(self.doc_freq)), dtype=np.float32)
+            grown[:len(self.doc_freq)] = self.doc_freq
+            self.doc_freq = grown
+        if self.size < MAX_ANSWERS_PER_QUESTION:
+            self.rows.append((columns, counts))
+            self.answers.append(answer)
+            self.evaluations.append(evaluation_json)
+            self.created.append(created_at)
+        else:
+            slot = self._next_slot
+            self.doc_freq[self.rows[slot][0]] -= 1  # Forget the oldest answer
+            self.rows[slot] = (columns, counts)
+            self.answers[slot] = answer
+            self.evaluations[slot] = evaluation_json
+            self.created[slot] = created_at
+            self._next_slot = (slot + 1) % MAX_ANSWERS_PER_QUESTION
+        self.doc_freq[columns] += 1  # Columns of one row are unique
+        self._flat = None  # IDF changed; recompute lazily
+
+    def _flattened(self):
+        if self._flat is None:
+            columns = np.concatenate([row[0] for row in self.rows])
+            counts = np.concatenate([row[1] for row in self.rows])
+            row_of = np.repeat(np.arange(self.size), [len(row[0]) for row in self.rows])
+            idf = np.log((self.size + 1) / (self.doc_freq[:len(self.vocabulary)] + 1)) + 1.0
+            idf_sq = (idf * idf).astype(np.float32)
+            row_norms = np.sqrt(np.bincount(row_of, weights=counts * counts * idf_sq[columns], minlength=self.size))
+            self._flat = (columns, counts, row_of, idf_sq, row_norms)
+        return self._flat
+
+    def best_match(self, features):
+        """
+        Returns (row, cosine) of the most similar stored answer, or (None, 0.0).
+        """
+        if not self.size:
+            return None, 0.0
+        columns, counts, row_of, idf_sq, row_norms = self._flattened()
+        hashes, query_counts = features
+        query_columns = np.fromiter((self.vocabulary.get(h, -1) for h in hashes.tolist()),
+                                    dtype=np.int64, count=len(hashes))
+        known = query_columns >= 0
+        # N-grams no stored answer has get the IDF of a document frequency of 0
+        query_idf_sq = np.full(len(hashes), (np.log(self.size + 1) + 1.0) ** 2, dtype=np.float32)
+        query_idf_sq[known] = idf_sq[query_columns[known]]
+        query_norm = float(np.sqrt(np.sum(query_counts * query_counts * query_idf_sq)))
+        if query_norm == 0.0:
+            return None, 0.0
+        weights = np.zeros(len(idf_sq), dtype=np.float32)
+        weights[query_columns[known]] = query_counts[known] * query_idf_sq[known]
+        dots = np.bincount(row_of, weights=counts * weights[columns], minlength=self.size)
+        scores = dots / (row_norms * query_norm + 1e-9)
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+
+class NearDuplicateIndex:
+    """
+    Per-question similarity index over graded answers, persisted to SQLite so it
+    survives restarts. Indexes are keyed by (model, prompt template hash, question_id,
+    knowledge-base fingerprint), so changing the evaluator or editing an entry starts a
+    fresh index for it. Rows older than `ttl_seconds` are never reused, and the table is
+    trimmed back to 90% of `disk_entries` (oldest first) when it outgrows it.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                 spot_check_rate=DEFAULT_SPOT_CHECK_RATE, disk_entries=200000, ttl_seconds=30 * 24 * 3600):
+        self.threshold = threshold
+        self.spot_check_rate = spot_check_rate
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # LRU of MAX_CACHED_QUESTIONS question indexes
+        self._metrics = {"lookups": 0, "hits": 0, "spot_checks": 0, "expired": 0, "evicted": 0,
+                         "drift_samples": 0, "drift_total": 0.0, "drift_max": 0.0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS graded_answers ("
+            " id INTEGER PRIMARY KEY, question_id TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " answer TEXT NOT NULL, evaluation TEXT NOT NULL, model TEXT NOT NULL DEFAULT '',"
+            " template_hash TEXT NOT NULL DEFAULT '', created_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(graded_answers)")}
+        for column, definition in (("model", "TEXT NOT NULL DEFAULT ''"), ("template_hash", "TEXT NOT NULL DEFAULT ''"),
+                                   ("created_at", "REAL NOT NULL DEFAULT 0")):
+            if column not in columns:  # Files from before the key included the evaluator; their rows never match
+                self._db.execute(f"ALTER TABLE graded_answers ADD COLUMN {column} {definition}")
+        self._db.execute("DROP INDEX IF EXISTS idx_graded_answers_question")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_graded_answers_key"
+                         " ON graded_answers (question_id, fingerprint, model, template_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_graded_answers_created ON graded_answers (created_at)")
+        self._disk_count = self._db.execute("SELECT COUNT(*) FROM graded_answers").fetchone()[0]
+
+    def lookup(self, model, template, question_id, fingerprint, answer):
+        """
+        Looks for a graded answer to the same question by the same `model` and prompt `template`.
+        Returns a dict with the stored `evaluation` JSON, `similarity`, `matched_answer`
+        and `spot_check` flag, or None if nothing is similar enough.
+        When `spot_check` is True the caller should grade fresh and call `record_drift`.
+        """
+        features = ngram_features(answer)
+        with self._lock:
+            index = self._get_index(model, template_hash(template), question_id, fingerprint)
+            row, similarity = index.best_match(features)
+            self._metrics["lookups"] += 1
+            if row is None or similarity < self.threshold:
+                return None
+            if time.time() - index.created[row] > self.ttl_seconds:
+                self._metrics["expired"] += 1
+                return None
+            spot_check = random.random() < self.spot_check_rate
+            self._metrics["spot_checks" if spot_check else "hits"] += 1
+            return {
+                "evaluation": index.evaluations[row],
+                "similarity": round(similarity, 4),
+                "matched_answer": index.answers[row],
+                "spot_check": spot_check,
+            }
+
+    def add(self, model, template, question_id, fingerprint, answer, evaluation_json):
+        features = ngram_features(answer)
+        now = time.time()
+        prompt_hash = template_hash(template)
+        with self._lock:
+            self._get_index(model, prompt_hash, question_id, fingerprint).add(features, answer, evaluation_json, now)
+            self._db.execute(
+                "INSERT INTO graded_answers (question_id, fingerprint, model, template_hash, answer, evaluation,"
+                " created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (question_id, fingerprint, model, prompt_hash, answer, evaluation_json, now),
+            )
+            self._disk_count += 1
+            if self._disk_count > self.disk_entries:
+                self._evict_disk()
+
+    def record_drift(self, stored_evaluation_json, fresh_score):
+        """
+        Compares a fresh grade with the one the index would have reused. Returns the drift.
+        """
+        try:
+            stored_score = int(json.loads(stored_evaluation_json).get("score"))
+            drift = abs(int(fresh_score) - stored_score)
+        except (TypeError, ValueError, AttributeError):
+            return None
+        with self._lock:
+            self._metrics["drift_samples"] += 1
+            self._metrics["drift_total"] += drift
+            self._metrics["drift_max"] = max(self._metrics["drift_max"], drift)
+        return drift
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+        snapshot["hit_rate"] = snapshot["hits"] / snapshot["lookups"] if snapshot["lookups"] else 0.0
+        snapshot["mean_drift"] = snapshot["drift_total"] / snapshot["drift_samples"] if snapshot["drift_samples"] else 0.0
+        return snapshot
+
+    def _evict_disk(self):
+        """
+        Drops expired rows, then the oldest ones, down to 90% of capacity.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        self._metrics["expired"] += self._db.execute("DELETE FROM graded_answers WHERE created_at < ?",
+                                                     (cutoff,)).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM graded_answers").fetchone()[0]
+        excess = count - int(self.disk_entries * 0.9)
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM graded_answers WHERE id IN (SELECT id FROM graded_answers ORDER BY id LIMIT ?)",
+                (excess,),
+            )
+            self._metrics["evicted"] += excess
+            count -= excess
+        self._disk_count = count
+
+    def _get_index(self, model, prompt_hash, question_id, fingerprint):
+        key = (model, prompt_hash, question_id, fingerprint)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+        else:
+            index = _QuestionIndex()
+            rows = self._db.execute(
+                "SELECT answer, evaluation, created_at FROM graded_answers WHERE question_id = ? AND fingerprint = ?"
+                " AND model = ? AND template_hash = ? AND created_at >= ? ORDER BY id DESC LIMIT ?",
+                (question_id, fingerprint, model, prompt_hash, time.time() - self.ttl_seconds,
+                 MAX_ANSWERS_PER_QUESTION),
+            ).fetchall()
+            for answer, evaluation_json, created_at in reversed(rows):
+                index.add(ngram_features(answer), answer, evaluation_json, created_at)
+            self._indexes[key] = index
+            while len(self._indexes) > MAX_CACHED_QUESTIONS:
+                self._indexes.popitem(last=False)
+        return index
+
+
+# --- Process-wide singleton shared by every Streamlit session ---
+_near_duplicate_index = None
+_near_duplicate_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index():
+    global _near_duplicate_index
+    with _near_duplicate_index_lock:
+        if _near_duplicate_index is None:
+            _near_duplicate_index = NearDuplicateIndex()
+        return _near_duplicate_index
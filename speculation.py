@@ -0,0 +1,122 @@
+# speculation.py
+# Speculative execution of the Evaluator Agent: the evaluation request is fired
+# together with the triage request, and cancelled if triage says the answer is
+# `no_knowledge` or `gibberish`. Requests run as asyncio tasks on the caller's
+# event loop, so cancelling one really aborts the HTTP request.
+
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeCall:
+    """
+    Handle to one in-flight speculative task.
+    """
+
+    def __init__(self, executor, task):
+        self._executor = executor
+        self._task = task
+        self._settled = False
+
+    async def result(self):
+        """
+        Waits for the task; counts as a speculation that paid off, or as failed if it raised.
+        """
+        outcome = "failed"
+        try:
+            response = await self._task
+            outcome = "paid_off"
+            return response
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self._settle(outcome)
+
+    def cancel(self):
+        """
+        Cancels the task (if still running) and discards its result.
+        """
+        self._task.cancel()
+        self._settle("cancelled")
+
+    def _settle(self, outcome):
+        if not self._settled:
+            self._settled = True
+            self._executor._bump(outcome)
+
+
+class SpeculativeExecutor:
+    """
+    Starts speculative tasks under a global and a per-session concurrency cap.
+    When a cap is reached `submit` returns None and the caller just runs sequentially.
+    Thread-safe, so one executor can be shared by every session and event loop.
+    """
+
+    def __init__(self, max_in_flight=8, max_per_session=1):
+        self.max_in_flight = max_in_flight
+        self.max_per_session = max_per_session
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._per_session = {}
+        self._tasks = set()  # Strong references: the loop only keeps weak ones
+        self._stats = {"launched": 0, "paid_off": 0, "cancelled": 0, "failed": 0, "rejected_by_cap": 0}
+
+    def submit(self, session_id, coroutine_factory):
+        """
+        Starts `coroutine_factory()` as a task on the running loop, or returns None if capped.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_in_flight or self._per_session.get(session_id, 0) >= self.max_per_session:
+                self._stats["rejected_by_cap"] += 1
+                return None
+            self._in_flight += 1
+            self._per_session[session_id] = self._per_session.get(session_id, 0) + 1
+            self._stats["launched"] += 1
+
+        task = asyncio.ensure_future(coroutine_factory())
+        with self._lock:
+            self._tasks.add(task)
+        task.add_done_callback(lambda done: self._release(session_id, done))
+        return SpeculativeCall(self, task)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = self._in_flight
+        settled = snapshot["paid_off"] + snapshot["cancelled"] + snapshot["failed"]
+        snapshot["payoff_rate"] = snapshot["paid_off"] / settled if settled else 0.0
+        return snapshot
+
+    def _release(self, session_id, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Speculative evaluation failed: %r", task.exception())
+        with self._lock:
+            self._tasks.discard(task)
+            self._in_flight -= 1
+            remaining = self._per_session.get(session_id, 1) - 1
+            if remaining > 0:
+                self._per_session[session_id] = remaining
+            else:
+                self._per_session.pop(session_id, None)
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+# --- Process-wide singleton shared by every Streamlit session ---
+_speculative_executor = None
+_speculative_executor_lock = threading.Lock()
+
+
+def get_speculative_executor():
+    global _speculative_executor
+    with _speculative_executor_lock:
+        if _speculative_executor is None:
+            _speculative_executor = SpeculativeExecutor()
+        return _speculative_executor
@@ -1,187 +1,172 @@
 import streamlit as st
-import os
-import litellm
-import random
+import time
+
+_script_start = time.perf_counter()
+
+import re
 import uuid
-import json
-# import mysql.connector
-# import re
-from helper_functions import parse_score_from_feedback, log_event_to_mysql, st_rtl_write
+from helper_functions import log_event_to_mysql, st_rtl_write, EvaluationView
 
-from knowledge_base import knowledge_base
+import app_resources
+from app_resources import question_scheduler, question_view
+from grading_client import grade_remote
 
-try:
-    api_key = st.secrets["GEMINI_API_KEY"]
-    os.environ['GEMINI_API_KEY'] = api_key
-except KeyError:
+# Shared resources (LLM config, database pool, knowledge store, scheduler, engine) are
+# created once per process in app_resources.py; a rerun only looks them up.
+if not app_resources.llm_config():
     st.error("API key for Gemini is missing. Please check your .streamlit/secrets.toml file.")
     st.stop()
 
-litellm.set_verbose = True
+# Optional [tracing] section in secrets.toml (see tracing.py): enabled, persist_with_events, sink_path
+tracer = app_resources.tracer()
+
+# Optional [grading] section in secrets.toml, e.g.:
+#   compact_evaluation_prompt = true      -> send the concept coverage summary instead of the ideal answer
+#   skip_llm_on_extreme_coverage = true   -> grade zero/full concept coverage answers locally
+#   stream_evaluation = false             -> wait for the whole evaluation instead of streaming it
+#   speculative_evaluation = true         -> fire the evaluation together with the Triage Agent call
+#   service_url = "http://grader:8601"    -> grade on grading_server.py instead of in this process
+#   service_token = "..."                 -> shared secret grading_server.py requires (same value on both sides)
+#   evaluation_models = ["gemini/gemini-1.5-flash-latest", "gemini/gemini-1.5-flash-8b"]
+#                                         -> model routes, primary first, with fallback and hedging (also triage_models)
+#   llm_deadline_s = 20                   -> give up on an LLM call (all fallbacks and hedges) after this long
+#   micro_batch_evaluation = true         -> (grading_server.py) one Evaluator call per burst of answers to a question
+grading_settings = app_resources.grading_settings()
 
 # --- PAGE LAYOUT AND STATE MANAGEMENT ---
 st.title("🎓  המורה הפרטי שלך")
 
+# ?student=<uuid> keeps one session_id across visits, so the question scheduler sees the
+# student's whole history; otherwise (or for anything but a UUID) every visit starts fresh.
+# The id is NOT authenticated: whoever has the link reads and extends that history, so
+# hand out random UUIDs, never names or student numbers.
+STUDENT_ID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
 if 'session_id' not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())
+    student_id = (st.query_params.get("student") or "").strip().lower()
+    st.session_state.session_id = student_id if STUDENT_ID_RE.fullmatch(student_id) else str(uuid.uuid4())
 
-if 'current_question_unit' not in st.session_state:
-    current_unit = random.choice(knowledge_base)
-    st.session_state.current_question_unit = current_unit
-else:
-    current_unit = st.session_state.current_question_unit
 
-if 'last_logged_topic' not in st.session_state or st.session_state.last_logged_topic != current_unit['topic']:
+def select_next_question(exclude=()):
+    """
+    Picks the student's next question: the one prefetched while they answered if it is ready,
+    else the spaced-repetition scheduler's (question_scheduler.py) choice. Logs QUESTION_PRESENTED
+    once, here, instead of re-checking on every rerun.
+    """
+    session_id = st.session_state.session_id
+    prefetched_for, prefetch = st.session_state.get("prefetch", (None, None))
+    use_prefetched = (prefetch is not None and prefetched_for in exclude and prefetch.done()
+                      and prefetch.exception() is None)
+    with tracer.trace("question_selection", session_id, None, prefetched=use_prefetched):
+        qid = prefetch.result() if use_prefetched else question_scheduler().next_question(session_id, exclude=exclude)
+    st.session_state.current_question_id = qid
+    unit = question_view(qid)
     log_event_to_mysql(
-        session_id=st.session_state.session_id, 
-        event_type="QUESTION_PRESENTED", 
-        details_dict={"questionText": current_unit['question']},
-        topic=current_unit['topic'],
-        difficulty=current_unit['difficulty'],
-        scope=current_unit['scope']
+        session_id=session_id,
+        event_type="QUESTION_PRESENTED",
+        details_dict={"questionText": unit['question'], "questionId": qid},
+        topic=unit['topic'],
+        difficulty=unit['difficulty'],
+        scope=unit['scope']
     )
-    st.session_state.last_logged_topic = current_unit['topic']
 
-st.header(f"נושא: {current_unit['topic']}")
-st.subheader(f"שאלה לדוגמה (מעמוד {current_unit['page_number']}):")
 
-# Use st.markdown to create an RTL container for the question
-#rtl_question = f'<div style="direction: rtl; text-align: right;">{current_unit["question"]}</div>'
-#st.markdown(rtl_question, unsafe_allow_html=True)
+def prefetch_next_question(current_qid):
+    """
+    While the student answers: prepares the current question for grading, then asks the
+    scheduler for the likely next one and prepares that too, on a background thread.
+    Resources are resolved here, on the script thread, and handed to the worker.
+    """
+    session_id = st.session_state.session_id
+    scheduler = question_scheduler()
+    engine = None if grading_settings.get("service_url") else app_resources.grading_engine(log_event_to_mysql)
+
+    def work():
+        if engine is not None:
+            engine.prepare(current_qid)
+        next_qid = scheduler.next_question(session_id, exclude=(current_qid,))
+        if engine is not None and next_qid is not None:
+            engine.prepare(next_qid)
+        return next_qid
+
+    st.session_state.prefetch = (current_qid, app_resources.prefetch_executor().submit(work))
+
 
+if 'current_question_id' not in st.session_state:
+    select_next_question()
+current_qid = st.session_state.current_question_id
+current_unit = question_view(current_qid)
+if st.session_state.get("prefetch", (None, None))[0] != current_qid:
+    prefetch_next_question(current_qid)
+
+st.header(f"נושא: {current_unit['topic']}")
+st.subheader(f"שאלה לדוגמה (מעמוד {current_unit['page_number']}):")
 st_rtl_write(current_unit['question'])
 st.divider()
-student_answer = st.text_area("הקלידי את תשובתך כאן:", height=150)
 
-# --- THE CORRECTED AGENTIC WORKFLOW ---
-if st.button("הערך את תשובתי"):
-    session_id = st.session_state.session_id
-    try:
-        log_event_to_mysql(
-        session_id=session_id, 
-        event_type="SUBMISSION_ATTEMPT", 
-        details_dict={"questionText": current_unit['question'], "studentAnswer": student_answer},
-        topic=current_unit['topic'],
-        difficulty=current_unit['difficulty'],
-        scope=current_unit['scope']
-    )
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
-    
-    try:
-        if not student_answer.strip():
+
+# --- THE AGENTIC WORKFLOW (runs in grading_engine.py, in-process or on the grading service) ---
+@st.fragment
+def answer_area(qid):
+    """
+    The answer box, the grade button and the evaluation. Runs as a fragment: typing and
+    submitting rerun only this function, not the question above it.
+    """
+    fragment_start = time.perf_counter()
+    # Keyed by question, so the box starts empty for every new question
+    student_answer = st.text_area("הקלידי את תשובתך כאן:", height=150, key=f"answer_{qid}")
+
+    if st.button("הערך את תשובתי"):
+        session_id = st.session_state.session_id
+        evaluation_view = EvaluationView()
+        on_partial = evaluation_view.update if grading_settings.get("stream_evaluation", True) else None
+
+        with st.spinner("המערכת מעריכה את תשובתך..."):
+            try:
+                if grading_settings.get("service_url"):
+                    result = grade_remote(grading_settings["service_url"], qid, student_answer, session_id,
+                                          on_partial=on_partial, token=grading_settings.get("service_token"))
+                else:
+                    engine = app_resources.grading_engine(log_event_to_mysql)
+                    result = app_resources.run_on_event_loop(
+                        lambda forward: engine.grade(qid, student_answer, session_id, on_partial=forward), on_partial)
+            except Exception as e:
+                st.error(f"An error occurred: {e}")
+                return
+
+        if result.error_type == "LLMUnavailableError":
+            # Every model failed or ran past the deadline (model_router.py)
+            evaluation_view.clear()
+            st.warning("המערכת עמוסה כרגע ולא הצליחה להעריך את תשובתך. אנא נסי שוב בעוד רגע.")
+        elif result.error:
+            st.error(f"An error occurred: {result.error}")
+        elif result.classification == "empty_answer":
             st.warning("אנא הקלידי תשובה לפני הלחיצה על הכפתור.")
-            log_event_to_mysql(session_id, "TRIAGE_RESULT", {"classification": "empty_answer"})
-        else:
-            # --- AGENT 1: Triage Agent ---
-            with st.spinner("...קורא את התשובה"):
-                triage_prompt = f"""
-                You are a text classification agent. Classify the student's answer into one of these three categories:
-                - `valid_attempt`: The student is trying to answer the question.
-                - `no_knowledge`: The student states they don't know the answer or are unsure.
-                - `gibberish`: The answer is nonsense or random characters.
-                Student's Answer: "{student_answer}"
-                ---
-                Respond with ONLY ONE WORD: valid_attempt, no_knowledge, or gibberish.
-                """
-                triage_response = litellm.completion(model="gemini/gemini-1.5-flash-latest", messages=[{"role": "user", "content": triage_prompt}])
-                classification = triage_response.choices[0].message.content.strip().lower()
-            
-            log_event_to_mysql(session_id, "TRIAGE_RESULT", {"classification": classification})
-
-            # --- CORRECTED LOGIC: The evaluation is now NESTED inside the 'valid_attempt' block ---
-            if "valid_attempt" in classification:
-                # --- AGENT 2: Evaluator Agent ---
-                with st.spinner("המערכת מעריכה את תשובתך..."):
-                    evaluation_prompt = f"""
-                    You are an assistant that evaluates a student's answer against an ideal answer from a textbook. The interaction must be in HEBREW, Female form (You are a male trainer, and the student is female).
-                    **Sample of an Ideal Answer (in Hebrew) to this question:** {current_unit['ideal_answer']}
-                    **Key Concepts the student should mention (in Hebrew):** {current_unit['key_concepts']}
-                    **Student's Answer (in Hebrew):** {student_answer}
-                    ---
-                    Based ONLY on the information above, perform the following tasks in HEBREW:
-                    1. Provide a score from 1 (completely wrong) to 5 (perfect).
-                    2. Provide a short, one-sentence justification for your score.
-                    3. Provide friendly and constructive feedback to help the student learn.
-
-                    Format your response as a single, valid JSON object with ONLY the following keys:
-                    - "score": An integer from 1 to 5.
-                    - "justification": A string containing the justification.
-                    - "feedback": A string containing the feedback.
-                    """
-                    evaluation_response = litellm.completion(model="gemini/gemini-1.5-flash-latest", messages=[{"role": "user", "content": evaluation_prompt}],response_format={"type": "json_object"})
-                                        
-                    feedback_json_string = evaluation_response.choices[0].message.content
-
-                    # --- THIS IS THE NEW BLOCK ---
-
-
-                    try:
-                        # Parse the JSON string from the LLM into a Python dictionary
-                        evaluation_data = json.loads(feedback_json_string)
-
-                        # Safely get the data. .get() is safer than [] because it won't crash if a key is missing.
-                        numeric_score = evaluation_data.get('score')
-                        justification_text = evaluation_data.get('justification', "לא סופק נימוק.")
-                        feedback_text = evaluation_data.get('feedback', "לא סופק משוב.")
-
-                       # Display the structured feedback
-                        st.markdown("---")
-                        st.markdown('<h3 style="direction: rtl; text-align: right;">הערכה של תשובתך:</h3>', unsafe_allow_html=True)
-
-                        # Construct the final HTML string with bold tags and line breaks
-                        final_feedback_html = f"""
-                        <div style="direction: rtl; text-align: right;">
-                            <b>ציון:</b> {numeric_score}/5<br>
-                            <b>נימוק:</b> {justification_text}<br>
-                            <b>משוב:</b> {feedback_text}
-                        </div>
-                        """
-                        st.markdown(final_feedback_html, unsafe_allow_html=True)
-
-
-                        # Log the event with the clean, numeric score
-                        log_event_to_mysql(
-                            session_id=session_id,
-                            event_type="EVALUATION_RESULT",
-                            details_dict={"rawFeedback": evaluation_data}, # Log the whole structured object
-                            topic=current_unit['topic'],
-                            difficulty=current_unit['difficulty'],
-                            scope=current_unit['scope'],
-                            score=numeric_score # Use the direct numeric score
-                        )
-
-                    except (json.JSONDecodeError, AttributeError):
-                        # This is a fallback in case the LLM fails to return valid JSON
-                        st.error("שגיאה בעיבוד תשובת המערכת. מציג את התשובה הגולמית:")
-                        st_rtl_write(feedback_json_string) # Display the raw text so nothing is lost
-                        log_event_to_mysql(
-                            session_id=session_id, event_type="ERROR",
-                            details_dict={"source": "json_parsing", "rawResponse": feedback_json_string},
-                            topic=current_unit['topic']
-                        )
-                    # --- END OF NEW BLOCK ---
-
-
-
-
-            elif "no_knowledge" in classification:
-                response_text = (
-                    "אין שום בעיה! זו הרגשה טבעית לגמרי בתהליך למידה. "
-                    f"הנושא הזה מופיע בעמוד {current_unit['page_number']}. נסי לקרוא שוב את החלק הרלוונטי ולנסות שוב!"
-                )
-                st.info(response_text)
-                log_event_to_mysql(session_id, "SYSTEM_RESPONSE", {"type": "hint_and_encourage", "text": response_text})
-
-            elif "gibberish" in classification:
-                response_text = "נראה שהתשובה שהוקלדה אינה ברורה. אנא נסי לנסח תשובה מלאה."
-                st.warning(response_text)
-                log_event_to_mysql(session_id, "SYSTEM_RESPONSE", {"type": "request_clearer_answer", "text": response_text})
-            
-            else: # Fallback for unknown classification from Triage Agent
-                st.error("התרחשה שגיאה בניתוח התשובה. אנא נסי שוב.")
-                log_event_to_mysql(session_id, "ERROR", {"source": "triage_logic", "message": "Unknown classification"})
-
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
-        log_event_to_mysql(session_id, "ERROR", {"source": "main_logic_block", "message": str(e)})
+        elif result.evaluation is not None:
+            evaluation_view.update(result.evaluation['score'], result.evaluation['justification'], result.evaluation['feedback'])
+            question_scheduler().record(session_id, qid, result.evaluation['score'], result.submission_id)
+            # The prefetched choice predates this grade (a failed question is now due soon); redo it
+            prefetch_next_question(qid)
+        elif result.raw_response is not None:
+            # This is a fallback in case the LLM fails to return valid JSON
+            evaluation_view.clear()
+            st.error("שגיאה בעיבוד תשובת המערכת. מציג את התשובה הגולמית:")
+            st_rtl_write(result.raw_response) # Display the raw text so nothing is lost
+        elif result.response_type == "hint_and_encourage":
+            st.info(result.response_text)
+        elif result.response_type == "request_clearer_answer":
+            st.warning(result.response_text)
+        else: # Fallback for unknown classification from Triage Agent
+            st.error("התרחשה שגיאה בניתוח התשובה. אנא נסי שוב.")
+    tracer.record("fragment_run", round((time.perf_counter() - fragment_start) * 1000, 3))
+
+
+answer_area(current_qid)
+
+st.divider()
+if st.button("לשאלה הבאה"):
+    select_next_question(exclude=(current_qid,))
+    st.rerun()
+
+# Full-script rerun time (fragment reruns are recorded as fragment_run); see app_timing.py
+tracer.record("script_run", round((time.perf_counter() - _script_start) * 1000, 3))
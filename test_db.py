@@ -2,13 +2,13 @@
 import mysql.connector
 import json
 import uuid
-import toml
+from app_config import load_secrets
 
 print("--- Starting Database Connection Test ---")
 
 try:
     # Load secrets from the .toml file
-    secrets = toml.load(".streamlit/secrets.toml")
+    secrets = load_secrets()
     db_secrets = secrets.get("mysql", {})
     
     if not db_secrets:
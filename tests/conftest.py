@@ -0,0 +1,4 @@
+import os
+
+# Tests never reach the network: have LiteLLM use its bundled model cost map instead of fetching one at import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import app_resources  # noqa: E402
+
+
+def test_every_call_runs_on_the_same_long_lived_loop():
+    async def current_loop(forward):
+        return asyncio.get_running_loop()
+
+    first = app_resources.run_on_event_loop(current_loop)
+    second = app_resources.run_on_event_loop(current_loop)
+    assert first is second and first.is_running()
+
+
+def test_partials_are_replayed_on_the_calling_thread():
+    async def grade(forward):
+        for i in range(3):
+            forward(i, threading.current_thread().name)
+            await asyncio.sleep(0.01)
+        return "done"
+
+    seen = []
+    result = app_resources.run_on_event_loop(grade, lambda i, name: seen.append((i, name, threading.current_thread())))
+    assert result == "done"
+    assert [i for i, _, _ in seen] == [0, 1, 2]
+    assert all(name == "grading-loop" and thread is threading.current_thread() for _, name, thread in seen)
+
+
+def test_returns_as_soon_as_the_coroutine_finishes():
+    async def grade(forward):
+        forward("partial")
+        return "done"
+
+    start = time.perf_counter()
+    for _ in range(10):
+        assert app_resources.run_on_event_loop(grade, lambda *args: None) == "done"
+    # Ten calls, each well under a polling interval
+    assert time.perf_counter() - start < 0.2
+
+
+def test_an_error_reaches_the_caller_after_the_partials():
+    async def grade(forward):
+        forward(1)
+        raise RuntimeError("evaluator down")
+
+    seen = []
+    with pytest.raises(RuntimeError, match="evaluator down"):
+        app_resources.run_on_event_loop(grade, seen.append)
+    assert seen == [1]
@@ -0,0 +1,173 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive_logs
+from archive_logs import ArchiveError, archive_event_type, load_policy, run
+
+NOW = datetime(2026, 6, 1)
+
+
+def _row(id_, created_at, event_type="TRACE", session="s1"):
+    return (id_, created_at, f"e{id_}", created_at, session, event_type, json.dumps({"n": id_}), None, None, None, None)
+
+
+class _FakeDB:
+    """
+    Just enough of MySQL for archive_logs: session_logs rows and the rollup watermark.
+    Records every query, so the tests can check the paging and the order of the deletes.
+    """
+
+    def __init__(self, rows, watermark=None):
+        self.rows = {row[0]: row for row in rows}
+        self.watermark = watermark
+        self.log = []
+        self.commits = 0
+
+    def cursor(self, buffered=True):
+        return _FakeCursor(self, buffered)
+
+    def commit(self):
+        self.commits += 1
+
+
+class _FakeCursor:
+    def __init__(self, db, buffered):
+        self.db = db
+        self.buffered = buffered
+        self.result = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, params=()):
+        if query == archive_logs.PAGE_QUERY:
+            assert not self.buffered, "pages must be streamed"
+            event_type, cutoff, max_id, last_created, _, last_id, limit = params
+            matching = sorted((row for row in self.db.rows.values()
+                               if row[5] == event_type and row[1] < cutoff and row[0] <= max_id
+                               and (row[1], row[0]) > (last_created, last_id)), key=lambda row: (row[1], row[0]))
+            self.result = matching[:limit]
+            self.db.log.append(("page", [row[0] for row in self.result]))
+        elif query.startswith("SELECT last_id FROM rollup_state"):
+            self.result = [] if self.db.watermark is None else [(self.db.watermark,)]
+        elif query.startswith("SELECT COALESCE(MAX(id), 0)"):
+            self.result = [(max(self.db.rows, default=0),)]
+        elif query.startswith("SELECT DISTINCT event_type"):
+            self.result = sorted({(row[5],) for row in self.db.rows.values()})
+        elif query.startswith("DELETE FROM session_logs WHERE id IN"):
+            self.rowcount = sum(self.db.rows.pop(id_, None) is not None for id_ in params)
+            self.db.log.append(("delete", list(params)))
+        else:
+            raise AssertionError(f"unexpected query: {query}")
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def _archived_ids(archive_dir):
+    ids = []
+    with open(os.path.join(archive_dir, "manifest.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            with gzip.open(os.path.join(archive_dir, json.loads(line)["path"]), "rt", encoding="utf-8") as part:
+                ids += [json.loads(record)["id"] for record in part]
+    return ids
+
+
+def test_keyset_paging_reads_every_row_once_across_equal_timestamps(tmp_path):
+    # Several rows share a created_at across page boundaries; two days, ids not in time order
+    day1, day2 = datetime(2026, 1, 1, 12), datetime(2026, 1, 2, 8)
+    rows = [_row(1, day1), _row(2, day1), _row(7, day1), _row(3, day1 + timedelta(hours=1)),
+            _row(4, day2), _row(5, day2), _row(6, day2), _row(8, NOW)]
+    db = _FakeDB(rows)
+    archived, deleted = archive_event_type(db, "TRACE", NOW, str(tmp_path), max_id=100, page_rows=2,
+                                           delete_batch=2)
+    assert (archived, deleted) == (7, 7)
+    pages = [ids for kind, ids in db.log if kind == "page"]
+    assert pages == [[1, 2], [7, 3], [4, 5], [6]]
+    assert sorted(_archived_ids(str(tmp_path))) == [1, 2, 3, 4, 5, 6, 7]
+    assert list(db.rows) == [8]
+
+
+def test_a_day_is_deleted_only_after_its_file_is_verified(tmp_path, monkeypatch):
+    day1, day2 = datetime(2026, 1, 1), datetime(2026, 1, 2)
+    db = _FakeDB([_row(1, day1), _row(2, day1), _row(3, day2)])
+    manifest = tmp_path / "manifest.jsonl"
+
+    original_delete = archive_logs.delete_ids
+
+    def checked_delete(conn, ids, *args):
+        # Every id being deleted is already in a finished, listed file
+        assert set(ids) <= set(_archived_ids(str(tmp_path)))
+        return original_delete(conn, ids, *args, pause_s=0)
+
+    monkeypatch.setattr(archive_logs, "delete_ids", checked_delete)
+    archive_event_type(db, "TRACE", NOW, str(tmp_path), max_id=100)
+    assert [ids for kind, ids in db.log if kind == "delete"] == [[1, 2], [3]]
+    assert len(manifest.read_text().splitlines()) == 2
+
+
+def test_a_file_that_does_not_read_back_stops_before_any_delete(tmp_path, monkeypatch):
+    db = _FakeDB([_row(1, datetime(2026, 1, 1)), _row(2, datetime(2026, 1, 1))])
+    original_close = archive_logs.DayPartitionWriter.close
+
+    def truncating_close(writer):
+        if writer._file is not None:
+            writer._file.close()
+            with gzip.open(writer._path, "wt", encoding="utf-8") as f:
+                f.write(json.dumps({"id": 1}) + "\n")
+            writer._file = gzip.open(writer._path, "at", encoding="utf-8")
+        return original_close(writer)
+
+    monkeypatch.setattr(archive_logs.DayPartitionWriter, "close", truncating_close)
+    with pytest.raises(ArchiveError, match="read back 1 rows, wrote 2"):
+        archive_event_type(db, "TRACE", NOW, str(tmp_path), max_id=100)
+    assert sorted(db.rows) == [1, 2]
+    assert not any(kind == "delete" for kind, _ in db.log)
+    assert not (tmp_path / "manifest.jsonl").exists()
+
+
+def test_rows_past_the_rollup_watermark_are_kept(tmp_path):
+    old = NOW - timedelta(days=400)
+    db = _FakeDB([_row(id_, old) for id_ in range(1, 6)], watermark=3)
+    policy = load_policy({"retention": {"archive_dir": str(tmp_path), "default_days": 365}})
+    totals = run(db, policy)
+    assert totals["TRACE"]["deleted"] == 3 and totals["TRACE"]["max_id"] == 3
+    assert sorted(db.rows) == [4, 5]
+
+
+def test_without_a_rollup_watermark_nothing_is_deleted_unless_rollups_are_ignored(tmp_path):
+    old = NOW - timedelta(days=400)
+    policy = load_policy({"retention": {"archive_dir": str(tmp_path), "default_days": 365}})
+    db = _FakeDB([_row(1, old), _row(2, old)])
+    assert run(db, policy)["TRACE"]["deleted"] == 0
+    assert run(db, policy, ignore_rollups=True)["TRACE"]["deleted"] == 2
+    assert not db.rows
+
+
+def test_dry_run_writes_nothing_into_the_archive_and_deletes_nothing(tmp_path):
+    old = NOW - timedelta(days=400)
+    db = _FakeDB([_row(1, old, "TRACE"), _row(2, old, "EVALUATION_RESULT")], watermark=10)
+    archive_dir = tmp_path / "archive"
+    policy = load_policy({"retention": {"archive_dir": str(archive_dir), "default_days": 365,
+                                        "event_types": {"TRACE": 14}}})
+    totals = run(db, policy, dry_run=True)
+    assert totals["TRACE"]["archived"] == 1 and totals["EVALUATION_RESULT"]["archived"] == 1
+    assert all(counts["deleted"] == 0 for counts in totals.values())
+    assert sorted(db.rows) == [1, 2] and not archive_dir.exists()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("litellm")
+
+from batch_grade import ResumeWatermark, load_done_ids, run_batch, summarize  # noqa: E402
+from grading_engine import GradingResult  # noqa: E402
+
+
+def test_watermark_waits_for_the_lowest_row_in_flight(tmp_path):
+    watermark = ResumeWatermark(str(tmp_path / "out.jsonl"))
+    rows = [{"resume_id": i} for i in (10, 20, 30)]
+    for row in rows:
+        watermark.dispatched(row)
+    watermark.finished(rows[1])
+    watermark.finished(rows[2])
+    assert watermark.load() == 0
+    watermark.finished(rows[0])
+    assert watermark.load() == 30
+
+
+class _Engine:
+    questions = {"q1"}
+
+    def __init__(self):
+        self.graded = []
+
+    async def grade(self, qid, answer, session_id):
+        # Later rows finish first
+        await asyncio.sleep(0.01 * (5 - int(answer)))
+        self.graded.append(answer)
+        return GradingResult(submission_id=answer, classification="valid_attempt", evaluation={"score": 3})
+
+
+async def _source(ids):
+    for i in ids:
+        yield {"id": f"log-{i}", "resume_id": i, "question_id": "q1", "answer": str(i)}
+
+
+def test_run_batch_reads_an_async_source_and_resumes(tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    engine = _Engine()
+    counts = asyncio.run(run_batch(_source([1, 2, 3]), engine, output, concurrency=3, rate=1000, max_retries=0))
+    assert counts["graded"] == 3
+    assert ResumeWatermark(output).load() == 3
+
+    # A re-run over an overlapping range skips what the output already has
+    counts = asyncio.run(run_batch(_source([3, 4]), engine, output, concurrency=2, rate=1000, max_retries=0))
+    assert (counts["graded"], counts["skipped"]) == (1, 1)
+    assert ResumeWatermark(output).load() == 4
+    with open(output, encoding="utf-8") as f:
+        assert sorted(json.loads(line)["id"] for line in f) == ["log-1", "log-2", "log-3", "log-4"]
+
+
+def test_a_torn_last_line_is_skipped_and_removed_before_resuming(tmp_path, capsys):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"id": "log-1", "score": 3}\n{"id": "log-2", "score": 3}\n{"id": "log-3", "sco',
+                      encoding="utf-8")
+    assert load_done_ids(str(output)) == {"log-1", "log-2"}
+    assert summarize(str(output))["items"] == 2
+    assert "incomplete last line" in capsys.readouterr().err
+
+    counts = asyncio.run(run_batch(_source([1, 2, 3]), _Engine(), str(output), concurrency=1, rate=1000,
+                                   max_retries=0))
+    assert (counts["graded"], counts["skipped"]) == (1, 2)
+    with open(output, encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == ["log-1", "log-2", "log-3"]
+
+
+def test_a_bad_line_before_the_end_is_an_error(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"id": "log-1"}\n{"id": \n{"id": "log-3"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_done_ids(str(output))
+
+
+def test_reused_grades_are_left_out_of_the_comparison(tmp_path):
+    output = tmp_path / "out.jsonl"
+    rows = [{"id": "1", "original_score": 2, "score": 4, "evaluation_source": "llm"},
+            {"id": "2", "original_score": 2, "score": 2, "evaluation_source": "cache"},
+            {"id": "3", "original_score": 3, "score": 3, "evaluation_source": "near_duplicate"}]
+    output.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    summary = summarize(str(output))
+    assert (summary["compared"], summary["reused_grades"]) == (1, 2)
+    assert summary["mean_score_change"] == 2
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from collections import defaultdict
+
+import pytest
+
+from benchmark import (BENCHMARK_SETTINGS, CANNED_EVALUATION, FakeLiteLLM, SqliteSessionLogs, build_workload, run_level,
+                       summarize_samples)
+from grading_engine import GradingEngine
+from knowledge_store import get_knowledge_store
+from prompts import build_batch_evaluation_prompt, build_evaluation_prompt, build_triage_prompt
+
+
+def _unit():
+    store = get_knowledge_store()
+    return store[store.ids()[0]]
+
+
+def _message(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def test_summarize_samples_percentiles():
+    stats = summarize_samples(list(range(100, 0, -1)))
+    assert stats == {"count": 100, "mean": 50.5, "p50": 51, "p95": 96, "p99": 100}
+    assert summarize_samples([7.0])["p99"] == 7.0
+
+
+def test_fake_llm_answers_by_prompt_kind_and_counts_tokens():
+    fake = FakeLiteLLM(triage_ms=0, evaluation_ms=0, jitter=0, triage_label="gibberish")
+
+    async def calls():
+        triage = await fake("m", _message(build_triage_prompt("תשובה")))
+        evaluation = await fake("m", _message(build_evaluation_prompt(_unit(), "תשובה")))
+        batch = await fake("m", _message(build_batch_evaluation_prompt(_unit(), ["א", "ב", "ג"])))
+        return triage, evaluation, batch
+
+    triage, evaluation, batch = asyncio.run(calls())
+    assert triage.choices[0].message.content == "gibberish"
+    assert json.loads(evaluation.choices[0].message.content) == CANNED_EVALUATION
+    entries = json.loads(batch.choices[0].message.content)["evaluations"]
+    assert [entry["index"] for entry in entries] == [1, 2, 3]
+    assert dict(fake.calls) == {"triage": 1, "evaluation": 1, "batch_evaluation": 1}
+    assert evaluation.usage.prompt_tokens == len(build_evaluation_prompt(_unit(), "תשובה")) // 4
+    assert fake.prompt_tokens["evaluation"] == evaluation.usage.prompt_tokens
+
+
+def test_fake_llm_streams_the_same_content_with_usage_last():
+    fake = FakeLiteLLM(evaluation_ms=0, jitter=0, chunk_chars=5)
+
+    async def stream():
+        chunks = []
+        async for chunk in await fake("m", _message(build_evaluation_prompt(_unit(), "תשובה")), stream=True):
+            chunks.append(chunk)
+        return chunks
+
+    chunks = asyncio.run(stream())
+    content = "".join(chunk.choices[0].delta.content for chunk in chunks[:-1])
+    assert json.loads(content) == CANNED_EVALUATION
+    assert all(len(chunk.choices[0].delta.content) <= 5 for chunk in chunks[:-1])
+    assert chunks[-1].choices == [] and chunks[-1].usage.completion_tokens == len(content) // 4
+
+
+def test_sqlite_session_logs(tmp_path):
+    logs = SqliteSessionLogs(str(tmp_path / "session_logs.sqlite3"))
+    logs.log("s1", "EVALUATION_RESULT", {"score": 4, "הערה": "טוב"}, topic="t", score=4)
+    logs.log("s1", "TRACE", {})
+    assert logs.count() == 2
+    details, score = logs.conn.execute(
+        "SELECT details, score FROM session_logs WHERE event_type = 'EVALUATION_RESULT'").fetchone()
+    assert json.loads(details) == {"score": 4, "הערה": "טוב"} and score == 4
+
+
+def test_build_workload_is_deterministic_and_uses_known_questions():
+    workload = build_workload(50, seed=1)
+    assert workload == build_workload(50, seed=1) and workload != build_workload(50, seed=2)
+    assert {qid for qid, _ in workload} <= set(get_knowledge_store().ids())
+
+
+@pytest.mark.parametrize("settings", [{}, {"micro_batch_evaluation": True}])
+def test_run_level_reports_every_stage(tmp_path, settings):
+    fake = FakeLiteLLM(triage_ms=1, evaluation_ms=2, jitter=0)
+    logs = SqliteSessionLogs(str(tmp_path / "session_logs.sqlite3"))
+    log_samples = defaultdict(list)
+
+    def log_event(session_id, event_type, details_dict, **kwargs):
+        logs.log(session_id, event_type, details_dict, **kwargs)
+        log_samples[event_type].append(0.1)
+
+    engine = GradingEngine(log_event, {**BENCHMARK_SETTINGS, **settings}, acompletion=fake)
+    level = asyncio.run(run_level(engine, build_workload(12, seed=0), 4, log_samples))
+    assert level["concurrency"] == 4 and level["submissions"] == 12 and level["errors"] == 0
+    assert level["throughput_per_s"] > 0
+    assert {"total", "triage", "log.SUBMISSION_ATTEMPT"} <= set(level["stages_ms"])
+    assert level["stages_ms"]["total"]["count"] == 12
+    assert logs.count() > 12
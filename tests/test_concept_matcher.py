@@ -0,0 +1,49 @@
+import pytest
+
+from concept_matcher import AhoCorasick, ConceptMatcher, coverage_shortcut
+
+UNIT = {"key_concepts": ["עיבוד דואלי", "חשיבה אוטומטית", "ציות"], "page_number": 12,
+        "ideal_answer": "עיבוד דואלי הוא שילוב של חשיבה אוטומטית ומהירה עם חשיבה מבוקרת ומודעת, כמו בציות לנורמות"}
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    found = sorted(AhoCorasick(["he", "she", "his", "hers"]).find("ushers"))
+    assert found == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+@pytest.mark.parametrize("answer", [
+    "עיבוד דואלי",
+    "עִיבּוּד דוּאָלִי",            # Niqqud
+    "והעיבוד הדואלי",             # Prefix letters
+    "דואלי, כלומר עיבוד",          # Any order
+])
+def test_concept_variants_are_covered(answer):
+    assert "עיבוד דואלי" in ConceptMatcher(UNIT["key_concepts"]).match(answer).covered
+
+
+@pytest.mark.parametrize("answer", [
+    "עיבוד בלבד",                 # Only one of the concept's words
+    "קעיבוד דואלי",                # A non-prefix letter before the word
+    "ושכשהעיבוד דואלי",             # Too many prefix letters
+])
+def test_near_misses_are_not_covered(answer):
+    assert "עיבוד דואלי" not in ConceptMatcher(UNIT["key_concepts"]).match(answer).covered
+
+
+def test_final_letter_forms_are_folded():
+    matcher = ConceptMatcher(["מושגים מרכזיים"])
+    assert matcher.match("המושגימ המרכזיימ").covered == ["מושגים מרכזיים"]
+
+
+def test_coverage_ratio_and_shortcuts():
+    matcher = ConceptMatcher(UNIT["key_concepts"])
+    none = matcher.match("לא זוכרת")
+    assert none.ratio == 0.0 and coverage_shortcut(UNIT, "לא זוכרת", none)["score"] == 1
+
+    full_answer = "עיבוד דואלי משלב חשיבה אוטומטית וחשיבה מבוקרת, למשל בציות לנורמות של הקבוצה"
+    full = matcher.match(full_answer)
+    assert full.ratio == 1.0 and coverage_shortcut(UNIT, full_answer, full)["score"] == 5
+
+    partial = matcher.match("עיבוד דואלי זה כשיש שני סוגים של חשיבה במוח שלנו שעובדים ביחד")
+    assert partial.covered == ["עיבוד דואלי"]
+    assert coverage_shortcut(UNIT, "עיבוד דואלי זה כשיש שני סוגים של חשיבה במוח שלנו שעובדים ביחד", partial) is None
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from evaluation_schema import (ParseStats, coerce_score, extract_balanced_object, parse_evaluation,
+                               parse_score_from_feedback)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (4, 4), (4.4, 4), (2.5, 3), (3.5, 4), (4.5, 5), ("4", 4), ("4/5", 4), ("8/10", 4), ("4 מתוך 5", 4),
+    ("ציון: 4", 4), ("1-5: 4", 4), ("score: 2.5", 3), ("ציון: 4/5", 4),
+])
+def test_coerce_score(value, expected):
+    assert coerce_score(value) == expected
+
+
+@pytest.mark.parametrize("value", [True, None, [], "", "טוב", "3 או 4", "1-5", "9", 0, 6, "0/5"])
+def test_coerce_score_rejects_missing_ambiguous_and_out_of_range(value):
+    assert coerce_score(value) is None
+
+
+def test_clean_response_needs_no_repairs():
+    evaluation, repairs = parse_evaluation(json.dumps({"score": 4, "justification": "j", "feedback": "f"}))
+    assert evaluation == {"score": 4, "justification": "j", "feedback": "f"} and repairs == []
+
+
+def test_fenced_response_with_text_around_and_a_string_score():
+    text = 'הנה:\n```json\n{"score": "4/5", "justification": "נימוק {עם סוגריים}", "feedback": 7}\n```'
+    evaluation, repairs = parse_evaluation(text)
+    assert evaluation["score"] == 4
+    assert evaluation["justification"] == "נימוק {עם סוגריים}" and evaluation["feedback"] == "7"
+    assert "coerce_score" in repairs and "coerce_feedback" in repairs
+
+
+def test_missing_fields_get_defaults_but_a_missing_score_fails():
+    evaluation, repairs = parse_evaluation('{"score": 2}')
+    assert evaluation["score"] == 2 and {"default_justification", "default_feedback"} <= set(repairs)
+    assert parse_evaluation('{"justification": "j"}')[0] is None
+    assert parse_evaluation('{"score": 7}')[0] is None
+    assert parse_evaluation("not json at all")[0] is None
+
+
+def test_legacy_markdown_format():
+    evaluation, repairs = parse_evaluation("**ציון:** 3/5\nמשוב")
+    assert evaluation["score"] == 3 and repairs == ["legacy_markdown"]
+    assert parse_score_from_feedback("אין ציון") is None
+
+
+def test_extract_balanced_object_ignores_braces_in_strings():
+    assert extract_balanced_object('x {"a": "}"} y') == '{"a": "}"}'
+    assert extract_balanced_object("{ unbalanced") is None
+
+
+def test_parse_stats_rates():
+    stats = ParseStats()
+    stats.record([])
+    stats.record(["strip_fences"])
+    stats.record([], retried=True)
+    stats.record([], retried=True, ok=False)
+    snapshot = stats.snapshot()
+    assert (snapshot["clean"], snapshot["repaired"], snapshot["retry_recovered"], snapshot["failed"]) == (1, 1, 1, 1)
+    assert snapshot["repair_rate"] == 0.25 and snapshot["retry_rate"] == 0.5
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+from event_logger import EventLogger  # noqa: E402
+from event_spool import EventSpool  # noqa: E402
+
+
+class _FullDiskSpool(EventSpool):
+    def append(self, events):
+        raise OSError(28, "No space left on device")
+
+
+def test_writer_thread_survives_spool_errors(tmp_path):
+    # Nothing listens on port 1, so shipping fails fast as well
+    logger = EventLogger({"host": "127.0.0.1", "port": 1, "user": "x", "password": "x", "database": "x"},
+                         batch_size=1, flush_interval=0.01, spool=_FullDiskSpool(str(tmp_path), "t"))
+    for i in range(3):
+        logger.log("s", "TEST", {"i": i})
+    logger.close()
+    stats = logger.stats()
+    assert stats["dropped"] == 3
+    assert stats["queue_depth"] == 0
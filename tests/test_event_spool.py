@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+from event_spool import EventSpool, orphaned_spools, replay_spool
+
+
+def _events(n, start=0):
+    return [{"event_id": f"e{i}", "session_id": "s", "event_type": "T", "details": "{}"} for i in range(start, start + n)]
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, query, rows):
+        self.rows.extend(rows)
+
+
+class _Conn:
+    def __init__(self):
+        self.rows = []
+
+    def cursor(self):
+        return _Cursor(self.rows)
+
+    def commit(self):
+        pass
+
+
+def test_default_name_is_per_process(tmp_path):
+    spool = EventSpool(str(tmp_path))
+    assert spool.name == f"session_logs-{os.getpid()}"
+    spool.close()
+
+
+def test_read_pending_and_ack_offsets(tmp_path):
+    spool = EventSpool(str(tmp_path), "t")
+    spool.append(_events(5))
+    events, offset = spool.read_pending(limit=3)
+    assert [e["event_id"] for e in events] == ["e0", "e1", "e2"]
+    spool.ack(offset)
+    assert spool.pending_bytes() > 0
+    events, offset = spool.read_pending()
+    assert [e["event_id"] for e in events] == ["e3", "e4"]
+    spool.ack(offset)
+    assert spool.pending_bytes() == 0
+    spool.close()
+
+    # The acknowledged offset survives a restart
+    spool = EventSpool(str(tmp_path), "t")
+    assert spool.read_pending() == ([], os.path.getsize(spool.path))
+    spool.close()
+
+
+def test_torn_and_corrupt_lines(tmp_path):
+    spool = EventSpool(str(tmp_path), "t")
+    spool.append(_events(1))
+    with open(spool.path, "ab") as f:
+        f.write(b"not json\n" + json.dumps({"event_id": "torn"}).encode()[:-3])
+    events, offset = spool.read_pending()
+    assert [e["event_id"] for e in events] == ["e0"]
+    assert offset < os.path.getsize(spool.path)  # The torn line is left for later
+    spool.close()
+
+
+def test_compaction_only_after_everything_is_acked(tmp_path):
+    spool = EventSpool(str(tmp_path), "t", compact_bytes=1)
+    spool.append(_events(4))
+    events, offset = spool.read_pending(limit=2)
+    spool.ack(offset)
+    assert os.path.getsize(spool.path) > 0
+    spool.append(_events(2, start=4))
+    events, offset = spool.read_pending()
+    assert [e["event_id"] for e in events] == ["e2", "e3", "e4", "e5"]
+    spool.ack(offset)
+    assert os.path.getsize(spool.path) == 0 and spool.pending_bytes() == 0
+    spool.append(_events(1, start=6))
+    assert [e["event_id"] for e in spool.read_pending()[0]] == ["e6"]
+    spool.close()
+
+
+def test_orphaned_spools_skip_live_ones_and_are_removed_once_shipped(tmp_path):
+    pytest.importorskip("fcntl")
+    live = EventSpool(str(tmp_path), "session_logs-1")
+    live.append(_events(1))
+    stopped = EventSpool(str(tmp_path), "session_logs-2")
+    stopped.append(_events(3))
+    stopped.close()
+
+    conn = _Conn()
+    names = []
+    for spool in orphaned_spools(str(tmp_path)):
+        names.append(spool.name)
+        assert replay_spool(spool, conn) == 3
+        spool.close(remove_if_shipped=True)
+    assert names == ["session_logs-2"]
+    assert len(conn.rows) == 3
+    assert not os.path.exists(os.path.join(tmp_path, "session_logs-2.jsonl"))
+    assert os.path.exists(live.path)
+    live.close()
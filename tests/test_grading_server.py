@@ -0,0 +1,96 @@
+import asyncio
+import urllib.error
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("litellm")
+
+from aiohttp import web  # noqa: E402
+
+import response_cache  # noqa: E402
+import similarity_index  # noqa: E402
+from benchmark import BENCHMARK_SETTINGS, CANNED_EVALUATION, FakeLiteLLM  # noqa: E402
+from grading_client import grade_remote  # noqa: E402
+from grading_engine import GradingEngine  # noqa: E402
+from grading_server import create_app, make_app  # noqa: E402
+from knowledge_store import get_knowledge_store  # noqa: E402
+
+TOKEN = "s3cret"
+ANSWER = "חיזוק הוא כל תוצאה שמגבירה את הסבירות שההתנהגות תחזור על עצמה בעתיד."
+
+
+class _EventLogger:
+    def __init__(self):
+        self.events = []
+
+    def log(self, session_id, event_type, details, **columns):
+        self.events.append((session_id, event_type))
+
+    def stats(self):
+        return {"queued": len(self.events)}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # Keep the engine's process-wide caches out of .cache
+    monkeypatch.setattr(response_cache, "_response_cache", response_cache.ResponseCache(str(tmp_path / "c.sqlite3")))
+    monkeypatch.setattr(similarity_index, "_near_duplicate_index",
+                        similarity_index.NearDuplicateIndex(str(tmp_path / "c.sqlite3")))
+    return GradingEngine(_EventLogger().log, dict(BENCHMARK_SETTINGS),
+                         acompletion=FakeLiteLLM(triage_ms=0, evaluation_ms=0, jitter=0))
+
+
+def _serve_and_call(app, call):
+    """
+    Serves `app` on a free localhost port and runs the blocking `call(url)` on a worker thread.
+    """
+    async def main():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.to_thread(call, f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_grade_round_trip_through_the_client(engine):
+    qid = get_knowledge_store().ids()[0]
+    app = create_app(engine, _EventLogger(), TOKEN)
+    result = _serve_and_call(app, lambda url: grade_remote(url, qid, ANSWER, "s1", token=TOKEN))
+    assert result.error is None
+    assert result.evaluation["score"] == CANNED_EVALUATION["score"]
+
+
+def test_streamed_round_trip_forwards_partials(engine):
+    qid = get_knowledge_store().ids()[0]
+    partials = []
+    app = create_app(engine, _EventLogger(), TOKEN)
+    result = _serve_and_call(app, lambda url: grade_remote(url, qid, ANSWER, "s1", token=TOKEN,
+                                                           on_partial=lambda *args: partials.append(args)))
+    assert result.evaluation["score"] == CANNED_EVALUATION["score"]
+    assert partials and partials[-1][0] == CANNED_EVALUATION["score"]
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_requests_without_the_shared_secret_are_refused(engine, token):
+    qid = get_knowledge_store().ids()[0]
+    app = create_app(engine, _EventLogger(), TOKEN)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _serve_and_call(app, lambda url: grade_remote(url, qid, ANSWER, "s1", token=token))
+    assert error.value.code == 401
+
+
+def test_server_refuses_to_start_without_a_secret():
+    with pytest.raises(ValueError):
+        make_app({"GEMINI_API_KEY": "x", "mysql": {}, "grading": {}})
+    with pytest.raises(ValueError):
+        create_app(object(), _EventLogger(), "")
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from incremental_json import IncrementalJsonObjectParser
+
+EVALUATION = {"score": 4, "justification": "נימוק עם \"מרכאות\" ו\\ לוכסן\nושורה", "feedback": "כל הכבוד! א 😀"}
+
+
+def _feed_in_chunks(text, size):
+    parser = IncrementalJsonObjectParser()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser
+
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_any_chunking_gives_the_parsed_object(ensure_ascii, size):
+    text = json.dumps(EVALUATION, ensure_ascii=ensure_ascii)
+    parser = _feed_in_chunks(text, size)
+    assert parser.done
+    assert parser.values == EVALUATION
+    assert parser.complete == set(EVALUATION)
+
+
+def test_score_is_complete_before_the_text_fields():
+    parser = IncrementalJsonObjectParser()
+    parser.feed('```json\n{"score": 3, "justification": "חלק')
+    assert parser.values == {"score": 3, "justification": "חלק"}
+    assert parser.complete == {"score"}
+    changed = parser.feed('י", "feedback"')
+    assert changed == {"justification"} and "justification" in parser.complete
+
+
+def test_scalars_and_nested_values():
+    parser = _feed_in_chunks('{"a": true, "b": null, "c": 2.5, "d": [1, {"e": "}"}], "f": "x"}', 2)
+    assert parser.values["a"] is True and parser.values["b"] is None and parser.values["c"] == 2.5
+    assert json.loads(parser.values["d"]) == [1, {"e": "}"}]
+    assert parser.values["f"] == "x" and parser.done
@@ -0,0 +1,58 @@
+import json
+
+from knowledge_store import KnowledgeStore, build_store, legacy_question_id, question_id, validate_sources
+
+
+def _entry(**fields):
+    entry = {"id": "q_chapter2_001", "topic": "ציות", "question": "מהו ציות?",
+             "ideal_answer": "שינוי התנהגות בעקבות הוראה.", "key_concepts": ["ציות", "סמכות"],
+             "source_text": "ציות הוא ...", "page_number": 40, "scope": "General", "difficulty": "Easy"}
+    entry.update(fields)
+    return entry
+
+
+def _write_chapter(directory, entries):
+    directory.mkdir(exist_ok=True)
+    source = {"chapter": 2, "title": "השפעה חברתית", "questions": entries}
+    (directory / "chapter2.json").write_text(json.dumps(source, ensure_ascii=False), encoding="utf-8")
+
+
+def test_every_shipped_entry_has_an_explicit_id():
+    from knowledge_base import knowledge_base
+
+    assert all(entry.get("id") for entry in knowledge_base)
+    assert validate_sources([(1, None, knowledge_base, "knowledge_base.py")]) == []
+
+
+def test_missing_id_is_reported_with_the_text_derived_one():
+    entry = _entry()
+    del entry["id"]
+    errors = validate_sources([(2, None, [entry], "chapter2.json")])
+    assert errors == [f"chapter2.json #1: missing field 'id' (its text-derived id was \"{legacy_question_id(entry)}\")"]
+
+
+def test_duplicate_ids_and_questions_are_reported():
+    errors = validate_sources([(2, None, [_entry(), _entry(question="אחרת?")], "a.json"),
+                               (3, None, [_entry(id="q_other")], "b.json")])
+    assert any("duplicate id 'q_chapter2_001'" in error for error in errors)
+    assert any("duplicate question" in error for error in errors)
+
+
+def test_rewording_a_question_keeps_its_id(tmp_path):
+    sources = tmp_path / "sources"
+    _write_chapter(sources, [_entry()])
+    build_store(str(tmp_path / "kb.sqlite3"), str(sources))
+    before = KnowledgeStore(str(tmp_path / "kb.sqlite3")).id_for_question("מהו ציות?")
+
+    _write_chapter(sources, [_entry(question="מהו ציות לסמכות?")])
+    build_store(str(tmp_path / "kb2.sqlite3"), str(sources))
+    store = KnowledgeStore(str(tmp_path / "kb2.sqlite3"))
+    assert before == store.id_for_question("מהו ציות לסמכות?") == "q_chapter2_001"
+    assert store["q_chapter2_001"]["question"] == "מהו ציות לסמכות?"
+
+
+def test_question_id_falls_back_to_the_text_hash_only_without_an_id():
+    assert question_id(_entry()) == "q_chapter2_001"
+    entry = _entry()
+    del entry["id"]
+    assert question_id(entry) == legacy_question_id(entry)
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import event_logger  # noqa: E402
+import grading_engine  # noqa: E402
+import question_scheduler  # noqa: E402
+from benchmark import FakeLiteLLM, build_workload  # noqa: E402
+from load_test import SqliteSessionLogsStandIn, find_saturation, install_stand_ins, run_level  # noqa: E402
+
+
+def _level(students, submissions_per_s, stages_p95, failures=0):
+    return {"students": students, "submissions_per_s": submissions_per_s, "failures": failures,
+            "stages_ms": {stage: {"p95": p95} for stage, p95 in stages_p95.items()}}
+
+
+def test_stand_in_counts_connections_per_thread_and_collects_stage_timings(tmp_path):
+    sink = SqliteSessionLogsStandIn(str(tmp_path / "session_logs.sqlite3"))
+    sink.log("s1", "SUBMISSION_ATTEMPT", {"studentAnswer": "א"})
+    sink.log("s1", "EVALUATION_RESULT", {"timing": {"triageMs": 3.0, "evaluationMs": 9.0}}, score=4)
+    worker = threading.Thread(target=sink.log, args=("s2", "SUBMISSION_ATTEMPT", {}))
+    worker.start()
+    worker.join()
+    assert sink.connections_opened == 2 and sink.peak_connections_in_use == 1
+    assert len(sink.samples["db_write"]) == 3
+    assert sink.samples["triage"] == [3.0] and sink.samples["evaluation"] == [9.0] and "parsing" not in sink.samples
+    sink.reset_level()
+    assert sink.connections_opened == 0 and not sink.samples
+
+
+def test_stand_in_fetch_rows_is_the_scheduler_delta_query(tmp_path):
+    sink = SqliteSessionLogsStandIn(str(tmp_path / "session_logs.sqlite3"))
+    for session_id, event_type in [("s1", "SUBMISSION_ATTEMPT"), ("s2", "SUBMISSION_ATTEMPT"),
+                                   ("s1", "QUESTION_PRESENTED"), ("s1", "EVALUATION_RESULT"), ("s1", "TRACE")]:
+        sink.log(session_id, event_type, {"n": 1}, score=5 if event_type == "EVALUATION_RESULT" else None)
+    rows = sink.fetch_rows("s1", 0, 10)
+    assert [(row[0], row[2], row[4]) for row in rows] == [(1, "SUBMISSION_ATTEMPT", None), (4, "EVALUATION_RESULT", 5)]
+    assert isinstance(rows[0][1], float)
+    assert [row[0] for row in sink.fetch_rows("s1", 1, 10)] == [4]
+    assert len(sink.fetch_rows("s1", 0, 1)) == 1
+
+
+def test_stand_in_query_delay(tmp_path):
+    sink = SqliteSessionLogsStandIn(str(tmp_path / "session_logs.sqlite3"), query_delay_s=0.05)
+    start = time.perf_counter()
+    sink.fetch_rows("s1", 0, 10)
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_no_saturation_when_throughput_keeps_growing():
+    levels = [_level(1, 1.0, {"page_load": 40, "submit_rerun": 100, "evaluation": 50}),
+              _level(2, 1.9, {"page_load": 40, "submit_rerun": 110, "evaluation": 55})]
+    saturated, bottleneck, growth = find_saturation(levels)
+    assert saturated is None
+    assert bottleneck == "evaluation" and growth["evaluation"] == 1.1
+
+
+def test_saturation_at_a_throughput_plateau_flags_the_stage_that_grew_most():
+    levels = [_level(1, 1.0, {"submit_rerun": 100, "evaluation": 50, "db_write": 2}),
+              _level(2, 1.9, {"submit_rerun": 120, "evaluation": 60, "db_write": 3}),
+              _level(4, 2.0, {"submit_rerun": 200, "evaluation": 70, "db_write": 20})]
+    saturated, bottleneck, growth = find_saturation(levels)
+    assert saturated["students"] == 4
+    assert bottleneck == "db_write" and growth["db_write"] == 10.0
+
+
+def test_rerun_blowup_without_a_slower_stage_is_script_execution():
+    levels = [_level(1, 1.0, {"submit_rerun": 100, "evaluation": 50}),
+              _level(2, 1.8, {"submit_rerun": 400, "evaluation": 55})]
+    saturated, bottleneck, _ = find_saturation(levels)
+    assert saturated["students"] == 2 and bottleneck == "script_execution"
+
+
+def test_failures_saturate_the_level():
+    levels = [_level(1, 1.0, {"submit_rerun": 100}), _level(2, 2.0, {"submit_rerun": 100}, failures=1)]
+    assert find_saturation(levels)[0]["students"] == 2
+
+
+@pytest.fixture
+def stand_ins(monkeypatch):
+    # install_stand_ins replaces the process-wide singletons; put the originals back afterwards
+    monkeypatch.setattr(event_logger, "_event_logger", event_logger._event_logger)
+    monkeypatch.setattr(grading_engine, "_grading_engine", grading_engine._grading_engine)
+    monkeypatch.setattr(question_scheduler, "_scheduler", question_scheduler._scheduler)
+    return install_stand_ins({"use_response_cache": False, "use_near_duplicates": False},
+                             FakeLiteLLM(triage_ms=0, evaluation_ms=0, jitter=0))
+
+
+def test_a_small_level_runs_every_virtual_student(stand_ins):
+    sink, secrets = stand_ins
+    level = run_level(2, 2, build_workload(4, seed=0), secrets, sink, timeout=60)
+    assert level["failures"] == 0, level["first_failure"]
+    assert level["students"] == 2 and level["submissions_per_s"] > 0
+    assert level["stages_ms"]["page_load"]["count"] == 2 and level["stages_ms"]["submit_rerun"]["count"] == 4
+    assert level["db_connections_opened"] >= 1 and level["stages_ms"]["db_write"]["count"] > 0
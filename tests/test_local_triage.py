@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from concept_matcher import ConceptCoverage
+from local_triage import DEFAULT_ESCALATION_THRESHOLD, bigram_model, fast_path_triage, triage_locally
+
+
+@pytest.mark.parametrize("answer", ["לא יודעת", "אני לא יודע", "לא קראתי את הפרק עדיין", "באמת שאין לי מושג", "idk"])
+def test_bare_no_knowledge_is_settled(answer):
+    decision = fast_path_triage(answer)
+    assert decision is not None and decision.label == "no_knowledge"
+
+
+@pytest.mark.parametrize("answer", ["לא בטוחה, אולי עיבוד דואלי", "לא יודעת, אולי ציות לסמכות"])
+def test_hedged_answer_is_escalated(answer):
+    assert fast_path_triage(answer) is None
+
+
+@pytest.mark.parametrize("answer", ["1954", "123", "לא זוכרת בדיוק, משהו עם 20 דולר"])
+def test_answers_with_digits_are_escalated(answer):
+    assert fast_path_triage(answer) is None
+    assert triage_locally(answer).label == "valid_attempt"
+
+
+def test_key_concept_is_never_rejected_locally():
+    coverage = ConceptCoverage(covered=["עיבוד דואלי"], missing=[])
+    assert fast_path_triage("לא יודעת", coverage=coverage) is None
+    assert triage_locally("לא יודעת").label == "no_knowledge"
+
+
+@pytest.mark.parametrize("answer", ["asdfghjkl", "שדגכשדגכ", "אאאאאאאא", "", "!!!"])
+def test_gibberish_is_settled(answer):
+    decision = fast_path_triage(answer)
+    assert decision is not None and decision.label == "gibberish"
+
+
+def test_local_confidences_stay_below_certainty():
+    for answer in ["לא יודעת", "", "אאאאאאאא", "!!"]:
+        assert DEFAULT_ESCALATION_THRESHOLD <= triage_locally(answer).confidence < 0.95
+
+
+def test_importing_does_not_open_the_knowledge_store():
+    check = "import knowledge_store, local_triage; assert knowledge_store._store is None"
+    subprocess.run([sys.executable, "-c", check], check=True)
+    assert bigram_model() is bigram_model()
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from micro_batching import MicroBatcher, parse_batch_evaluations
+
+UNIT = {"id": "q1", "topic": "t", "question": "מהו חיזוק?", "ideal_answer": "תוצאה שמגבירה התנהגות",
+        "key_concepts": ["חיזוק"], "page_number": 1, "scope": "s", "difficulty": "d"}
+
+
+def _response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                           usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+
+
+def test_concurrent_answers_share_one_call_and_no_task_is_left():
+    calls = []
+
+    async def complete(messages, **kwargs):
+        calls.append(messages)
+        await asyncio.sleep(0.01)
+        entries = [{"index": i, "score": 3, "justification": "j", "feedback": "f"} for i in (1, 2, 3)]
+        return _response(json.dumps({"evaluations": entries}))
+
+    batcher = MicroBatcher(complete, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        results = await asyncio.gather(*(batcher.evaluate("q1", UNIT, f"answer {i}") for i in range(3)))
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [json.loads(text)["score"] for text, _ in results] == [3, 3, 3]
+    assert not batcher._tasks
+
+
+def test_parse_batch_evaluations_marks_missing_and_bad_entries():
+    content = json.dumps({"evaluations": [
+        {"index": 1, "score": "4/5", "justification": "j", "feedback": "f"},
+        {"index": 3, "score": "none"},
+        "junk",
+    ]})
+    evaluations = parse_batch_evaluations(content, 3)
+    assert evaluations[0]["score"] == 4
+    assert evaluations[1] is None and evaluations[2] is None
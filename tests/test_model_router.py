@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import time
+
+import pytest
+
+pytest.importorskip("litellm")
+
+from fake_llm_server import DEFAULT_PROFILE  # noqa: E402
+from model_router import LLMUnavailableError, ModelRouter, ModelStats  # noqa: E402
+from resilience import CircuitBreaker  # noqa: E402
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _SlowStream:
+    def __init__(self, chunks, delay_s):
+        self.model = "fake"
+        self.chunks = list(chunks)
+        self.delay_s = delay_s
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay_s)
+        return _Chunk(self.chunks.pop(0))
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _router(response_factory, deadline_s):
+    async def acompletion(messages, **kwargs):
+        return response_factory()
+    return ModelRouter(["fake"], deadline_s=deadline_s, hedge=False, acompletion=acompletion)
+
+
+def test_stream_is_bounded_by_the_deadline():
+    stream = _SlowStream(["a"] * 50, delay_s=0.05)
+    router = _router(lambda: stream, deadline_s=0.3)
+
+    async def consume():
+        response = await router.complete([], stream=True)
+        return [chunk.text async for chunk in response]
+
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(consume())
+    assert time.monotonic() - start < 1.0
+    assert stream.closed
+    assert router.metrics()["deadline_exceeded"] == 1
+
+
+def test_stream_within_deadline_passes_through():
+    router = _router(lambda: _SlowStream(["a", "b", "c"], delay_s=0.01), deadline_s=2)
+
+    async def consume():
+        response = await router.complete([], stream=True)
+        assert response.model == "fake"
+        return [chunk.text async for chunk in response]
+
+    assert asyncio.run(consume()) == ["a", "b", "c"]
+    assert router.metrics()["deadline_exceeded"] == 0
+
+
+def test_non_stream_deadline():
+    async def acompletion(messages, **kwargs):
+        await asyncio.sleep(1)
+
+    router = ModelRouter(["fake"], deadline_s=0.1, hedge=False, acompletion=acompletion)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(router.complete([]))
+
+
+# --- Against fake_llm_server.py over HTTP, through the real litellm client ---
+@contextlib.asynccontextmanager
+async def _fake_llm(**profiles):
+    from aiohttp import web
+
+    from fake_llm_server import make_app
+
+    app = make_app({name: {**DEFAULT_PROFILE, **profile} for name, profile in profiles.items()})
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    api_base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+    try:
+        yield app, lambda name: {"model": f"openai/{name}", "api_base": api_base, "api_key": "fake", "max_retries": 0}
+    finally:
+        await runner.cleanup()
+
+
+MESSAGES = [{"role": "user", "content": "evaluate"}]
+
+
+def test_hedge_fires_at_the_observed_p95_and_the_first_answer_wins():
+    pytest.importorskip("aiohttp")
+
+    async def run():
+        profiles = {"slow": {"latency_ms": 3000, "jitter_ms": 0}, "fast": {"latency_ms": 10, "jitter_ms": 0}}
+        async with _fake_llm(**profiles) as (app, route):
+            router = ModelRouter([route("slow"), route("fast")], deadline_s=10, min_samples=5)
+            slow = router.stats["openai/slow"]
+            for _ in range(20):
+                slow.record_success(400.0)  # Observed p95: 0.4 s
+            start = time.monotonic()
+            response = await router.complete(MESSAGES)
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(0)  # Let the cancelled loser run its handlers
+            return router, response, elapsed, dict(app["counters"])
+
+    router, response, elapsed, counters = asyncio.run(run())
+    assert response.choices[0].message.content
+    assert 0.4 <= elapsed < 2.5
+    assert counters == {"slow": 1, "fast": 1}
+    metrics = router.metrics()
+    assert metrics["hedges_fired"] == 1
+    assert metrics["models"]["openai/fast"]["hedges_won"] == 1
+    # The loser was cancelled: no outcome, its breaker untouched, its time kept for the p95
+    slow = metrics["models"]["openai/slow"]
+    assert (slow["calls"], slow["successes"], slow["failures"]) == (1, 20, 0)
+    assert slow["breaker_state"] == "closed"
+    assert len(router.stats["openai/slow"]._latencies) == 21
+
+
+def test_no_hedge_before_the_primary_is_slower_than_its_p95():
+    pytest.importorskip("aiohttp")
+
+    async def run():
+        profiles = {"primary": {"latency_ms": 50, "jitter_ms": 0}, "alternate": {"latency_ms": 10, "jitter_ms": 0}}
+        async with _fake_llm(**profiles) as (app, route):
+            router = ModelRouter([route("primary"), route("alternate")], deadline_s=10, default_hedge_delay_s=2)
+            await router.complete(MESSAGES)
+            return router, dict(app["counters"])
+
+    router, counters = asyncio.run(run())
+    assert counters == {"primary": 1}
+    assert router.metrics()["hedges_fired"] == 0
+
+
+def test_breaker_opens_then_half_opens_for_one_trial():
+    pytest.importorskip("aiohttp")
+
+    async def run():
+        async with _fake_llm(down={"latency_ms": 1, "jitter_ms": 0, "error_rate": 1.0},
+                             backup={"latency_ms": 1, "jitter_ms": 0}) as (app, route):
+            router = ModelRouter([route("down"), route("backup")], deadline_s=10, hedge=False)
+            breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.3, name="openai/down")
+            router.stats["openai/down"].breaker = breaker
+            for _ in range(2):
+                await router.complete(MESSAGES)  # Fails over to the backup
+            states = [breaker.state]
+            await router.complete(MESSAGES)  # Open: the backup only
+            calls_while_open = app["counters"]["down"]
+
+            await asyncio.sleep(0.35)
+            states.append(breaker.state)
+            app["profiles"]["down"]["error_rate"] = 0.0  # Recovered
+            response = await router.complete(MESSAGES)  # The half-open trial
+            states.append(breaker.state)
+            return router, response, states, calls_while_open, dict(app["counters"])
+
+    router, response, states, calls_while_open, counters = asyncio.run(run())
+    assert states == ["open", "half_open", "closed"]
+    assert calls_while_open == 2
+    assert counters == {"down": 3, "backup": 3}
+    assert router.metrics()["fallbacks"] == 2
+    assert response.choices[0].message.content
+
+
+def test_latency_ewma_follows_observed_calls():
+    pytest.importorskip("aiohttp")
+    stats = ModelStats("m", ewma_alpha=0.5)
+    stats.record_success(100.0)
+    stats.record_success(300.0)
+    assert stats.ewma_ms == 200.0
+    stats.record_abandoned(5000.0)  # Not an answer: the EWMA is unchanged
+    assert stats.ewma_ms == 200.0
+
+    async def run():
+        async with _fake_llm(steady={"latency_ms": 150, "jitter_ms": 0}) as (_, route):
+            router = ModelRouter([route("steady")], deadline_s=10, hedge=False)
+            ewmas = []
+            for _ in range(3):
+                await router.complete(MESSAGES)
+                ewmas.append(router.metrics()["models"]["openai/steady"]["ewma_ms"])
+            return ewmas
+
+    ewmas = asyncio.run(run())
+    assert all(ewma >= 150 for ewma in ewmas)
+    assert ewmas[0] != ewmas[1]
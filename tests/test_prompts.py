@@ -0,0 +1,49 @@
+import re
+
+from knowledge_store import get_knowledge_store
+from prompts import (BATCH_EVALUATION_PROMPT_TEMPLATE, EVALUATION_INSTRUCTIONS, EVALUATION_PROMPT_TEMPLATE,
+                     EVALUATION_QUESTION_TEMPLATE, build_batch_evaluation_prompt, build_evaluation_prompt,
+                     evaluation_prompt_prefix)
+
+ANSWERS = ["חיזוק מגביר התנהגות.", 'עונש "מפחית" התנהגות.\nשורה שנייה', "לא יודעת"]
+
+
+def some_unit():
+    store = get_knowledge_store()
+    return store[store.ids()[0]]
+
+
+def test_single_and_batch_prompts_share_the_question_prefix_byte_for_byte():
+    unit = some_unit()
+    prefix = evaluation_prompt_prefix(unit['ideal_answer'], tuple(unit['key_concepts']))
+    assert build_evaluation_prompt(unit, ANSWERS[0]).startswith(prefix)
+    assert build_batch_evaluation_prompt(unit, ANSWERS).startswith(prefix)
+    assert ", ".join(unit['key_concepts']) in prefix
+
+
+def test_key_concepts_are_joined_not_list_repr():
+    unit = some_unit()
+    for prompt in (build_evaluation_prompt(unit, ANSWERS[0]), build_batch_evaluation_prompt(unit, ANSWERS)):
+        assert repr(unit['key_concepts']) not in prompt and "['" not in prompt
+
+
+def test_the_prefix_is_compiled_once_per_question():
+    unit = some_unit()
+    build_evaluation_prompt(unit, ANSWERS[0])
+    hits = evaluation_prompt_prefix.cache_info().hits
+    build_batch_evaluation_prompt(unit, ANSWERS)
+    build_batch_evaluation_prompt(unit, ANSWERS[:1])
+    assert evaluation_prompt_prefix.cache_info().hits == hits + 2
+
+
+def test_batch_answers_are_numbered_one_per_line():
+    prompt = build_batch_evaluation_prompt(some_unit(), ANSWERS)
+    # The pattern the fake LLM backends (benchmark.py, fake_llm_server.py) count answers with
+    assert len(re.findall(r"^\s+\[\d+\] ", prompt, re.MULTILINE)) == len(ANSWERS)
+    assert '  [2] "עונש \\"מפחית\\" התנהגות.\\nשורה שנייה"' in prompt
+    assert "exactly\n3 objects" in prompt
+
+
+def test_batch_template_extends_the_single_answer_template():
+    shared = EVALUATION_INSTRUCTIONS + EVALUATION_QUESTION_TEMPLATE
+    assert EVALUATION_PROMPT_TEMPLATE.startswith(shared) and BATCH_EVALUATION_PROMPT_TEMPLATE.startswith(shared)
@@ -0,0 +1,163 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from question_scheduler import (BASE_INTERVAL_S, INTERVAL_GROWTH, MAX_INTERVAL_S, RELEARN_INTERVAL_S, QuestionScheduler,
+                                StudentSchedule, mysql_row_fetcher, next_interval, next_strength)
+
+
+class _FakeStore:
+    """
+    Just enough of KnowledgeStore for QuestionScheduler: ids(), [qid] and id_for_question.
+    """
+
+    def __init__(self, units):
+        self.units = {unit["id"]: unit for unit in units}
+
+    def ids(self, difficulty=None, scope=None):
+        return [qid for qid, unit in self.units.items()
+                if difficulty in (None, unit["difficulty"]) and scope in (None, unit["scope"])]
+
+    def __getitem__(self, qid):
+        return self.units[qid]
+
+    def id_for_question(self, text):
+        return next((qid for qid, unit in self.units.items() if unit["question"] == text), None)
+
+
+STORE = _FakeStore([
+    {"id": "hard", "difficulty": "Hard", "scope": "General", "question": "q-hard"},
+    {"id": "easy-specific", "difficulty": "Easy", "scope": "Specific", "question": "q-easy-specific"},
+    {"id": "easy", "difficulty": "Easy", "scope": "General", "question": "q-easy"},
+    {"id": "medium", "difficulty": "Medium", "scope": "General", "question": "q-medium"},
+])
+
+
+def _scheduler(tmp_path, rows=(), fetched=None):
+    def fetch_rows(student_id, after_id, limit):
+        if fetched is not None:
+            fetched.append((student_id, after_id))
+        return [row for row in rows if row[0] > after_id][:limit]
+
+    return QuestionScheduler(fetch_rows, store=STORE, state_path=str(tmp_path / "state.sqlite3"),
+                             min_sync_interval_s=0)
+
+
+def test_next_interval_relearns_poor_scores_and_scales_by_level():
+    assert next_interval(5, 2, "Easy", "General") == RELEARN_INTERVAL_S
+    assert next_interval(0, 3, "Medium", "General") == BASE_INTERVAL_S
+    assert next_interval(2, 4, "Hard", "Specific") == BASE_INTERVAL_S * INTERVAL_GROWTH ** 2 * 0.6 * 0.8
+    assert next_interval(12, 5, "Easy", "General") == MAX_INTERVAL_S
+
+
+def test_next_strength():
+    assert next_strength(4, None) == 4
+    assert next_strength(4, 1) == 0
+    assert next_strength(4, 3) == 4
+    assert next_strength(4, 5) == 6
+    assert next_strength(0, 3) == 0
+    assert next_strength(11, 5) == 12
+
+
+def test_new_questions_go_easy_to_hard_and_general_to_specific(tmp_path):
+    assert _scheduler(tmp_path).new_order == ("easy", "easy-specific", "medium", "hard")
+
+
+def test_due_question_comes_before_new_ones_and_exclude_is_respected(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.record("s", "hard", 1, at=1000.0)
+    due_at = 1000.0 + RELEARN_INTERVAL_S
+    assert scheduler.next_question("s", now=due_at - 1) == "easy"
+    assert scheduler.next_question("s", now=due_at) == "hard"
+    assert scheduler.next_question("s", exclude=("hard",), now=due_at) == "easy"
+    # Still due once the exclusion is lifted
+    assert scheduler.next_question("s", now=due_at) == "hard"
+
+
+def test_record_moves_on_and_falls_back_to_the_soonest_due(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    for qid in STORE.units:
+        scheduler.record("s", qid, 5, at=0.0)
+    assert scheduler.next_question("s", now=1.0) == "hard"  # Shortest interval
+    assert scheduler.next_question("s", exclude=STORE.units, now=1.0) in STORE.units
+
+
+def test_sync_applies_rows_after_the_watermark_and_skips_pending_submissions(tmp_path):
+    rows = [
+        (1, 100, "SUBMISSION_ATTEMPT", json.dumps({"questionText": "q-easy"}), None),
+        (2, 101, "EVALUATION_RESULT", json.dumps({"submissionId": "a"}), 1),  # Legacy row: no questionId
+        (3, 200, "SUBMISSION_ATTEMPT", json.dumps({"questionId": "medium"}), None),
+        (4, 201, "EVALUATION_RESULT", json.dumps({"submissionId": "b", "questionId": "medium"}), 1),
+    ]
+    fetched = []
+    scheduler = _scheduler(tmp_path, rows, fetched)
+    scheduler.record("s", "medium", 5, submission_id="b", at=201.0)
+    scheduler.next_question("s", now=300.0)
+
+    schedule = scheduler._schedule("s")
+    assert schedule.watermark == 4
+    assert schedule.states["easy"][2] == 1
+    assert schedule.states["medium"][2] == 5  # Row 4 was already recorded locally
+    assert schedule.pending == set()
+    assert scheduler.metrics()["rows_applied"] == 1
+
+    scheduler.next_question("s", now=400.0)
+    assert fetched == [("s", 0), ("s", 4)]
+
+
+def test_sync_failure_keeps_the_cached_schedule(tmp_path):
+    def fetch_rows(student_id, after_id, limit):
+        raise OSError("database down")
+
+    scheduler = QuestionScheduler(fetch_rows, store=STORE, state_path=str(tmp_path / "state.sqlite3"),
+                                  min_sync_interval_s=0)
+    assert scheduler.next_question("s", now=0.0) == "easy"
+
+
+def test_snapshot_round_trip(tmp_path):
+    rows = [(7, 100, "EVALUATION_RESULT", json.dumps({"questionId": "hard"}), 4)]
+    scheduler = _scheduler(tmp_path, rows)
+    scheduler.record("s", "easy", 3, submission_id="x", at=50.0)
+    scheduler.next_question("s", now=100.0)
+
+    reopened = _scheduler(tmp_path)
+    schedule = reopened._schedule("s")
+    assert reopened.metrics()["snapshot_loads"] == 1
+    assert schedule.watermark == 7
+    assert schedule.pending == {"x"}
+    assert schedule.states == scheduler._schedule("s").states
+
+    copy = StudentSchedule.from_snapshot("s", schedule.to_snapshot())
+    assert copy.next_question(reopened.new_order, 1e12) == schedule.next_question(reopened.new_order, 1e12)
+
+
+def test_mysql_fetcher_leaves_unsettled_rows_for_a_later_sync(monkeypatch):
+    pooling = pytest.importorskip("mysql.connector.pooling")
+    executed = []
+
+    class _Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, query, params):
+            executed.append((" ".join(query.split()), params))
+
+        def fetchall(self):
+            return []
+
+    class _Pool:
+        def __init__(self, **kwargs):
+            pass
+
+        def get_connection(self):
+            return SimpleNamespace(cursor=_Cursor, close=lambda: None)
+
+    monkeypatch.setattr(pooling, "MySQLConnectionPool", _Pool)
+    mysql_row_fetcher({}, settle_seconds=7)("s", 42, 100)
+    query, params = executed[0]
+    assert "id > %s AND created_at < NOW() - INTERVAL %s SECOND" in query
+    assert params == ("s", 42, 7, 100)
@@ -0,0 +1,106 @@
+import response_cache
+from prompts import EVALUATION_PROMPT_TEMPLATE
+from response_cache import ResponseCache, make_cache_key
+
+UNIT = {"ideal_answer": "חיזוק מגביר את הסבירות להתנהגות.", "key_concepts": ["חיזוק", "התנהגות"]}
+MODEL = "gemini/gemini-1.5-flash-latest"
+
+
+def key(answer, unit=UNIT, model=MODEL, template=EVALUATION_PROMPT_TEMPLATE, question_id="q_1"):
+    return make_cache_key(model, template, question_id, answer, unit)
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    return ResponseCache(str(tmp_path / "responses.sqlite3"), **kwargs), clock
+
+
+def test_replacing_a_key_does_not_count_it_twice(tmp_path, monkeypatch):
+    cache, _ = make_cache(tmp_path, monkeypatch)
+    for value in ("a", "b", "c"):
+        cache.set("k", value)
+    assert cache.metrics()["disk_entries"] == 1 and cache.get("k") == "c"
+    assert ResponseCache(str(tmp_path / "responses.sqlite3")).metrics()["disk_entries"] == 1
+
+
+def test_entries_expire_after_the_ttl_in_both_tiers(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=60)
+    cache.set("k", "v")
+    clock.now += 59
+    assert cache.get("k") == "v"
+    clock.now += 2
+    assert cache.get("k") is None
+    # The memory tier forgot it too, and a second process's view of the file agrees
+    reopened = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl_seconds=60)
+    assert reopened.get("k") is None
+    assert cache.metrics()["expired"] >= 1
+
+
+def test_expired_disk_rows_are_deleted_and_uncounted(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, memory_entries=1, ttl_seconds=60)
+    cache.set("old", "v")
+    cache.set("other", "v")  # pushes "old" out of the memory tier
+    clock.now += 61
+    assert cache.get("old") is None
+    assert cache.metrics()["disk_entries"] == 1
+
+
+def test_size_eviction_drops_the_least_recently_used_to_ninety_percent(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, memory_entries=1, disk_entries=10)
+    for i in range(10):
+        cache.set(f"k{i}", str(i))
+        clock.now += 1
+    cache.get("k0")  # recently used again, so it survives
+    clock.now += 1
+    cache.set("k10", "10")
+    metrics = cache.metrics()
+    assert metrics["disk_entries"] == 9 and metrics["evicted"] == 2
+    assert cache.get("k0") == "0" and cache.get("k10") == "10"
+    assert cache.get("k1") is None and cache.get("k2") is None and cache.get("k3") == "3"
+
+
+def test_expired_rows_go_before_any_live_one_is_evicted(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, memory_entries=1, disk_entries=4, ttl_seconds=60)
+    cache.set("stale", "v")
+    clock.now += 61
+    for name in ("a", "b", "c", "d"):
+        cache.set(name, "v")
+        clock.now += 1
+    # Five rows over a capacity of four: the stale one goes first, then one live row, down to three
+    metrics = cache.metrics()
+    assert metrics["expired"] == 1 and metrics["evicted"] == 1 and metrics["disk_entries"] == 3
+    assert cache.get("a") is None and [cache.get(name) for name in "bcd"] == ["v", "v", "v"]
+
+
+def test_editing_the_ideal_answer_or_key_concepts_invalidates():
+    base = key("חיזוק מגביר התנהגות")
+    assert key("חיזוק מגביר התנהגות", unit=dict(UNIT, ideal_answer=UNIT["ideal_answer"] + " עוד")) != base
+    assert key("חיזוק מגביר התנהגות", unit=dict(UNIT, key_concepts=["חיזוק"])) != base
+    assert key("חיזוק מגביר התנהגות", unit=dict(UNIT, key_concepts=["התנהגות", "חיזוק"])) != base
+    # Other fields of the entry (topic, page number) are not part of the key
+    assert key("חיזוק מגביר התנהגות", unit=dict(UNIT, topic="למידה")) == base
+
+
+def test_model_template_and_question_are_part_of_the_key():
+    base = key("תשובה")
+    assert key("תשובה", model="gemini/gemini-1.5-flash-8b") != base
+    assert key("תשובה", template=EVALUATION_PROMPT_TEMPLATE + " ") != base
+    assert key("תשובה", question_id="q_2") != base
+
+
+def test_niqqud_punctuation_case_and_spacing_do_not_change_the_key():
+    base = key("חיזוק מגביר התנהגות")
+    assert key("חִיזּוּק מַגְבִּיר הִתְנַהֲגוּת") == base
+    assert key("  חיזוק, מגביר -- התנהגות!!  ") == base
+    assert key("חיזוק\nמגביר\tהתנהגות.") == base
+    assert key("Reinforcement חיזוק") == key("reinforcement, חיזוק")
+    assert key("חיזוק מגביר התנהגות לא") != base
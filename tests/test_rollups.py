@@ -0,0 +1,117 @@
+import re
+
+from rollups import COUNTERS, aggregate_rows, update_rollups
+
+
+def _row(id_, session, event_type, topic=None, classification=None, score=None, day="2026-01-01"):
+    difficulty = scope = None if topic is None else "x"
+    return (id_, day, session, event_type, classification, topic, difficulty, scope, score)
+
+
+class _FakeDB:
+    """
+    Just enough of MySQL for update_rollups: session_logs rows, rollup_state and rollup_daily.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.state = {}
+        self.daily = {}
+        self.commits = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, query, params=()):
+        query = " ".join(query.split())
+        if query.startswith("INSERT IGNORE INTO rollup_state"):
+            self.db.state.setdefault(params[0], [0, 0])
+        elif query.startswith("SELECT last_id FROM rollup_state"):
+            self.result = [(self.db.state[params[0]][0],)]
+        elif query.startswith("SELECT id, DATE("):
+            last_id, _, limit = params
+            self.result = [row for row in self.db.rows if row[0] > last_id][:limit]
+        elif query.startswith("SELECT s.session_id"):
+            last_id, sessions = params[0], set(params[1:])
+            latest = {}
+            for row in self.db.rows:
+                if row[0] <= last_id and row[3] == "SUBMISSION_ATTEMPT" and row[2] in sessions:
+                    latest[row[2]] = (row[2], row[5], row[6], row[7])
+            self.result = list(latest.values())
+        elif query.startswith("UPDATE rollup_state"):
+            last_id, count, name = params
+            self.db.state[name] = [last_id, self.db.state[name][1] + count]
+        else:
+            raise AssertionError(f"unexpected query: {query}")
+
+    def executemany(self, query, rows):
+        assert re.match(r"\s*INSERT INTO rollup_daily", query)
+        for row in rows:
+            key, values = row[:4], row[4:]
+            current = self.db.daily.setdefault(key, [0] * len(COUNTERS))
+            self.db.daily[key] = [a + b for a, b in zip(current, values)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def _counter(db, key, name):
+    return db.daily.get(key, [0] * len(COUNTERS))[COUNTERS.index(name)]
+
+
+def test_aggregate_rows_counts_and_inherits_topic():
+    rows = [
+        _row(1, "s1", "QUESTION_PRESENTED", "t"),
+        _row(2, "s1", "SUBMISSION_ATTEMPT", "t"),
+        _row(3, "s1", "TRIAGE_RESULT", classification="no_knowledge"),
+        _row(4, "s1", "EVALUATION_RESULT", "t", score=2),
+        _row(5, "s1", "EVALUATION_RESULT", "t", score=5),
+    ]
+    buckets = aggregate_rows(rows)
+    counters = buckets[("2026-01-01", "t", "x", "x")]
+    assert counters["questions_presented"] == 1 and counters["submissions"] == 1
+    assert counters["triage_no_knowledge"] == 1
+    assert (counters["evaluations"], counters["score_sum"], counters["score_count"], counters["low_scores"]) == (2, 7, 2, 1)
+    assert len(buckets) == 1
+
+
+def test_watermark_batches_apply_every_row_once():
+    rows = [_row(i, f"s{i % 3}", "QUESTION_PRESENTED", "t") for i in range(1, 11)]
+    db = _FakeDB(rows)
+    assert update_rollups(db, batch_rows=3) == 10
+    assert db.state["rollup_daily"] == [10, 10]
+    assert _counter(db, ("2026-01-01", "t", "x", "x"), "questions_presented") == 10
+
+    # Nothing new: a second run reads nothing; new rows are picked up from the watermark
+    assert update_rollups(db, batch_rows=3) == 0
+    db.rows.append(_row(11, "s1", "QUESTION_PRESENTED", "t"))
+    assert update_rollups(db, batch_rows=3) == 1
+    assert _counter(db, ("2026-01-01", "t", "x", "x"), "questions_presented") == 11
+
+
+def test_topic_context_survives_a_run_boundary():
+    db = _FakeDB([_row(1, "s1", "SUBMISSION_ATTEMPT", "t")])
+    update_rollups(db)
+    # A new run (a fresh process) sees the TRIAGE_RESULT without its SUBMISSION_ATTEMPT
+    db.rows.append(_row(2, "s1", "TRIAGE_RESULT", classification="valid_attempt"))
+    update_rollups(db)
+    assert _counter(db, ("2026-01-01", "t", "x", "x"), "triage_valid") == 1
+    assert _counter(db, ("2026-01-01", "", "", ""), "triage_valid") == 0
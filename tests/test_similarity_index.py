@@ -0,0 +1,132 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+import similarity_index
+from similarity_index import NearDuplicateIndex, _QuestionIndex, ngram_features
+
+ANSWERS = [
+    "חיזוק הוא כל תוצאה שמגבירה את הסבירות שההתנהגות תחזור",
+    "עונש מפחית את הסבירות שההתנהגות תחזור על עצמה",
+    "ציות לסמכות במחקר של מילגרם",
+    "עיבוד דואלי זה חשיבה מודעת וחשיבה אוטומטית",
+]
+
+
+def _dense_cosines(answers, query):
+    """
+    The same TF-IDF cosine computed densely, as a reference.
+    """
+    features = [ngram_features(a) for a in answers]
+    query_features = ngram_features(query)
+    vocabulary = sorted({int(h) for hashes, _ in features + [query_features] for h in hashes})
+    column = {h: i for i, h in enumerate(vocabulary)}
+
+    def dense(feature):
+        vector = np.zeros(len(vocabulary))
+        for h, c in zip(feature[0].tolist(), feature[1]):
+            vector[column[h]] += c
+        return vector
+
+    matrix = np.array([dense(f) for f in features])
+    idf_sq = (np.log((len(answers) + 1) / ((matrix > 0).sum(axis=0) + 1)) + 1.0) ** 2
+    q = dense(query_features)
+    return (matrix @ (q * idf_sq)) / (np.sqrt((matrix ** 2) @ idf_sq) * np.sqrt(q @ (q * idf_sq)))
+
+
+def test_sparse_cosine_matches_dense_reference():
+    index = _QuestionIndex()
+    for i, answer in enumerate(ANSWERS):
+        index.add(ngram_features(answer), answer, str(i))
+    query = "חיזוק זה תוצאה שמגבירה את הסבירות שההתנהגות תחזור"
+    row, score = index.best_match(ngram_features(query))
+    expected = _dense_cosines(ANSWERS, query)
+    assert row == int(np.argmax(expected))
+    assert score == pytest.approx(float(expected.max()), rel=1e-4)
+
+
+def test_identical_answer_scores_one_and_unrelated_scores_low():
+    index = _QuestionIndex()
+    for i, answer in enumerate(ANSWERS):
+        index.add(ngram_features(answer), answer, str(i))
+    assert index.best_match(ngram_features(ANSWERS[2])) == (2, pytest.approx(1.0, abs=1e-5))
+    assert index.best_match(ngram_features("xyz qwerty"))[1] < 0.1
+
+
+def test_ring_buffer_overwrites_the_oldest_answer(monkeypatch):
+    monkeypatch.setattr(similarity_index, "MAX_ANSWERS_PER_QUESTION", 3)
+    index = _QuestionIndex()
+    for i, answer in enumerate(ANSWERS):
+        index.add(ngram_features(answer), answer, str(i))
+    assert index.size == 3
+    assert sorted(index.evaluations) == ["1", "2", "3"]
+    # doc_freq only counts the answers still in the ring
+    expected = np.zeros(len(index.vocabulary))
+    for columns, _ in index.rows:
+        expected[columns] += 1
+    assert np.array_equal(index.doc_freq[:len(index.vocabulary)], expected)
+    assert index.best_match(ngram_features(ANSWERS[0]))[1] < 0.9
+
+
+def test_lookup_persists_and_bounds_cached_questions(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_index, "MAX_CACHED_QUESTIONS", 2)
+    path = str(tmp_path / "c.sqlite3")
+    index = NearDuplicateIndex(path, spot_check_rate=0.0)
+    evaluation = json.dumps({"score": 4})
+    for qid in ("q1", "q2", "q3"):
+        index.add("m", "template", qid, "f", ANSWERS[0], evaluation)
+    assert len(index._indexes) == 2
+
+    reloaded = NearDuplicateIndex(path, spot_check_rate=0.0)
+    hit = reloaded.lookup("m", "template", "q1", "f", ANSWERS[0] + ".")
+    assert hit is not None and hit["evaluation"] == evaluation
+    assert reloaded.lookup("m", "template", "q1", "other-fingerprint", ANSWERS[0]) is None
+
+
+def test_grades_of_another_model_or_prompt_are_not_reused(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "c.sqlite3"), spot_check_rate=0.0)
+    index.add("m", "template", "q1", "f", ANSWERS[0], json.dumps({"score": 4}))
+    assert index.lookup("m", "template", "q1", "f", ANSWERS[0]) is not None
+    assert index.lookup("other-model", "template", "q1", "f", ANSWERS[0]) is None
+    assert index.lookup("m", "edited template", "q1", "f", ANSWERS[0]) is None
+
+    reloaded = NearDuplicateIndex(str(tmp_path / "c.sqlite3"), spot_check_rate=0.0)
+    assert reloaded.lookup("m", "edited template", "q1", "f", ANSWERS[0]) is None
+
+
+def test_expired_grades_are_not_reused(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.sqlite3")
+    index = NearDuplicateIndex(path, spot_check_rate=0.0, ttl_seconds=60)
+    index.add("m", "template", "q1", "f", ANSWERS[0], json.dumps({"score": 4}))
+    later = similarity_index.time.time() + 61
+    monkeypatch.setattr(similarity_index.time, "time", lambda: later)
+    assert index.lookup("m", "template", "q1", "f", ANSWERS[0]) is None
+    assert NearDuplicateIndex(path, spot_check_rate=0.0, ttl_seconds=60).lookup(
+        "m", "template", "q1", "f", ANSWERS[0]) is None
+    assert index.metrics()["expired"] == 1
+
+
+def test_table_is_trimmed_oldest_first(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "c.sqlite3"), spot_check_rate=0.0, disk_entries=10)
+    for i in range(11):
+        index.add("m", "template", f"q{i}", "f", ANSWERS[0], json.dumps({"score": 4}))
+    remaining = [row[0] for row in index._db.execute("SELECT question_id FROM graded_answers ORDER BY id")]
+    assert remaining == [f"q{i}" for i in range(2, 11)]
+    assert index.metrics()["evicted"] == 2
+
+
+def test_rows_from_before_the_evaluator_key_are_never_served(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE graded_answers (id INTEGER PRIMARY KEY, question_id TEXT NOT NULL,"
+               " fingerprint TEXT NOT NULL, answer TEXT NOT NULL, evaluation TEXT NOT NULL)")
+    db.execute("INSERT INTO graded_answers (question_id, fingerprint, answer, evaluation) VALUES ('q1', 'f', ?, ?)",
+               (ANSWERS[0], json.dumps({"score": 1})))
+    db.commit()
+    db.close()
+    index = NearDuplicateIndex(path, spot_check_rate=0.0)
+    assert index.lookup("m", "template", "q1", "f", ANSWERS[0]) is None
+    index.add("m", "template", "q1", "f", ANSWERS[0], json.dumps({"score": 4}))
+    assert json.loads(index.lookup("m", "template", "q1", "f", ANSWERS[0])["evaluation"]) == {"score": 4}
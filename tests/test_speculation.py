@@ -0,0 +1,70 @@
+import asyncio
+import gc
+import logging
+
+import pytest
+
+from speculation import SpeculativeExecutor
+
+
+def test_tasks_are_held_until_done_and_released():
+    executor = SpeculativeExecutor(max_in_flight=2, max_per_session=1)
+
+    async def main():
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        call = executor.submit("s1", slow)
+        assert executor.submit("s1", slow) is None  # Per-session cap
+        del call
+        gc.collect()
+        assert len(executor._tasks) == 1
+        await asyncio.sleep(0.1)
+        assert not executor._tasks and executor.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_failures_are_logged_and_cancellations_are_not(caplog):
+    executor = SpeculativeExecutor()
+
+    async def main():
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def forever():
+            await asyncio.sleep(10)
+
+        executor.submit("s1", fail)
+        executor.submit("s2", forever).cancel()
+        await asyncio.sleep(0.01)
+
+    with caplog.at_level(logging.WARNING, logger="speculation"):
+        asyncio.run(main())
+    assert [r.getMessage() for r in caplog.records] == ["Speculative evaluation failed: RuntimeError('boom')"]
+    assert executor.stats()["cancelled"] == 1 and executor.stats()["in_flight"] == 0
+
+
+def test_a_failed_result_is_settled_and_frees_the_session_slot():
+    executor = SpeculativeExecutor(max_in_flight=1, max_per_session=1)
+
+    async def main():
+        async def fail():
+            raise RuntimeError("boom")
+
+        call = executor.submit("s1", fail)
+        with pytest.raises(RuntimeError):
+            await call.result()
+        await asyncio.sleep(0)  # Done callbacks run on the next loop iteration
+        stats = executor.stats()
+        assert (stats["failed"], stats["paid_off"], stats["in_flight"]) == (1, 0, 0)
+
+        async def ok():
+            return "ok"
+
+        retry = executor.submit("s1", ok)
+        assert retry is not None and await retry.result() == "ok"
+
+    asyncio.run(main())
+    assert executor.stats()["paid_off"] == 1
@@ -0,0 +1,150 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+from benchmark import FakeLiteLLM
+from grading_engine import GradingEngine
+from knowledge_store import get_knowledge_store
+from tracing import Tracer, aggregate_by_topic, configure_tracer, span_cost, spans_from_jsonl
+
+
+def _usage(prompt, completion):
+    return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion))
+
+
+@pytest.fixture
+def process_tracer(monkeypatch):
+    # configure_tracer replaces the process-wide tracer; put the disabled one back afterwards
+    monkeypatch.setattr(tracing, "_tracer", tracing._tracer)
+    monkeypatch.setattr(tracing, "_tracer_settings", tracing._tracer_settings)
+    return configure_tracer
+
+
+def test_disabled_tracer_hands_out_one_shared_no_op_span(tmp_path):
+    tracer = Tracer(enabled=False, sink_path=str(tmp_path / "spans.jsonl"))
+    with tracer.trace("submission", "s1", "sub1") as root, tracer.span("llm_call") as span:
+        span.set(model="m")
+        span.add_usage(_usage(10, 2))
+    tracer.record("script_run", 3.0)
+    tracer.flush()
+    assert span is root and root.spans == ()
+    assert tracer.metrics() == {"enabled": False, "spans": {}}
+    assert not (tmp_path / "spans.jsonl").exists()
+    assert not Tracer(enabled=False, persist_with_events=True).persist_with_events
+
+
+def test_spans_inside_a_root_are_correlated_and_aggregated(tmp_path):
+    tracer = Tracer(enabled=True, sink_path=str(tmp_path / "spans.jsonl"))
+    with tracer.trace("submission", "s1", "sub1", topic="t") as root:
+        with tracer.span("llm_call", model="m") as span:
+            span.add_usage(_usage(100, 20))
+            span.add_usage(_usage(0, 5))
+            span.add_usage(SimpleNamespace(usage=None))
+        with tracer.span("evaluation", cache_hit=True):
+            pass
+        with pytest.raises(ValueError):
+            with tracer.span("parsing"):
+                raise ValueError("bad json")
+        tracer.record("triage", 12.5)
+    with tracer.span("log_event"):
+        pass
+
+    names = [span["name"] for span in root.spans]
+    assert names == ["llm_call", "evaluation", "parsing", "triage", "submission"]
+    assert all(span["session_id"] == "s1" and span["submission_id"] == "sub1" for span in root.spans)
+    llm_call = root.spans[0]
+    assert llm_call["prompt_tokens"] == 100 and llm_call["completion_tokens"] == 25 and llm_call["model"] == "m"
+    assert root.spans[2]["error"] == "ValueError"
+
+    metrics = tracer.metrics()["spans"]
+    assert metrics["llm_call"]["prompt_tokens"] == 100 and metrics["evaluation"]["cache_hits"] == 1
+    assert metrics["parsing"]["errors"] == 1 and metrics["triage"]["total_ms"] == 12.5
+    # Outside any root span: aggregated, but not correlated
+    assert metrics["log_event"]["count"] == 1
+
+
+def test_spans_of_tasks_started_inside_the_root_join_its_trace():
+    tracer = Tracer(enabled=True, sink_path=None)
+
+    async def stage(name):
+        with tracer.span(name):
+            await asyncio.sleep(0)
+
+    async def submission():
+        with tracer.trace("submission", "s1", "sub1") as root:
+            await asyncio.gather(stage("triage"), stage("speculative_evaluation"))
+        return root
+
+    root = asyncio.run(submission())
+    assert sorted(span["name"] for span in root.spans) == ["speculative_evaluation", "submission", "triage"]
+
+
+def test_jsonl_sink_flushes_in_batches_and_on_demand(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    tracer = Tracer(enabled=True, sink_path=str(path), flush_every=3)
+    for i in range(4):
+        tracer.record("db_write", float(i), rows=i)
+    assert [span["rows"] for span in spans_from_jsonl(str(path))] == [0, 1, 2]
+    tracer.flush()
+    assert [span["rows"] for span in spans_from_jsonl(str(path))] == [0, 1, 2, 3]
+
+
+def test_configure_tracer_keeps_the_tracer_for_the_same_settings(process_tracer, tmp_path):
+    settings = {"enabled": True, "sink_path": str(tmp_path / "spans.jsonl")}
+    first = process_tracer(settings)
+    assert process_tracer(dict(settings)) is first and tracing.get_tracer() is first
+    second = process_tracer({**settings, "persist_with_events": True})
+    assert second is not first and second.persist_with_events
+
+
+def test_report_groups_submissions_by_topic_and_prices_the_calls():
+    def submission(submission_id, topic, difficulty, total_ms, tokens):
+        return [
+            {"name": "submission", "submission_id": submission_id, "topic": topic, "difficulty": difficulty,
+             "duration_ms": total_ms},
+            {"name": "llm_call", "submission_id": submission_id, "model": "gemini/gemini-1.5-flash-latest",
+             "prompt_tokens": tokens, "completion_tokens": tokens // 10, "duration_ms": total_ms - 10},
+            # Stage spans also carry tokens in places; only llm_call / llm_stream are counted
+            {"name": "evaluation", "submission_id": submission_id, "prompt_tokens": tokens, "duration_ms": 5},
+        ]
+
+    spans = (submission("a", "למידה", "Easy", 100, 1000) + submission("b", "למידה", "Easy", 300, 3000)
+             + submission("c", "זיכרון", "Hard", 50, 500) + [{"name": "script_run", "duration_ms": 4}])
+    report = {(row["topic"], row["difficulty"]): row for row in aggregate_by_topic(spans)}
+    learning = report[("למידה", "Easy")]
+    assert learning["submissions"] == 2 and learning["p50_ms"] == 300 and learning["p95_ms"] == 300
+    assert learning["prompt_tokens"] == 4000 and learning["completion_tokens"] == 400
+    assert learning["mean_stage_ms"] == {"evaluation": 5.0, "llm_call": 190.0}
+    assert learning["cost_usd"] == round((4000 * 0.075 + 400 * 0.30) / 1e6, 6)
+    assert report[("זיכרון", "Hard")]["submissions"] == 1
+    assert span_cost({"model": "unknown", "prompt_tokens": 10}) == 0.0
+
+
+def test_a_graded_submission_is_traced_and_persisted_as_one_event(process_tracer, tmp_path):
+    tracer = process_tracer({"enabled": True, "persist_with_events": True, "sink_path": str(tmp_path / "spans.jsonl")})
+    events = []
+    engine = GradingEngine(lambda session_id, event_type, details, **kwargs: events.append((event_type, details)),
+                           {"use_response_cache": False, "use_near_duplicates": False},
+                           acompletion=FakeLiteLLM(triage_ms=0, evaluation_ms=0, jitter=0))
+    qid = get_knowledge_store().ids()[0]
+    answer = "חיזוק הוא תוצאה שמגבירה את הסבירות שההתנהגות תחזור, בניגוד לעונש."
+    result = asyncio.run(engine.grade(qid, answer, "s1"))
+    assert result.error is None
+
+    traces = [details for event_type, details in events if event_type == "TRACE"]
+    assert len(traces) == 1 and traces[0]["submissionId"] == result.submission_id
+    spans = traces[0]["spans"]
+    assert spans[-1]["name"] == "submission" and spans[-1]["question_id"] == qid
+    names = [span["name"] for span in spans]
+    assert {"triage", "llm_call", "llm_stream", "evaluation", "parsing"} <= set(names)
+    # The evaluation is streamed: the call span only opens it, the tokens arrive on llm_stream
+    stream = spans[names.index("llm_stream")]
+    assert stream["prompt_tokens"] > 0 and stream["completion_tokens"] > 0
+    assert result.usage["prompt_tokens"] == stream["prompt_tokens"]
+    tracer.flush()
+    assert {span["submission_id"] for span in spans_from_jsonl(str(tmp_path / "spans.jsonl"))
+            if span.get("submission_id")} == {result.submission_id}
+    json.dumps(spans, ensure_ascii=False)  # Persistable as session_logs details
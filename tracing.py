@@ -0,0 +1,340 @@
+# tracing.py
+# Lightweight per-stage tracing for the grading flow: spans with wall time, token
+# counts and cache hits, correlated by session_id and submission id, written to a
+# local JSONL metrics sink and optionally persisted with the session_logs events.
+# Replaces `litellm.set_verbose`. When tracing is disabled `span()` returns a shared
+# no-op object, so instrumented code pays one attribute check per span.
+#
+#   python tracing.py report                          # latency / tokens / cost per topic and difficulty
+#   python tracing.py report --from-mysql             # same, from TRACE events in session_logs
+#
+# Configured from an optional [tracing] section in secrets.toml:
+#   enabled = true
+#   persist_with_events = true     -> one TRACE event per submission in session_logs
+#   sink_path = ".traces/spans.jsonl"
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from app_config import DEFAULT_SECRETS_PATH, load_secrets
+
+DEFAULT_SINK_PATH = os.environ.get("PSYTRAINER_TRACE_PATH", os.path.join(".traces", "spans.jsonl"))
+
+# USD per million tokens (input, output); models not listed are reported without cost
+MODEL_PRICES_PER_MILLION = {
+    "gemini/gemini-1.5-flash-latest": (0.075, 0.30),
+    "gemini/gemini-1.5-flash-8b": (0.0375, 0.15),
+}
+
+_current_trace = contextvars.ContextVar("psytrainer_trace", default=None)
+
+
+class _Trace:
+    """
+    Correlation ids plus every span finished under one root span.
+    """
+
+    def __init__(self, session_id, submission_id):
+        self.session_id = session_id
+        self.submission_id = submission_id
+        self.spans = []
+
+
+class Span:
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace = _current_trace.get()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_usage(self, response):
+        """
+        Adds the prompt/completion tokens of a LiteLLM response (or stream chunk).
+        """
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        for key in ("prompt_tokens", "completion_tokens"):
+            self.attributes[key] = self.attributes.get(key, 0) + (getattr(usage, key, 0) or 0)
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            "name": self.name,
+            "start": round(self.started_at, 3),
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            **self.attributes,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.trace is not None:
+            record["session_id"] = self.trace.session_id
+            record["submission_id"] = self.trace.submission_id
+            self.trace.spans.append(record)
+        if self._token is not None:
+            _current_trace.reset(self._token)
+        self.tracer._record(record)
+        return False
+
+
+class RootSpan(Span):
+    """
+    Opens a trace: spans finished inside it (including in tasks it starts) are collected in `spans`.
+    """
+
+    def __init__(self, tracer, name, session_id, submission_id, attributes):
+        super().__init__(tracer, name, attributes)
+        self.trace = _Trace(session_id, submission_id)
+
+    @property
+    def spans(self):
+        return self.trace.spans
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.trace)
+        return super().__enter__()
+
+
+class _NoOpSpan:
+    spans = ()
+
+    def set(self, **attributes):
+        pass
+
+    def add_usage(self, response):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class Tracer:
+    """
+    Creates spans and feeds finished ones to the JSONL sink and the in-memory aggregates.
+    """
+
+    def __init__(self, enabled=False, persist_with_events=False, sink_path=DEFAULT_SINK_PATH, flush_every=50):
+        self.enabled = enabled
+        self.persist_with_events = enabled and persist_with_events
+        self.sink_path = sink_path
+        self.flush_every = flush_every
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._aggregates = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0,
+                                                "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0})
+
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def trace(self, name, session_id, submission_id, **attributes):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return RootSpan(self, name, session_id, submission_id, attributes)
+
+    def record(self, name, duration_ms, **attributes):
+        """
+        Records a span that was already timed elsewhere (e.g. GradingResult.timing).
+        """
+        if not self.enabled:
+            return
+        record = {"name": name, "start": round(time.time() - duration_ms / 1000, 3), "duration_ms": duration_ms,
+                  **attributes}
+        trace = _current_trace.get()
+        if trace is not None:
+            record["session_id"] = trace.session_id
+            record["submission_id"] = trace.submission_id
+            trace.spans.append(record)
+        self._record(record)
+
+    def _record(self, record):
+        with self._lock:
+            aggregate = self._aggregates[record["name"]]
+            aggregate["count"] += 1
+            aggregate["total_ms"] += record["duration_ms"]
+            aggregate["max_ms"] = max(aggregate["max_ms"], record["duration_ms"])
+            aggregate["errors"] += bool(record.get("error"))
+            aggregate["prompt_tokens"] += record.get("prompt_tokens", 0)
+            aggregate["completion_tokens"] += record.get("completion_tokens", 0)
+            aggregate["cache_hits"] += bool(record.get("cache_hit"))
+            if self.sink_path:
+                self._buffer.append(record)
+                if len(self._buffer) >= self.flush_every:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        if os.path.dirname(self.sink_path):
+            os.makedirs(os.path.dirname(self.sink_path), exist_ok=True)
+        with open(self.sink_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in self._buffer)
+        self._buffer = []
+
+    def metrics(self):
+        with self._lock:
+            snapshot = {name: dict(aggregate) for name, aggregate in self._aggregates.items()}
+        for aggregate in snapshot.values():
+            aggregate["mean_ms"] = round(aggregate["total_ms"] / aggregate["count"], 3)
+            aggregate["total_ms"] = round(aggregate["total_ms"], 3)
+            aggregate["max_ms"] = round(aggregate["max_ms"], 3)
+        return {"enabled": self.enabled, "spans": snapshot}
+
+
+# --- Process-wide tracer (disabled until configured) ---
+_tracer = Tracer()
+_tracer_settings = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    return _tracer
+
+
+def configure_tracer(settings):
+    """
+    Replaces the process-wide tracer according to a [tracing] settings dict.
+    Calling it again with the same settings (every Streamlit rerun) keeps the current one.
+    """
+    global _tracer, _tracer_settings
+    settings = dict(settings)
+    with _tracer_lock:
+        if settings != _tracer_settings:
+            _tracer.flush()
+            _tracer = Tracer(
+                enabled=settings.get("enabled", False),
+                persist_with_events=settings.get("persist_with_events", False),
+                sink_path=settings.get("sink_path", DEFAULT_SINK_PATH),
+            )
+            _tracer_settings = settings
+            atexit.register(_tracer.flush)
+        return _tracer
+
+
+# --- Report ---
+def spans_from_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def spans_from_mysql(db_config):
+    import mysql.connector
+
+    conn = mysql.connector.connect(**db_config)
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("SELECT details FROM session_logs WHERE event_type = 'TRACE' ORDER BY id")
+        for (details,) in cursor:
+            yield from json.loads(details).get("spans", [])
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def span_cost(span):
+    prices = MODEL_PRICES_PER_MILLION.get(span.get("model"))
+    if prices is None:
+        return 0.0
+    return (span.get("prompt_tokens", 0) * prices[0] + span.get("completion_tokens", 0) * prices[1]) / 1e6
+
+
+def aggregate_by_topic(spans):
+    """
+    Groups spans by submission and reports, per (topic, difficulty): submissions, end-to-end
+    latency percentiles, mean ms per stage, tokens and estimated cost.
+    """
+    submissions = defaultdict(list)
+    for span in spans:
+        if span.get("submission_id"):
+            submissions[span["submission_id"]].append(span)
+
+    groups = defaultdict(lambda: {"latencies": [], "stage_ms": defaultdict(float), "prompt_tokens": 0,
+                                  "completion_tokens": 0, "cost_usd": 0.0})
+    for submission_spans in submissions.values():
+        root = next((span for span in submission_spans if span["name"] == "submission"), None)
+        if root is None:
+            continue
+        group = groups[(root.get("topic"), root.get("difficulty"))]
+        group["latencies"].append(root["duration_ms"])
+        for span in submission_spans:
+            if span["name"] != "submission":
+                group["stage_ms"][span["name"]] += span["duration_ms"]
+            if span["name"] in ("llm_call", "llm_stream"):  # Tokens are counted once, on the calls themselves
+                group["prompt_tokens"] += span.get("prompt_tokens", 0)
+                group["completion_tokens"] += span.get("completion_tokens", 0)
+                group["cost_usd"] += span_cost(span)
+
+    report = []
+    for (topic, difficulty), group in sorted(groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))):
+        latencies = sorted(group["latencies"])
+        count = len(latencies)
+        report.append({
+            "topic": topic,
+            "difficulty": difficulty,
+            "submissions": count,
+            "p50_ms": round(latencies[count // 2], 1),
+            "p95_ms": round(latencies[min(count - 1, int(count * 0.95))], 1),
+            "mean_stage_ms": {stage: round(total / count, 1) for stage, total in sorted(group["stage_ms"].items())},
+            "prompt_tokens": group["prompt_tokens"],
+            "completion_tokens": group["completion_tokens"],
+            "cost_usd": round(group["cost_usd"], 6),
+        })
+    return report
+
+
+def print_report(report):
+    print(f"{'topic':<30} {'difficulty':<10} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'prompt tok':>11} {'compl tok':>10} {'cost $':>10}")
+    for row in report:
+        print(f"{str(row['topic'])[:30]:<30} {str(row['difficulty']):<10} {row['submissions']:>6} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['prompt_tokens']:>11} "
+              f"{row['completion_tokens']:>10} {row['cost_usd']:>10.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate traced latency and token spend.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    report_parser = subcommands.add_parser("report", help="Latency / tokens / cost per topic and difficulty")
+    report_parser.add_argument("--sink", default=DEFAULT_SINK_PATH, help="JSONL span file")
+    report_parser.add_argument("--from-mysql", action="store_true", help="Read TRACE events from session_logs")
+    report_parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    report_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    if args.from_mysql:
+        spans = spans_from_mysql(load_secrets(args.secrets)["mysql"])
+    else:
+        spans = spans_from_jsonl(args.sink)
+    report = aggregate_by_topic(spans)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,115 @@
+# triage_eval.py
+# Evaluates the local triage fast path (local_triage.py) on the labeled set in
+# triage_eval_set.jsonl and reports precision against the human labels and
+# against the Triage Agent's labels.
+#
+#   python triage_eval.py                 # report at the default threshold
+#   python triage_eval.py --sweep         # coverage / precision per threshold
+#   python triage_eval.py --call-llm      # (re)label the set with the Triage Agent first
+
+import argparse
+import json
+import os
+
+from local_triage import DEFAULT_ESCALATION_THRESHOLD, triage_locally
+from prompts import TRIAGE_MODEL, build_triage_prompt, parse_triage_label
+
+EVAL_SET_PATH = "triage_eval_set.jsonl"
+
+
+def load_eval_set(path=EVAL_SET_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_eval_set(rows, path=EVAL_SET_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def label_with_llm(rows):
+    """
+    Stores the Triage Agent's label for every row under `llm_label`.
+    """
+    import litellm
+
+    from app_config import load_secrets
+
+    if "GEMINI_API_KEY" not in os.environ:
+        os.environ["GEMINI_API_KEY"] = load_secrets()["GEMINI_API_KEY"]
+    for row in rows:
+        response = litellm.completion(
+            model=TRIAGE_MODEL,
+            messages=[{"role": "user", "content": build_triage_prompt(row["answer"])}],
+        )
+        row["llm_label"] = parse_triage_label(response.choices[0].message.content)
+
+
+def evaluate(rows, threshold, reference="label"):
+    """
+    Returns coverage (share of answers settled locally) and per-label precision of
+    the settled decisions against `reference` ("label" or "llm_label").
+    """
+    settled = 0
+    per_label = {}
+    for row in rows:
+        if reference not in row:
+            continue
+        decision = triage_locally(row["answer"])
+        if decision.confidence < threshold:
+            continue
+        settled += 1
+        stats = per_label.setdefault(decision.label, {"settled": 0, "correct": 0})
+        stats["settled"] += 1
+        stats["correct"] += decision.label == row[reference]
+
+    total = sum(1 for row in rows if reference in row)
+    correct = sum(s["correct"] for s in per_label.values())
+    return {
+        "reference": reference,
+        "threshold": threshold,
+        "total": total,
+        "coverage": settled / total if total else 0.0,
+        "precision": correct / settled if settled else 1.0,
+        "per_label": {
+            label: {**s, "precision": s["correct"] / s["settled"]} for label, s in sorted(per_label.items())
+        },
+    }
+
+
+def print_report(report):
+    print(f"--- vs {report['reference']} @ threshold {report['threshold']:.2f} ---")
+    print(f"answers: {report['total']}  settled locally: {report['coverage']:.1%}  precision: {report['precision']:.1%}")
+    for label, s in report["per_label"].items():
+        print(f"  {label:<14} settled {s['settled']:>3}  precision {s['precision']:.1%}")
+
+
+def print_mistakes(rows, threshold):
+    for row in rows:
+        decision = triage_locally(row["answer"])
+        if decision.confidence >= threshold and decision.label != row["label"]:
+            print(f"  [{row['label']} -> {decision.label} {decision.confidence:.2f} {decision.reason}] {row['answer']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report precision of the local triage fast path.")
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_ESCALATION_THRESHOLD)
+    parser.add_argument("--sweep", action="store_true", help="Report a range of escalation thresholds")
+    parser.add_argument("--call-llm", action="store_true", help="Label the set with the Triage Agent and save it")
+    args = parser.parse_args()
+
+    rows = load_eval_set(args.eval_set)
+    if args.call_llm:
+        label_with_llm(rows)
+        save_eval_set(rows, args.eval_set)
+
+    references = ["label"] + (["llm_label"] if any("llm_label" in row for row in rows) else [])
+    thresholds = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97] if args.sweep else [args.threshold]
+    for reference in references:
+        for threshold in thresholds:
+            print_report(evaluate(rows, threshold, reference))
+
+    print("--- local mistakes vs human labels ---")
+    print_mistakes(rows, args.threshold)